@@ -20,9 +20,9 @@ def create_app():
             r"/api/*": {
                 "origins": ["http://localhost:5173", "http://127.0.0.1:5173", "http://localhost:5175"],
                 "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
-                "allow_headers": ["Content-Type", "Authorization", "X-Requested-With"],
+                "allow_headers": ["Content-Type", "Authorization", "X-Requested-With", "X-Request-ID"],
                 "supports_credentials": True,
-                "expose_headers": ["Content-Type", "Content-Length", "X-Requested-With", "Authorization"],
+                "expose_headers": ["Content-Type", "Content-Length", "X-Requested-With", "Authorization", "X-Request-ID"],
                 "max_age": 600  # Cache preflight request for 10 minutes
             }
         },
@@ -32,6 +32,20 @@ def create_app():
     # CORS headers are handled by the CORS middleware above
     # No need for manual CORS headers in after_request
 
+    # Tag every request with an id so its structured log records can be correlated
+    from flask import g, request
+    from .services.structured_logging import bind_request_id
+
+    @app.before_request
+    def assign_request_id():
+        g.request_id = bind_request_id(request.headers.get('X-Request-ID', '')[:64] or None)
+
+    @app.after_request
+    def expose_request_id(response):
+        if 'request_id' in g:
+            response.headers['X-Request-ID'] = g.request_id
+        return response
+
     # Register blueprints
     from .routes.auth_routes import auth_bp
     from .routes.user_routes import user_bp
@@ -51,4 +65,30 @@ def create_app():
     app.register_blueprint(writing_bp, url_prefix='/api/writing')
     app.register_blueprint(admin_bp, url_prefix='/api/admin')
 
+    # Admin dashboard rollups follow every ORM write; `flask rebuild-rollups` recomputes them
+    from .services.rollups import register_rollup_listeners, rebuild_rollups_command
+    register_rollup_listeners()
+    app.cli.add_command(rebuild_rollups_command)
+
+    # Cached admin statistics are dropped when a commit touches the data behind them
+    from .models import Payment, Subscription, User
+    from .services.response_cache import admin_stats_cache
+    admin_stats_cache.invalidate_on_commit(Payment, User, Subscription)
+
+    # Token counting encodings, loaded in the background: tiktoken may download them on first use
+    from .config.openai_config import OPENAI_MODEL
+    from .controllers.writing_controller import ANALYSIS_MODEL
+    from .services.prompt_templates import load_encodings
+    load_encodings([ANALYSIS_MODEL, OPENAI_MODEL])
+
+    # Chat messages written behind the request, in batches (off by default)
+    if app.config.get('CHAT_WRITE_BEHIND'):
+        from .services.chat_write_buffer import chat_write_buffer
+        chat_write_buffer.start(app)
+
+    # Pick up scoring jobs that were queued or interrupted before a restart
+    if app.config.get('SCORING_JOBS_RESUME_ON_START'):
+        from .services.scoring_jobs import resume_scoring_jobs
+        resume_scoring_jobs(app)
+
     return app
\ No newline at end of file
@@ -0,0 +1,78 @@
+"""Time to first byte and peak memory of the admin CSV exports.
+
+Downloads ``/api/admin/export/users`` and ``/api/admin/export/orders``
+through the test client, chunk by chunk as a browser would, from the
+dataset seeded by ``bench_admin_search`` (same database, grown to
+``--users``). Peak memory is what ``tracemalloc`` saw allocated by Python
+during the download and should not grow with the number of rows.
+
+    cd src && python -m backend.benchmarks.bench_admin_export --users 1000000
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from backend.benchmarks.bench_admin_search import seed, start_app
+
+ENDPOINTS = (
+    '/api/admin/export/users',
+    '/api/admin/export/orders',
+    '/api/admin/export/orders?status=active&start_date=2020-01-01',
+)
+
+
+def download(client, url, headers):
+    """(seconds to the header, seconds to the first rows, total seconds, lines, bytes, peak bytes)."""
+    tracemalloc.start()
+    started = time.perf_counter()
+    response = client.get(url, headers=headers, buffered=False)
+    chunks = iter(response.response)
+    first = next(chunks)
+    header_at = time.perf_counter() - started
+    lines, size = first.count(b'\n'), len(first)
+    rows_at = None
+    for chunk in chunks:
+        rows_at = rows_at or time.perf_counter() - started
+        lines += chunk.count(b'\n')
+        size += len(chunk)
+    response.close()
+    total = time.perf_counter() - started
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return header_at, rows_at or total, total, lines, size, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'admin_search_bench.db')}")
+    parser.add_argument('--users', type=int, default=1000000)
+    args = parser.parse_args()
+
+    app = start_app(args.database_url)
+
+    from flask_jwt_extended import create_access_token
+    from backend.extensions import db
+    from backend.models import User
+
+    with app.app_context():
+        db.create_all()
+        seed(args.users)
+        admin = User.query.filter_by(email='export-admin@example.com').first()
+        if admin is None:
+            admin = User(email='export-admin@example.com', password_hash='x', full_name='Export Admin', role='admin')
+            db.session.add(admin)
+            db.session.commit()
+        headers = {'Authorization': f"Bearer {create_access_token(identity=admin.id)}"}
+
+    client = app.test_client()
+    print(f"{'endpoint':<60} {'header ms':>9} {'rows ms':>8} {'total s':>8} {'lines':>9} {'MB':>7} {'peak MB':>8}")
+    for url in ENDPOINTS:
+        header_at, rows_at, total, lines, size, peak = download(client, url, headers)
+        print(f"{url:<60} {header_at * 1000:>9.0f} {rows_at * 1000:>8.0f} {total:>8.1f} {lines:>9} "
+              f"{size / 1e6:>7.1f} {peak / 1e6:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
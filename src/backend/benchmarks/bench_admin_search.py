@@ -0,0 +1,163 @@
+"""Latency of the admin user and order search on a large synthetic dataset.
+
+Seeds ``--users`` users (a third of them with a subscription) into the
+database once, then times, per search term, the previous filter
+(``ilike('%term%')`` on email, full_name and plan) against the current one
+(services/admin_search.py, with its ranking). Each run counts the matches and
+fetches the first page, as the endpoints do.
+
+Only MySQL has the FULLTEXT index; on any other database both columns time
+the same substring scan. Use an empty scratch schema created by the migration
+(or by this script), with innodb_ft_enable_stopword = OFF:
+
+    cd src && python -m backend.benchmarks.bench_admin_search --database-url mysql+pymysql://root:@localhost/search_bench --users 1000000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+from datetime import timedelta
+
+from sqlalchemy import func, or_
+
+FAMILY_NAMES = ['Nguyen', 'Tran', 'Le', 'Pham', 'Hoang', 'Huynh', 'Phan', 'Vu', 'Vo', 'Dang', 'Bui', 'Do', 'Ho', 'Ngo', 'Duong']
+GIVEN_NAMES = ['An', 'Binh', 'Chi', 'Dung', 'Giang', 'Ha', 'Hieu', 'Hoa', 'Huong', 'Khanh', 'Linh', 'Long', 'Mai', 'Minh',
+               'Nam', 'Ngoc', 'Phuong', 'Quan', 'Quynh', 'Son', 'Thao', 'Trang', 'Trung', 'Tuan', 'Vy', 'Yen']
+DOMAINS = ['gmail.com', 'yahoo.com', 'outlook.com', 'hcmus.edu.vn', 'fpt.edu.vn']
+PLANS = ['free', 'student', 'pro', 'unlimited']
+
+# (label, term): a common name, a full email, an email prefix, a one-letter term, a plan and no match
+TERMS = [
+    ('common name', 'nguyen'),
+    ('exact email', None),  # the newest user's
+    ('email prefix', 'quynh.vo1'),
+    ('one letter', 'q'),
+    ('plan', 'student'),
+    ('no match', 'zzqxw'),
+]
+
+
+def start_app(database_url):
+    # Configure before create_app() imports the controllers and services that read Config
+    from backend.config.config import Config
+
+    Config.SQLALCHEMY_DATABASE_URI = database_url
+    Config.LOG_DIR = tempfile.mkdtemp(prefix='admin_search_logs_')
+    Config.SCORING_JOBS_RESUME_ON_START = False
+
+    from backend import create_app
+
+    return create_app()
+
+
+def seed(users, chunk=10000):
+    """Insert users until there are ``users`` of them; Core inserts, so the rollups are not maintained."""
+    from backend.extensions import db
+    from backend.models import Subscription, User, generate_uuid, local_now
+
+    existing = db.session.query(func.count(User.id)).scalar()
+    rng = random.Random(existing)
+    now = local_now()
+    for start in range(existing, users, chunk):
+        user_rows, subscription_rows = [], []
+        for index in range(start, min(start + chunk, users)):
+            given, family = rng.choice(GIVEN_NAMES), rng.choice(FAMILY_NAMES)
+            user_id = generate_uuid()
+            created_at = now - timedelta(minutes=index)
+            user_rows.append({
+                'id': user_id,
+                'email': f"{given.lower()}.{family.lower()}{index}@{rng.choice(DOMAINS)}",
+                'password_hash': 'x',
+                'full_name': f"{family} {rng.choice(GIVEN_NAMES)} {given}",
+                'role': 'user',
+                'created_at': created_at
+            })
+            if index % 3 == 0:
+                subscription_rows.append({
+                    'id': generate_uuid(),
+                    'user_id': user_id,
+                    'plan': rng.choice(PLANS),
+                    'status': 'active',
+                    'start_date': created_at.date(),
+                    'created_at': created_at
+                })
+        db.session.execute(User.__table__.insert(), user_rows)
+        db.session.execute(Subscription.__table__.insert(), subscription_rows)
+        db.session.commit()
+        print(f"  seeded {start + len(user_rows)} users", end='\r', flush=True)
+    if existing < users:
+        print()
+
+
+def legacy_queries(term):
+    from backend.extensions import db
+    from backend.models import Subscription, User
+
+    pattern = f"%{term}%"
+    users = User.query.filter(or_(User.email.ilike(pattern), User.full_name.ilike(pattern)))
+    orders = db.session.query(Subscription, User).join(User, Subscription.user_id == User.id).filter(
+        or_(User.email.ilike(pattern), User.full_name.ilike(pattern), Subscription.plan.ilike(pattern))
+    ).order_by(Subscription.start_date.desc())
+    return users, orders
+
+
+def current_queries(term):
+    from backend.extensions import db
+    from backend.models import Subscription, User
+    from backend.services import admin_search
+
+    term = admin_search.normalize_term(term)
+    users = User.query.filter(admin_search.user_search_condition(term)).order_by(
+        *admin_search.user_search_ranking(term), User.created_at.desc()
+    )
+    orders = db.session.query(Subscription, User).join(User, Subscription.user_id == User.id).filter(
+        admin_search.order_search_condition(term)
+    ).order_by(*admin_search.user_search_ranking(term), Subscription.start_date.desc())
+    return users, orders
+
+
+def time_query(query, repeat, per_page=10):
+    """Median seconds for a count plus the first page, and the count."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        total = query.order_by(None).count()
+        query.limit(per_page).all()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings), total
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', default=f"sqlite:///{os.path.join(tempfile.gettempdir(), 'admin_search_bench.db')}",
+                        help='reused between runs; seeding only adds the missing users')
+    parser.add_argument('--users', type=int, default=1000000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    app = start_app(args.database_url)
+
+    from backend.extensions import db
+    from backend.models import User
+
+    with app.app_context():
+        db.create_all()
+        seed(args.users)
+        print(f"{db.engine.dialect.name}, {args.users} users"
+              + ('' if db.engine.dialect.name in ('mysql', 'mariadb') else ' (no FULLTEXT index: substring LIKE fallback)'))
+        print(f"{'term':<14} {'endpoint':<7} {'matches':>9} {'before ms':>10} {'after ms':>10}")
+        newest_email = db.session.query(User.email).order_by(User.created_at.desc()).limit(1).scalar()
+        for label, term in TERMS:
+            term = newest_email if term is None else term
+            for endpoint, legacy, current in zip(('users', 'orders'), legacy_queries(term), current_queries(term)):
+                before, before_total = time_query(legacy, args.repeat)
+                after, after_total = time_query(current, args.repeat)
+                matches = str(after_total) if after_total == before_total else f"{before_total}->{after_total}"
+                print(f"{label:<14} {endpoint:<7} {matches:>9} {before * 1000:>10.1f} {after * 1000:>10.1f}")
+            db.session.rollback()
+
+
+if __name__ == '__main__':
+    main()
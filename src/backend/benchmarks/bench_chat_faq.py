@@ -0,0 +1,169 @@
+"""Latency and matching quality of the chat FAQ cache.
+
+Indexes a handful of real IELTS questions plus ``--entries`` generated ones
+in a scratch SQLite database, then reports:
+
+* lookup time for paraphrases of indexed questions (hits) and for unrelated
+  or near-miss questions (misses);
+* which labelled paraphrases and near misses (Task 1 vs Task 2, band 7 vs
+  band 8) are answered, at the configured ``CHAT_FAQ_MIN_SIMILARITY``;
+* ``POST /api/chat/gpt`` turn time on a hit and on a miss, GPT replaced by a
+  stub that answers after ``--llm-delay`` seconds.
+
+    cd src && python -m backend.benchmarks.bench_chat_faq --entries 5000
+"""
+import argparse
+import os
+import random
+import statistics
+import tempfile
+import time
+import types
+
+FAQ = {
+    'How long is the IELTS writing test?': 'You have 60 minutes for both tasks.',
+    'What is the difference between Task 1 and Task 2?': 'Task 1 describes a visual or writes a letter; Task 2 is an essay.',
+    'How many words should I write for Task 1?': 'At least 150 words.',
+    'How many words should I write for Task 2?': 'At least 250 words.',
+    'What are the band descriptors for Task 2?': 'Task Response, Coherence and Cohesion, Lexical Resource, Grammatical Range and Accuracy.',
+    'What does band 7 mean in writing?': 'A good user: handles complex language well with occasional errors.',
+    'How is the overall writing band calculated?': 'Task 2 counts twice as much as Task 1.',
+    'Can I use contractions in Task 2?': 'Avoid them; Task 2 expects a formal register.',
+}
+
+# (question, indexed question expected to answer it, or None)
+LABELLED = [
+    ('how long is the ielts writing test', 'How long is the IELTS writing test?'),
+    ('How long is the writing test in IELTS?', 'How long is the IELTS writing test?'),
+    ("what's the difference between task 1 and task 2", 'What is the difference between Task 1 and Task 2?'),
+    ('How many words for Task 1?', 'How many words should I write for Task 1?'),
+    ('Hello! How many words should I write for task 2, please?', 'How many words should I write for Task 2?'),
+    ('band descriptors for task 2?', 'What are the band descriptors for Task 2?'),
+    ('how is the overall band for writing calculated', 'How is the overall writing band calculated?'),
+    ('Can I use contractions in task 2 essays?', 'Can I use contractions in Task 2?'),
+    ('How many words should I write for Task 3?', None),
+    ('What does band 8 mean in writing?', None),
+    ('What are the band descriptors for Task 1?', None),
+    ('Can you check my essay about climate change?', None),
+    ('How can I improve my vocabulary for the speaking test?', None),
+]
+
+TOPICS = ('education', 'technology', 'environment', 'health', 'crime', 'tourism', 'advertising', 'work', 'family',
+          'cities', 'transport', 'media', 'sport', 'art', 'science', 'government', 'globalisation', 'housing')
+TEMPLATES = (
+    'What vocabulary should I use for {topic} essays?',
+    'Give me ideas for a Task 2 essay about {topic} and {other}',
+    'How do I write a conclusion for an essay on {topic}?',
+    'Is {topic} a common topic in IELTS {part}?',
+    'What are good collocations about {topic} for {part}?',
+    'How should I compare {topic} and {other} in a chart description?',
+)
+
+
+class DelayedCompletions:
+    def __init__(self, delay):
+        self.delay = delay
+
+    def create(self, **kwargs):
+        time.sleep(self.delay)
+        message = types.SimpleNamespace(content='A tutor reply from GPT.')
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason='stop')], usage=None)
+
+
+def start_app():
+    # Configure before create_app() imports the controllers and services that read Config
+    from backend.config.config import Config
+
+    workdir = tempfile.mkdtemp(prefix='chat_faq_')
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'faq.db')}"
+    Config.LOG_DIR = os.path.join(workdir, 'logs')
+    Config.SCORING_JOBS_RESUME_ON_START = False
+    Config.CHAT_SUMMARY_ENABLED = False
+
+    from backend import create_app
+
+    return create_app()
+
+
+def generated_questions(count, seed=7):
+    rng = random.Random(seed)
+    questions = set()
+    while len(questions) < count:
+        topic, other = rng.sample(TOPICS, 2)
+        part = rng.choice(('Task 1', 'Task 2', 'speaking part 2', 'speaking part 3'))
+        questions.add(rng.choice(TEMPLATES).format(topic=topic, other=other, part=part) + f" ({rng.randrange(1, 10**6)})")
+    return sorted(questions)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return statistics.median(samples) * 1000, samples[int(len(samples) * 0.99) - 1] * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--entries', type=int, default=5000, help='generated entries indexed besides the real questions')
+    parser.add_argument('--lookups', type=int, default=2000)
+    parser.add_argument('--llm-delay', type=float, default=1.0, help='seconds the GPT stub takes to answer')
+    args = parser.parse_args()
+
+    app = start_app()
+
+    from sqlalchemy import insert
+    from backend.extensions import db
+    from backend.models import ChatFaqEntry, User, generate_uuid
+    from backend.services.chat_faq import chat_faq_cache
+    from backend.services.llm_client import llm_client
+
+    llm_client.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=DelayedCompletions(args.llm_delay)))
+    with app.app_context():
+        db.create_all()
+        rows = [{'id': generate_uuid(), 'question': question, 'answer': answer} for question, answer in FAQ.items()]
+        rows += [{'id': generate_uuid(), 'question': question, 'answer': 'Generated answer.'}
+                 for question in generated_questions(args.entries)]
+        db.session.execute(insert(ChatFaqEntry), rows)
+        user = User(email='faq-bench@example.com', password_hash='x', full_name='FAQ Bench')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+        started = time.perf_counter()
+        chat_faq_cache.invalidate()
+        chat_faq_cache.lookup('warm up', record=False)
+        print(f"{len(rows)} entries indexed in {(time.perf_counter() - started) * 1000:.0f} ms, "
+              f"min similarity {chat_faq_cache.min_similarity}\n")
+
+        answered = {entry.id: question for question in FAQ for entry in ChatFaqEntry.query.filter_by(question=question)}
+        correct = 0
+        print(f"{'question':<60} {'answered by':<52} {'sim':>5}")
+        for question, expected in LABELLED:
+            match = chat_faq_cache.lookup(question, record=False)
+            got = answered.get(match.entry_id, '(generated entry)') if match else None
+            correct += got == expected
+            print(f"{question:<60} {str(got):<52} {match.similarity if match else '':>5} "
+                  f"{'ok' if got == expected else 'WRONG'}")
+        print(f"{correct}/{len(LABELLED)} as labelled\n")
+
+        for label, questions in (('hit', [q for q, expected in LABELLED if expected]),
+                                 ('miss', [q for q, expected in LABELLED if not expected])):
+            timings = []
+            for index in range(args.lookups):
+                started = time.perf_counter()
+                chat_faq_cache.lookup(questions[index % len(questions)], user_id=user_id)
+                timings.append(time.perf_counter() - started)
+            p50, p99 = percentiles(timings)
+            print(f"lookup {label:<5} p50 {p50:.3f} ms  p99 {p99:.3f} ms")
+
+    client = app.test_client()
+    print()
+    for label, message in (('hit', 'How many words for Task 1?'), ('miss', 'Can you check my essay about climate change?')):
+        timings = []
+        for _ in range(5):
+            started = time.perf_counter()
+            response = client.post('/api/chat/gpt', json={'user_id': user_id, 'message': message})
+            timings.append(time.perf_counter() - started)
+        print(f"POST /api/chat/gpt {label:<5} {statistics.median(timings) * 1000:>8.1f} ms  cached={response.get_json()['cached']}")
+
+
+if __name__ == '__main__':
+    main()
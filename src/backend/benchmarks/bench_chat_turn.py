@@ -0,0 +1,146 @@
+"""Database cost of one /api/chat/gpt turn: statements, commits and time.
+
+Runs chat turns against a scratch database with GPT replaced by an instant
+stub, so the time measured is the turn's database work plus the Python
+around it:
+
+* before: the previous sequence (history, user lookup, commit of the user's
+  message, commit of the reply, serialization of both after their commit);
+* after: ``start_chat_turn`` and ``save_chat_turn``, one transaction;
+* write-behind: the same with ``CHAT_WRITE_BEHIND``; the batched flush at
+  the end is timed separately and reported per turn.
+
+    cd src && python -m backend.benchmarks.bench_chat_turn --turns 200
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import time
+import types
+import uuid
+
+
+class InstantCompletions:
+    def create(self, **kwargs):
+        message = types.SimpleNamespace(content='A short tutor reply. ' * 20)
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason='stop')], usage=None)
+
+
+def start_app(database_url):
+    # Configure before create_app() imports the controllers and services that read Config
+    from backend.config.config import Config
+
+    Config.SQLALCHEMY_DATABASE_URI = database_url
+    Config.LOG_DIR = tempfile.mkdtemp(prefix='chat_turn_logs_')
+    Config.SCORING_JOBS_RESUME_ON_START = False
+    Config.CHAT_SUMMARY_ENABLED = False  # no background GPT calls during the measurement
+
+    from backend import create_app
+
+    return create_app()
+
+
+def legacy_turn(user_id, message):
+    from backend.controllers.chat_controller import get_chatgpt_response
+    from backend.extensions import db
+    from backend.models import AIChat, User
+    from backend.schemas import chat_schema
+
+    chat_history = AIChat.query.filter_by(user_id=user_id).order_by(AIChat.created_at.desc()).limit(5).all()
+    messages = [{"role": chat.role, "content": chat.message} for chat in reversed(chat_history)]
+    messages.append({"role": "user", "content": message})
+    User.query.get(user_id)
+
+    user_chat = AIChat(id=str(uuid.uuid4()), user_id=user_id, message=message, role='user')
+    db.session.add(user_chat)
+    db.session.commit()
+
+    ai_chat = AIChat(id=str(uuid.uuid4()), user_id=user_id, message=get_chatgpt_response(messages), role='assistant')
+    db.session.add(ai_chat)
+    db.session.commit()
+    return chat_schema.dump(user_chat), chat_schema.dump(ai_chat)
+
+
+def current_turn(user_id, message):
+    from backend.controllers.chat_controller import get_chatgpt_response, save_chat_turn, start_chat_turn
+
+    messages, user_chat, user_exists, _ = start_chat_turn({'user_id': user_id, 'message': message})
+    return save_chat_turn(user_chat, get_chatgpt_response(messages), user_exists)
+
+
+def measure(app, turn, user_id, turns, counters):
+    timings = []
+    counters.update(statements=0, commits=0)
+    for index in range(turns):
+        with app.test_request_context():
+            started = time.perf_counter()
+            turn(user_id, f"Question {index}: how do I improve my Task 2 coherence?")
+            timings.append(time.perf_counter() - started)
+    return statistics.median(timings), counters['statements'] / turns, counters['commits'] / turns
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='an EMPTY scratch database (default: a temporary SQLite file)')
+    parser.add_argument('--turns', type=int, default=200)
+    parser.add_argument('--history', type=int, default=40, help='messages already stored for the user')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='chat_turn_'), 'chat.db')}"
+    app = start_app(database_url)
+
+    from sqlalchemy import event
+    from backend.extensions import db
+    from backend.models import AIChat, User
+    from backend.services.chat_write_buffer import chat_write_buffer
+    from backend.services.llm_client import llm_client
+
+    llm_client.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=InstantCompletions()))
+    counters = {}
+    with app.app_context():
+        db.create_all()
+        user = User(email='chat-bench@example.com', password_hash='x', full_name='Chat Bench')
+        db.session.add(user)
+        db.session.flush()
+        for index in range(args.history):
+            db.session.add(AIChat(user_id=user.id, message=f"Earlier message {index}", role='user' if index % 2 == 0 else 'assistant'))
+        db.session.commit()
+        user_id = user.id
+        dialect = db.engine.dialect.name
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_statement(conn, cursor, statement, parameters, context, executemany):
+            counters['statements'] += 1
+
+        @event.listens_for(db.engine, 'commit')
+        def count_commit(conn):
+            counters['commits'] += 1
+
+    print(f"{dialect}, {args.turns} turns, {args.history} earlier messages")
+    print(f"{'':<14} {'ms/turn':>8} {'statements':>11} {'commits':>8}")
+    for label, turn in (('before', legacy_turn), ('after', current_turn)):
+        median, statements, commits = measure(app, turn, user_id, args.turns, counters)
+        print(f"{label:<14} {median * 1000:>8.2f} {statements:>11.1f} {commits:>8.1f}")
+
+    # Queue the whole run and flush it once, below, to time the flush apart from the turns
+    chat_write_buffer.interval = 3600
+    chat_write_buffer.batch_size = chat_write_buffer.max_pending = 2 * args.turns
+    chat_write_buffer.start(app)
+    median, statements, commits = measure(app, current_turn, user_id, args.turns, counters)
+    started = time.perf_counter()
+    counters.update(statements=0, commits=0)
+    chat_write_buffer.stop()
+    flush_per_turn = (time.perf_counter() - started) / args.turns
+    print(f"{'write-behind':<14} {median * 1000:>8.2f} {statements:>11.1f} {commits:>8.1f}"
+          f"   + flush {flush_per_turn * 1000:.2f} ms, {counters['statements'] / args.turns:.2f} statements,"
+          f" {counters['commits'] / args.turns:.2f} commits per turn")
+
+    with app.app_context():
+        stored = AIChat.query.filter_by(user_id=user_id).count()
+    expected = args.history + 2 * 3 * args.turns
+    print(f"\n{stored} messages stored, {expected} expected")
+
+
+if __name__ == '__main__':
+    main()
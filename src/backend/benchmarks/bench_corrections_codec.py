@@ -0,0 +1,86 @@
+"""Per-row cost of storing and reading WritingScore corrections.
+
+Compares the previous path (``json.dumps`` on save, ``json.loads`` on every
+``to_dict`` call) with the current one (``json_codec`` on save, one lazy
+parse per instance however many times ``corrections`` is read). Rows are
+built from ``fake_openai`` analyses so their size matches what GPT returns.
+
+    cd src && python -m backend.benchmarks.bench_corrections_codec --rows 2000 --corrections 20 --reads 3
+"""
+import argparse
+import json
+import statistics
+import time
+
+from backend.benchmarks.fake_openai import FakeOpenAIServer
+from backend.benchmarks.bench_e2e import TASK_PROMPT, make_essay
+from backend.services import json_codec
+
+
+def build_corrections(rows, corrections):
+    import random
+
+    rng = random.Random(1)
+    server = FakeOpenAIServer(corrections=corrections)
+    server.server_close()  # only build_analysis is used
+    return [
+        server.build_analysis(f"**STUDENT'S ESSAY:**\n{make_essay(rng)}\n**TASK:** {TASK_PROMPT}")['corrections']
+        for _ in range(rows)
+    ]
+
+
+def legacy_row(value, reads):
+    raw = json.dumps(value)
+    for _ in range(reads):
+        json.loads(raw)
+    return raw
+
+
+def current_row(value, reads):
+    from backend.models import WritingScore
+
+    score = WritingScore()
+    score.corrections = value
+    raw = score.corrections_json
+    # A row loaded back from the database: the first read parses, the rest reuse it
+    loaded = WritingScore()
+    loaded.corrections_json = raw
+    for _ in range(reads):
+        loaded.corrections
+    return raw
+
+
+def measure(fn, values, reads, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for value in values:
+            fn(value, reads)
+        timings.append((time.perf_counter() - started) / len(values))
+    return statistics.median(timings) * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--corrections', type=int, default=20, help='corrections per row')
+    parser.add_argument('--reads', type=int, default=3, help='times corrections is read per row (to_dict, combined score...)')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    values = build_corrections(args.rows, args.corrections)
+    legacy = measure(legacy_row, values, args.reads, args.repeat)
+    current = measure(current_row, values, args.reads, args.repeat)
+    legacy_bytes = statistics.mean(len(json.dumps(value).encode('utf-8')) for value in values)
+    current_bytes = statistics.mean(len(json_codec.json_dumps(value).encode('utf-8')) for value in values)
+
+    print(f"codec: {'orjson' if json_codec.orjson is not None else 'json (orjson not installed)'}")
+    print(f"{args.rows} rows, {args.corrections} corrections, {args.reads} reads per row")
+    print(f"{'':>8} {'us/row':>8} {'bytes/row':>10}")
+    print(f"{'before':>8} {legacy:>8.1f} {legacy_bytes:>10.0f}")
+    print(f"{'after':>8} {current:>8.1f} {current_bytes:>10.0f}")
+    print(f"speed-up: {legacy / current:.2f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,319 @@
+"""End-to-end load benchmark: login -> score -> history -> chat.
+
+Starts the app on a local threaded HTTP server against a fresh SQLite
+database and ``fake_openai`` (so no GPT call is paid for), seeds users, then
+runs ``--users`` concurrent virtual users, each doing ``--iterations`` flows
+of::
+
+    POST /api/auth/login
+    POST /api/writing/score     (a fresh essay each time, so the analysis cache misses)
+    GET  /api/writing/scores
+    POST /api/chat/gpt
+
+Reports p50/p95/p99/mean latency and requests/sec per step, and SQL
+statements per request per endpoint (counted on the engine). Results are
+written to JSON; pass an earlier file as ``--baseline`` to print deltas.
+
+    cd src && python -m backend.benchmarks.bench_e2e --users 8 --iterations 5 --latency 0.5
+"""
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+import requests
+
+from backend.benchmarks.fake_openai import start_fake_openai
+
+PASSWORD = 'benchmark-password'
+TASK_PROMPT = (
+    "Some people think that governments should spend more money on public transport "
+    "than on building new roads. To what extent do you agree or disagree?"
+)
+TOPIC_WORDS = (
+    "government public transport roads buses trains traffic congestion cities spend money invest "
+    "commuters pollution cars infrastructure funding services citizens travel network efficient"
+).split()
+FILLER_WORDS = (
+    "i believe that this is because many people would also however in addition for example "
+    "therefore some others argue it should be clear more than the of and to a in"
+).split()
+STEPS = ('login', 'score', 'history', 'chat')
+
+
+def make_essay(rng, words=280):
+    tokens = []
+    while len(tokens) < words:
+        sentence = [rng.choice(TOPIC_WORDS if rng.random() < 0.4 else FILLER_WORDS) for _ in range(rng.randint(8, 16))]
+        tokens.extend(sentence[:-1] + [sentence[-1] + '.'])
+    paragraphs = [' '.join(tokens[i:i + 70]).capitalize() for i in range(0, len(tokens), 70)]
+    return '\n\n'.join(paragraphs)
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def summarize(latencies, duration):
+    return {
+        'count': len(latencies),
+        'rps': round(len(latencies) / duration, 2) if duration else 0.0,
+        'mean_ms': round(statistics.mean(latencies) * 1000, 1),
+        'p50_ms': round(percentile(latencies, 0.5) * 1000, 1),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 1),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 1)
+    }
+
+
+def git_commit():
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+class QueryCounter:
+    """Counts requests and SQL statements per Flask endpoint."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.requests = defaultdict(int)
+        self.queries = defaultdict(int)
+
+    def install(self, app, engine):
+        from flask import has_request_context, request
+        from sqlalchemy import event
+
+        @app.before_request
+        def count_request():
+            with self.lock:
+                self.requests[request.endpoint] += 1
+
+        @event.listens_for(engine, 'before_cursor_execute')
+        def count_query(conn, cursor, statement, parameters, context, executemany):
+            endpoint = request.endpoint if has_request_context() else '(background)'
+            with self.lock:
+                self.queries[endpoint] += 1
+
+    def report(self):
+        with self.lock:
+            return {
+                endpoint: {
+                    'requests': self.requests.get(endpoint, 0),
+                    'queries': queries,
+                    'queries_per_request': round(queries / self.requests[endpoint], 2) if self.requests.get(endpoint) else None
+                }
+                for endpoint, queries in sorted(self.queries.items(), key=lambda item: str(item[0]))
+            }
+
+
+def start_app(database_path, log_dir, fake_base_url, cache_enabled):
+    # Configure before create_app() imports the controllers and services that read Config
+    from backend.config.config import Config
+
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{database_path}"
+    Config.OPENAI_API_KEY = 'benchmark'
+    Config.OPENAI_BASE_URL = fake_base_url
+    Config.LOG_DIR = log_dir
+    Config.SCORING_JOBS_RESUME_ON_START = False
+    Config.ANALYSIS_CACHE_ENABLED = cache_enabled
+
+    from werkzeug.serving import make_server
+    from backend import create_app
+    from backend.extensions import db
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        with db.engine.begin() as conn:
+            conn.exec_driver_sql('PRAGMA journal_mode=WAL')
+        engine = db.engine
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # no per-request access log lines
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, name='bench-app', daemon=True).start()
+    return app, engine, server
+
+
+def seed_users(app, count, credits):
+    from werkzeug.security import generate_password_hash
+    from backend.extensions import db
+    from backend.models import User, UserCredits
+
+    password_hash = generate_password_hash(PASSWORD)
+    emails = []
+    with app.app_context():
+        for index in range(count):
+            user = User(email=f"bench{index}@example.com", password_hash=password_hash, full_name=f"Bench User {index}")
+            db.session.add(user)
+            db.session.flush()
+            db.session.add(UserCredits(user_id=user.id, available_credits=credits))
+            emails.append(user.email)
+        db.session.commit()
+    return emails
+
+
+def run_user(base_url, email, iterations, seed, results, results_lock):
+    rng = random.Random(seed)
+    session = requests.Session()
+
+    def timed(step, method, path, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = session.request(method, base_url + path, timeout=120, **kwargs)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            response, ok = None, False
+        elapsed = time.perf_counter() - started
+        with results_lock:
+            results[step]['latencies'].append(elapsed)
+            if not ok:
+                results[step]['errors'] += 1
+        return response if ok else None
+
+    for _ in range(iterations):
+        response = timed('login', 'POST', '/api/auth/login', json={'email': email, 'password': PASSWORD})
+        if response is None:
+            continue
+        body = response.json()
+        headers = {'Authorization': f"Bearer {body['access_token']}"}
+        user_id = body['user']['id']
+
+        timed('score', 'POST', '/api/writing/score', headers=headers, json={
+            'essay_text': make_essay(rng),
+            'task_type': 'task2',
+            'prompt': TASK_PROMPT,
+            'time_spent': rng.randint(1500, 2400)
+        })
+        timed('history', 'GET', '/api/writing/scores', headers=headers)
+        timed('chat', 'POST', '/api/chat/gpt', json={
+            'user_id': user_id,
+            'message': 'How can I improve my Task Achievement score?'
+        })
+
+
+def print_report(report, baseline=None):
+    print(f"\n{report['meta']['users']} users x {report['meta']['iterations']} flows, "
+          f"{report['overall']['duration_s']}s, {report['overall']['rps']} req/s")
+    print(f"{'step':>8} {'count':>6} {'errors':>6} {'rps':>7} {'mean ms':>8} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}"
+          + (f" {'p95 delta':>10}" if baseline else ''))
+    for step, stats in report['steps'].items():
+        line = (f"{step:>8} {stats['count']:>6} {stats['errors']:>6} {stats['rps']:>7} {stats['mean_ms']:>8} "
+                f"{stats['p50_ms']:>8} {stats['p95_ms']:>8} {stats['p99_ms']:>8}")
+        previous = (baseline or {}).get('steps', {}).get(step)
+        if previous:
+            delta = (stats['p95_ms'] - previous['p95_ms']) / previous['p95_ms'] * 100 if previous['p95_ms'] else 0.0
+            line += f" {delta:>+9.1f}%"
+        print(line)
+
+    print(f"\n{'endpoint':>28} {'requests':>9} {'queries':>8} {'per req':>8}")
+    for endpoint, stats in report['db_queries'].items():
+        per_request = stats['queries_per_request'] if stats['queries_per_request'] is not None else '-'
+        print(f"{str(endpoint):>28} {stats['requests']:>9} {stats['queries']:>8} {per_request:>8}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--iterations', type=int, default=5, help='flows per user')
+    parser.add_argument('--latency', type=float, default=0.5, help='fake OpenAI mean latency in seconds')
+    parser.add_argument('--jitter', type=float, default=0.1, help='fake OpenAI latency standard deviation')
+    parser.add_argument('--corrections', type=int, default=12, help='corrections per fake analysis (response size)')
+    parser.add_argument('--chat-words', type=int, default=150, help='words per fake chat reply (response size)')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--no-cache', action='store_true', help='disable the analysis result cache')
+    parser.add_argument('--output', help='JSON results file (default: bench_e2e_<timestamp>.json)')
+    parser.add_argument('--baseline', help='earlier results file to compare against')
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='bench_e2e_')
+    fake = start_fake_openai(
+        latency=args.latency,
+        jitter=args.jitter,
+        corrections=args.corrections,
+        chat_words=args.chat_words
+    )
+    app, engine, server = start_app(
+        os.path.join(workdir, 'bench.db'),
+        os.path.join(workdir, 'logs'),
+        fake.base_url,
+        cache_enabled=not args.no_cache
+    )
+    emails = seed_users(app, args.users, credits=args.iterations + 5)
+
+    counter = QueryCounter()
+    counter.install(app, engine)
+
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    results = {step: {'latencies': [], 'errors': 0} for step in STEPS}
+    results_lock = threading.Lock()
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=args.users) as executor:
+        futures = [
+            executor.submit(run_user, base_url, email, args.iterations, args.seed * 1000 + index, results, results_lock)
+            for index, email in enumerate(emails)
+        ]
+        for future in futures:
+            future.result()
+    duration = time.perf_counter() - started
+
+    server.shutdown()
+    fake.shutdown()
+
+    total_requests = sum(len(result['latencies']) for result in results.values())
+    report = {
+        'meta': {
+            'timestamp': datetime.now().isoformat(timespec='seconds'),
+            'git_commit': git_commit(),
+            'python': platform.python_version(),
+            'users': args.users,
+            'iterations': args.iterations,
+            'fake_latency_s': args.latency,
+            'fake_jitter_s': args.jitter,
+            'corrections': args.corrections,
+            'chat_words': args.chat_words,
+            'analysis_cache': not args.no_cache,
+            'seed': args.seed
+        },
+        'overall': {
+            'duration_s': round(duration, 2),
+            'requests': total_requests,
+            'rps': round(total_requests / duration, 2),
+            'flows_per_s': round(args.users * args.iterations / duration, 2),
+            'upstream_requests': fake.request_count
+        },
+        'steps': {
+            step: dict(summarize(result['latencies'], duration), errors=result['errors'])
+            for step, result in results.items() if result['latencies']
+        },
+        'db_queries': counter.report()
+    }
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            baseline = json.load(f)
+    print_report(report, baseline)
+
+    output = args.output or f"bench_e2e_{datetime.now().strftime('%Y%m%d-%H%M%S')}.json"
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {output}")
+
+
+if __name__ == '__main__':
+    main()
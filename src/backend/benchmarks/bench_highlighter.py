@@ -0,0 +1,177 @@
+"""Micro-benchmark: correction highlighting on long essays with many corrections.
+
+Compares the previous per-correction ``str.find`` loop, the current
+``find_text_positions`` (deduplicated ``str.find`` plus normalised fallback)
+and a pure-Python Aho-Corasick single pass over the essay. The automaton
+column is why the exact tier stays on ``str.find``: in CPython a
+per-character automaton loop is several times slower than C-level search at
+any realistic essay size.
+
+    cd src && python -m backend.benchmarks.bench_highlighter
+"""
+import argparse
+import random
+import time
+from collections import deque
+
+from backend.controllers.writing_controller import find_text_positions
+
+WORDS = (
+    "the government should invest more money in public transport because it reduces "
+    "traffic congestion and air pollution in big cities however some people believe "
+    "that private cars are more convenient for families who live far from the centre "
+    "in my opinion both approaches have advantages and disadvantages which must be "
+    "considered carefully before making any decision about future policy"
+).split()
+
+
+def legacy_find_text_positions(essay_text, corrections):
+    """The str.find implementation that find_text_positions replaced."""
+    highlighted_corrections = {'grammar': [], 'vocabulary': [], 'structure': []}
+    for category in ['grammar', 'vocabulary', 'structure']:
+        if category in corrections:
+            for correction in corrections[category]:
+                original_text = correction.get('original', '')
+                if original_text and category != 'structure':
+                    positions = []
+                    start = 0
+                    while True:
+                        pos = essay_text.find(original_text, start)
+                        if pos == -1:
+                            break
+                        positions.append({'start': pos, 'end': pos + len(original_text), 'text': original_text})
+                        start = pos + 1
+                    if positions:
+                        correction_with_positions = correction.copy()
+                        correction_with_positions['positions'] = positions
+                        highlighted_corrections[category].append(correction_with_positions)
+                    else:
+                        highlighted_corrections[category].append(correction)
+                else:
+                    highlighted_corrections[category].append(correction)
+    return highlighted_corrections
+
+
+class AhoCorasick:
+    """Aho-Corasick automaton over a fixed list of non-empty patterns."""
+
+    def __init__(self, patterns):
+        self.patterns = list(patterns)
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [()]
+
+        for index, pattern in enumerate(self.patterns):
+            state = 0
+            for char in pattern:
+                next_state = self._goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self._goto)
+                    self._goto[state][char] = next_state
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(())
+                state = next_state
+            self._out[state] = self._out[state] + (index,)
+
+        # Breadth-first pass to set failure links and merge outputs along them
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                target = self._goto[fail].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._out[next_state] = self._out[next_state] + self._out[self._fail[next_state]]
+
+    def finditer(self, text):
+        """Yield ``(start, end, pattern_index)`` for every (possibly overlapping) match."""
+        goto, fail, out, patterns = self._goto, self._fail, self._out, self.patterns
+        state = 0
+        for position, char in enumerate(text):
+            next_state = goto[state].get(char)
+            while next_state is None and state:
+                state = fail[state]
+                next_state = goto[state].get(char)
+            state = next_state or 0
+            if out[state]:
+                end = position + 1
+                for index in out[state]:
+                    yield end - len(patterns[index]), end, index
+
+
+def automaton_positions(essay_text, corrections):
+    originals = [
+        c['original'] for category in ('grammar', 'vocabulary') for c in corrections.get(category, [])
+    ]
+    unique = list(dict.fromkeys(o for o in originals if o))
+    positions = {pattern: [] for pattern in unique}
+    for start, end, index in AhoCorasick(unique).finditer(essay_text):
+        positions[unique[index]].append({'start': start, 'end': end, 'text': essay_text[start:end]})
+    return positions
+
+
+def make_case(rng, word_count, correction_count, fuzzy_every=5):
+    words = [rng.choice(WORDS) for _ in range(word_count)]
+    essay = ' '.join(words)
+    corrections = {'grammar': [], 'vocabulary': [], 'structure': []}
+    for i in range(correction_count):
+        start = rng.randrange(0, word_count - 4)
+        snippet = ' '.join(words[start:start + rng.randint(1, 4)])
+        if fuzzy_every and i % fuzzy_every == 0:
+            # What GPT tends to send back: changed case / doubled spaces
+            snippet = snippet.capitalize().replace(' ', '  ', 1)
+        category = 'grammar' if i % 2 else 'vocabulary'
+        corrections[category].append({'original': snippet, 'correction': snippet, 'explanation': ''})
+    corrections['structure'].append({'issue': 'x', 'suggestion': 'y', 'example': 'z'})
+    return essay, corrections
+
+
+def best_of(fn, repeat, *args):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def count_highlighted(result):
+    return sum(1 for category in ('grammar', 'vocabulary') for c in result[category] if c.get('positions'))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--fuzzy-every', type=int, default=5,
+                        help='make every Nth snippet differ from the essay in case/whitespace (0 = all exact)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    print(f"{'words':>6} {'corr':>5} {'legacy ms':>10} {'new ms':>8} {'automaton ms':>13} "
+          f"{'legacy hl':>10} {'new hl':>7}")
+    for word_count, correction_count in [(250, 20), (400, 40), (1000, 80), (2500, 150), (5000, 300)]:
+        essay, corrections = make_case(rng, word_count, correction_count, args.fuzzy_every)
+        legacy = legacy_find_text_positions(essay, corrections)
+        new = find_text_positions(essay, corrections)
+
+        # Every exact match found before must still be found at the same offsets
+        for category in ('grammar', 'vocabulary'):
+            for old, current in zip(legacy[category], new[category]):
+                if old.get('positions'):
+                    assert old['positions'] == current['positions'], (category, old['original'])
+                    assert old['positions'] == automaton_positions(essay, corrections)[old['original']]
+
+        legacy_ms = best_of(legacy_find_text_positions, args.repeat, essay, corrections) * 1000
+        new_ms = best_of(find_text_positions, args.repeat, essay, corrections) * 1000
+        automaton_ms = best_of(automaton_positions, args.repeat, essay, corrections) * 1000
+        print(f"{word_count:>6} {correction_count:>5} {legacy_ms:>10.2f} {new_ms:>8.2f} {automaton_ms:>13.2f} "
+              f"{count_highlighted(legacy):>10} {count_highlighted(new):>7}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,145 @@
+"""Benchmark: input tokens and latency of each analysis prompt variant.
+
+Renders every registered prompt template for a set of recorded essays and
+reports prompt size, prompt tokens (tiktoken; ``~`` marks a chars/4
+estimate when it is unavailable) and render time. With ``--live`` each
+variant is also sent to the OpenAI API, adding API latency, billed tokens
+and the mean absolute difference of the band scores from the standard
+variant. This costs money: essays x variants GPT-4 calls.
+
+Essays come from the WritingScores table (``--from-db``) or a JSON-lines
+file of ``{"essay_text", "task_type", "prompt", ...}`` objects (``--essays``).
+
+    cd src && python -m backend.benchmarks.bench_prompt_variants --from-db 20
+    cd src && python -m backend.benchmarks.bench_prompt_variants --essays essays.jsonl --live
+"""
+import argparse
+import json
+import statistics
+import time
+
+from backend.services.prompt_templates import PROMPT_TEMPLATES, count_chat_tokens, load_encodings
+from backend.controllers.writing_controller import ANALYSIS_MODEL, SCORE_KEYS, parse_analysis_response
+from backend.services.llm_client import llm_client
+
+
+def load_essays_from_file(path):
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_essays_from_db(limit):
+    from backend import create_app
+    from backend.models import WritingScore
+
+    app = create_app()
+    with app.app_context():
+        scores = (
+            WritingScore.query
+            .filter(WritingScore.is_provisional.is_(False))
+            .order_by(WritingScore.created_at.desc())
+            .limit(limit)
+            .all()
+        )
+        # WritingScores keep the essay but not the task prompt
+        return [{'essay_text': score.essay_text, 'task_type': score.task_type} for score in scores]
+
+
+def render(template, essay):
+    return template.render(
+        essay['essay_text'],
+        essay['task_type'],
+        essay.get('prompt'),
+        essay.get('context'),
+        essay.get('instructions'),
+        essay.get('source')
+    )
+
+
+def prompt_tokens(system_prompt, user_prompt):
+    messages = [{'role': 'system', 'content': system_prompt}, {'role': 'user', 'content': user_prompt}]
+    tokens = count_chat_tokens(messages, ANALYSIS_MODEL)
+    if tokens is None:
+        return (len(system_prompt) + len(user_prompt)) // 4, True
+    return tokens, False
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(fraction * (len(ordered) - 1))))]
+
+
+def call_live(system_prompt, user_prompt, essay_text):
+    started = time.perf_counter()
+    response = llm_client.chat_completion(
+        'analysis',
+        model=ANALYSIS_MODEL,
+        messages=[
+            {'role': 'system', 'content': system_prompt},
+            {'role': 'user', 'content': user_prompt}
+        ],
+        temperature=0.3
+    )
+    elapsed = time.perf_counter() - started
+    analysis = parse_analysis_response(response.choices[0].message.content, essay_text)
+    return elapsed, response.usage, analysis['scores']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--essays', help='JSON-lines file of recorded essays')
+    source.add_argument('--from-db', type=int, metavar='N', help='use the N most recent WritingScores')
+    parser.add_argument('--repeat', type=int, default=200, help='renders per essay for the render timing')
+    parser.add_argument('--live', action='store_true', help='also call the OpenAI API with every variant')
+    args = parser.parse_args()
+
+    load_encodings([ANALYSIS_MODEL], wait=True)
+    essays = load_essays_from_file(args.essays) if args.essays else load_essays_from_db(args.from_db)
+    if not essays:
+        raise SystemExit('No essays to benchmark')
+
+    print(f"{len(essays)} essays, model {ANALYSIS_MODEL}")
+    print(f"{'variant':>10} {'version':>11} {'chars':>7} {'tokens':>8} {'render us':>10}"
+          + (f" {'api p50 s':>10} {'api p95 s':>10} {'in tok':>7} {'out tok':>8} {'score MAD':>10}" if args.live else ''))
+
+    reference_scores = {}
+    for name, template in PROMPT_TEMPLATES.items():
+        chars, tokens, render_times = [], [], []
+        estimated = False
+        for essay in essays:
+            system_prompt, user_prompt = render(template, essay)
+            chars.append(len(system_prompt) + len(user_prompt))
+            count, is_estimate = prompt_tokens(system_prompt, user_prompt)
+            tokens.append(count)
+            estimated = estimated or is_estimate
+
+            started = time.perf_counter()
+            for _ in range(args.repeat):
+                render(template, essay)
+            render_times.append((time.perf_counter() - started) / args.repeat * 1e6)
+
+        line = (f"{name:>10} {template.version:>11} {statistics.mean(chars):>7.0f} "
+                f"{('~' if estimated else '') + format(statistics.mean(tokens), '.0f'):>8} "
+                f"{statistics.mean(render_times):>10.1f}")
+
+        if args.live:
+            latencies, input_tokens, output_tokens, differences = [], [], [], []
+            for index, essay in enumerate(essays):
+                elapsed, usage, scores = call_live(*render(template, essay), essay['essay_text'])
+                latencies.append(elapsed)
+                input_tokens.append(usage.prompt_tokens)
+                output_tokens.append(usage.completion_tokens)
+                if name == 'standard':
+                    reference_scores[index] = scores
+                elif index in reference_scores:
+                    differences.extend(abs(scores[key] - reference_scores[index][key]) for key in SCORE_KEYS)
+            mad = f"{statistics.mean(differences):.2f}" if differences else '-'
+            line += (f" {percentile(latencies, 0.5):>10.2f} {percentile(latencies, 0.95):>10.2f} "
+                     f"{statistics.mean(input_tokens):>7.0f} {statistics.mean(output_tokens):>8.0f} {mad:>10}")
+
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
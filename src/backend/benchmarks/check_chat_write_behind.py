@@ -0,0 +1,163 @@
+"""Checks the durability guarantees of the chat write-behind buffer.
+
+Runs chat turns through ``POST /api/chat/gpt`` with ``CHAT_WRITE_BEHIND``
+against a scratch SQLite database (GPT replaced by an instant stub) and
+fails (exit status 1) unless, as documented in
+``services/chat_write_buffer.py``:
+
+* acknowledged messages are stored within a few flush intervals;
+* stopping the buffer writes everything still queued;
+* a row the database rejects is dropped without losing the rest of its batch;
+* while the database rejects writes (another connection holds the write
+  lock) rows stay queued, and they are written once it is back;
+* a full buffer makes turns commit synchronously instead of growing;
+* a user's next turn sees their queued messages in its GPT context.
+
+    cd src && python -m backend.benchmarks.check_chat_write_behind
+"""
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+import types
+
+INTERVAL = 0.2  # seconds
+
+
+class RecordingCompletions:
+    """Instant GPT stub that remembers the messages of the last request."""
+
+    def __init__(self):
+        self.last_messages = None
+
+    def create(self, **kwargs):
+        self.last_messages = kwargs.get('messages')
+        message = types.SimpleNamespace(content='Keep practising linking words.')
+        return types.SimpleNamespace(choices=[types.SimpleNamespace(message=message, finish_reason='stop')], usage=None)
+
+
+def start_app():
+    # Configure before create_app() imports the controllers and services that read Config
+    from backend.config.config import Config
+
+    workdir = tempfile.mkdtemp(prefix='chat_write_behind_')
+    path = os.path.join(workdir, 'chat.db')
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{path}"
+    Config.SQLALCHEMY_ENGINE_OPTIONS = {'connect_args': {'timeout': 0.1}}  # writes fail fast while locked
+    Config.LOG_DIR = os.path.join(workdir, 'logs')
+    Config.SCORING_JOBS_RESUME_ON_START = False
+    Config.CHAT_SUMMARY_ENABLED = False
+    Config.CHAT_WRITE_BEHIND = True
+    Config.CHAT_WRITE_BEHIND_INTERVAL = INTERVAL
+
+    from backend import create_app
+
+    return create_app(), path
+
+
+def main():
+    app, path = start_app()
+
+    from backend.extensions import db
+    from backend.models import AIChat, User
+    from backend.services.chat_write_buffer import chat_write_buffer
+    from backend.services.llm_client import llm_client
+
+    completions = RecordingCompletions()
+    llm_client.client = types.SimpleNamespace(chat=types.SimpleNamespace(completions=completions))
+    with app.app_context():
+        db.create_all()
+        user = User(email='write-behind@example.com', password_hash='x', full_name='Write Behind')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = app.test_client()
+
+    def turn(message):
+        response = client.post('/api/chat/gpt', json={'user_id': user_id, 'message': message})
+        if response.status_code != 201:
+            print(f"HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+            sys.exit(1)
+        return response.get_json()
+
+    def stored():
+        with app.app_context():
+            return {chat.id for chat in AIChat.query.filter_by(user_id=user_id)}
+
+    def acknowledged(result):
+        return {result['user_message']['id'], result['ai_response']['id']}
+
+    def wait_until(predicate, timeout):
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if predicate():
+                return True
+            time.sleep(INTERVAL / 4)
+        return predicate()
+
+    failures = 0
+
+    def check(name, ok):
+        nonlocal failures
+        failures += not ok
+        print(f"{name:<64} {'ok' if ok else 'FAIL'}")
+
+    # Stored within a few intervals
+    ids = acknowledged(turn('How do I start a Task 2 essay?'))
+    check('acknowledged turn is queued, not yet stored', chat_write_buffer.pending_count() == 2 and not ids & stored())
+    check('acknowledged turn is stored within the flush interval', wait_until(lambda: ids <= stored(), INTERVAL * 5))
+
+    # Read-your-writes in the chat context
+    chat_write_buffer.interval = 3600
+    time.sleep(INTERVAL * 2)  # let the flusher pick up the new interval
+    turn('Remember: my target band is 7.5')
+    turn('What was my target band?')
+    check('next turn sees queued messages in its context',
+          any('7.5' in message['content'] for message in completions.last_messages))
+
+    # A rejected row does not hold back its batch
+    ids = acknowledged(turn('Is this essay plan good?'))
+    queued = chat_write_buffer.pending_count()
+    chat_write_buffer.add(chat_write_buffer.pending_for(user_id, 1))  # same primary key twice in one batch
+    written = chat_write_buffer.flush()
+    check('rejected row is dropped, the rest of its batch is stored',
+          written == queued and ids <= stored() and chat_write_buffer.pending_count() == 0)
+
+    # Database not writable: rows stay queued and are retried
+    chat_write_buffer.interval = INTERVAL
+    chat_write_buffer._wake.set()
+    lock = sqlite3.connect(path, isolation_level=None)
+    lock.execute('BEGIN IMMEDIATE')  # reads still work, writes time out
+    ids = acknowledged(turn('Can you check my introduction?'))
+    time.sleep(INTERVAL * 4)
+    check('rows stay queued while the database rejects writes', chat_write_buffer.pending_count() == 2)
+    lock.execute('ROLLBACK')
+    lock.close()
+    check('queued rows are stored once writes succeed again', wait_until(lambda: ids <= stored(), INTERVAL * 10))
+
+    # Bounded memory: a full buffer falls back to synchronous commits
+    chat_write_buffer.interval = 3600
+    chat_write_buffer._wake.set()
+    time.sleep(INTERVAL * 2)
+    max_pending = chat_write_buffer.max_pending
+    chat_write_buffer.max_pending = 3
+    first = acknowledged(turn('Question one'))
+    second = acknowledged(turn('Question two'))
+    check('turn beyond max_pending is committed synchronously',
+          chat_write_buffer.pending_count() == 2 and second <= stored() and not first & stored())
+    chat_write_buffer.max_pending = max_pending
+
+    # Clean shutdown writes the queue
+    ids = acknowledged(turn('Thanks, see you tomorrow'))
+    chat_write_buffer.stop()
+    check('stop() writes everything still queued',
+          chat_write_buffer.pending_count() == 0 and (first | ids) <= stored())
+
+    print(f"\n{failures} check(s) failed" if failures else "\nAll write-behind guarantees hold")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
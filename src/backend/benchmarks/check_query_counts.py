@@ -0,0 +1,116 @@
+"""Query-count regression check for the score history endpoints.
+
+Seeds two users in a scratch SQLite database, one with a short and one with
+a long history, calls each endpoint below for both and fails (exit status 1)
+when the number of SQL statements differs, i.e. when a response issues
+queries per row (lazy loads) instead of a fixed number per request.
+
+    cd src && python -m backend.benchmarks.check_query_counts --small 3 --large 60
+"""
+import argparse
+import os
+import sys
+import tempfile
+import threading
+from datetime import timedelta
+
+ENDPOINTS = (
+    '/api/writing/combined-scores',
+    '/api/writing/combined-scores?fields=summary',
+    '/api/writing/combined-scores?limit=20',
+    '/api/writing/combined-scores?limit=20&fields=summary',
+    '/api/writing/scores',
+    '/api/writing/scores?limit=20&fields=summary',
+)
+
+
+def start_app():
+    # Configure before create_app() imports the controllers and services that read Config
+    from backend.config.config import Config
+
+    workdir = tempfile.mkdtemp(prefix='query_counts_')
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'counts.db')}"
+    Config.LOG_DIR = os.path.join(workdir, 'logs')
+    Config.SCORING_JOBS_RESUME_ON_START = False
+
+    from backend import create_app
+
+    return create_app()
+
+
+def seed_user(index, combined_rows):
+    """A user with ``combined_rows`` Task 1/Task 2 pairs and a combined score for each."""
+    from backend.extensions import db
+    from backend.models import CombinedWritingScore, User, WritingScore, local_now
+
+    user = User(email=f"counts{index}@example.com", password_hash='x', full_name=f"Count User {index}")
+    db.session.add(user)
+    db.session.flush()
+
+    now = local_now()
+    for row in range(combined_rows):
+        created_at = now - timedelta(minutes=row)
+        scores = [
+            WritingScore(
+                user_id=user.id, task_type=task_type, essay_text='essay ' * 250, word_count=250,
+                task_achievement=6.0, coherence_cohesion=6.0, lexical_resource=6.0, grammatical_range=6.0,
+                overall_score=6.0, adjusted_score=6.0, corrections={'grammar': [], 'vocabulary': [], 'structure': []},
+                created_at=created_at
+            )
+            for task_type in ('task1', 'task2')
+        ]
+        db.session.add_all(scores)
+        db.session.flush()
+        db.session.add(CombinedWritingScore(
+            user_id=user.id, task1_score_id=scores[0].id, task2_score_id=scores[1].id,
+            combined_score=6.0, created_at=created_at
+        ))
+    db.session.commit()
+    return user.id
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--small', type=int, default=3, help='combined scores of the first user')
+    parser.add_argument('--large', type=int, default=60, help='combined scores of the second user')
+    args = parser.parse_args()
+
+    app = start_app()
+
+    from flask_jwt_extended import create_access_token
+    from sqlalchemy import event
+    from backend.extensions import db
+
+    counter = threading.local()
+    with app.app_context():
+        db.create_all()
+        users = {size: seed_user(index, size) for index, size in enumerate((args.small, args.large))}
+        tokens = {size: create_access_token(identity=user_id) for size, user_id in users.items()}
+
+        @event.listens_for(db.engine, 'before_cursor_execute')
+        def count_query(conn, cursor, statement, parameters, context, executemany):
+            counter.queries = getattr(counter, 'queries', 0) + 1
+
+    client = app.test_client()
+    failures = 0
+    print(f"{'endpoint':<56} {args.small:>6} rows {args.large:>6} rows")
+    for endpoint in ENDPOINTS:
+        counts = {}
+        for size, token in tokens.items():
+            counter.queries = 0
+            response = client.get(endpoint, headers={'Authorization': f"Bearer {token}"})
+            if response.status_code != 200:
+                print(f"{endpoint}: HTTP {response.status_code} {response.get_data(as_text=True)[:200]}")
+                sys.exit(1)
+            counts[size] = counter.queries
+        ok = counts[args.small] == counts[args.large]
+        failures += not ok
+        print(f"{endpoint:<56} {counts[args.small]:>6} q    {counts[args.large]:>6} q  {'ok' if ok else 'FAIL'}")
+
+    print(f"\n{failures} endpoint(s) issue queries per row" if failures
+          else "\nQuery counts do not depend on the number of rows")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+"""Query-plan regression check for the hot queries.
+
+Creates the schema from the models in a scratch database, seeds it, runs
+EXPLAIN on each hot query and fails (exit status 1) when any of them reads a
+whole table or sorts rows itself instead of walking an index. Walking a
+whole index in order is accepted only for queries marked as stopping after a
+LIMIT (the few newest rows):
+
+* SQLite (default, a temporary file): ``SCAN <table>`` or ``USE TEMP B-TREE``
+  in ``EXPLAIN QUERY PLAN``;
+* MySQL (``--database-url mysql+pymysql://...``, an EMPTY scratch database):
+  access type ``ALL``/``index`` or ``Using filesort`` in ``EXPLAIN``.
+
+    cd src && python -m backend.benchmarks.check_query_plans
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+from sqlalchemy import desc, func, or_, and_
+
+
+def start_app(database_url):
+    # Configure before create_app() imports the controllers and services that read Config
+    from backend.config.config import Config
+
+    Config.SQLALCHEMY_DATABASE_URI = database_url
+    Config.LOG_DIR = tempfile.mkdtemp(prefix='query_plans_logs_')
+    Config.SCORING_JOBS_RESUME_ON_START = False
+
+    from backend import create_app
+
+    return create_app()
+
+
+def seed(users, rows_per_user):
+    from backend.extensions import db
+    from backend.models import (
+        AIChat, CombinedWritingScore, Payment, Subscription, User, WritingScore, local_now
+    )
+
+    rng = random.Random(1)
+    now = local_now()
+    user_ids = []
+    for index in range(users):
+        user = User(email=f"plan{index}@example.com", password_hash='x', full_name=f"Plan User {index}")
+        db.session.add(user)
+        db.session.flush()
+        user_ids.append(user.id)
+
+        db.session.add(Subscription(
+            user_id=user.id,
+            plan=rng.choice(['free', 'student', 'pro']),
+            status=rng.choice(['active', 'expired', 'cancelled'])
+        ))
+        for row in range(rows_per_user):
+            created_at = now - timedelta(hours=rng.randint(0, 24 * 365))
+            task_type = 'task1' if row % 3 == 0 else 'task2'
+            db.session.add(WritingScore(
+                user_id=user.id, task_type=task_type, essay_text='essay', word_count=250,
+                task_achievement=6.0, coherence_cohesion=6.0, lexical_resource=6.0, grammatical_range=6.0,
+                overall_score=6.0, adjusted_score=6.0, is_provisional=row % 10 == 0, created_at=created_at
+            ))
+            db.session.add(AIChat(user_id=user.id, message='hello', role=rng.choice(['user', 'assistant']), created_at=created_at))
+            db.session.add(Payment(
+                user_id=user.id, amount=Decimal('9.99'), method=rng.choice(['credit_card', 'paypal', 'momo', 'vn_pay']),
+                payment_status=rng.choice(['success', 'failed', 'pending']), paid_at=created_at
+            ))
+            db.session.add(CombinedWritingScore(user_id=user.id, combined_score=6.0, created_at=created_at))
+        db.session.commit()
+    return user_ids
+
+
+def hot_queries(user_id):
+    """(name, query, limited_index_walk) for each query the app runs per request or per dashboard load.
+
+    ``limited_index_walk`` marks queries that may read an index in order from
+    its end because they stop after a small LIMIT.
+    """
+    from backend.extensions import db
+    from backend.models import AIChat, CombinedWritingScore, Payment, Subscription, User, WritingScore, local_now
+
+    now = local_now()
+    return [
+        ('latest score per task (LatestWritingScores backfill)', WritingScore.query.filter_by(
+            user_id=user_id, task_type='task2', is_provisional=False
+        ).order_by(WritingScore.created_at.desc()).limit(1), False),
+        ('score history page (get_user_scores)', WritingScore.query.filter_by(user_id=user_id).filter(or_(
+            WritingScore.created_at < now,
+            and_(WritingScore.created_at == now, WritingScore.id < 'z')
+        )).order_by(WritingScore.created_at.desc(), WritingScore.id.desc()).limit(21), False),
+        ('combined score history (get_user_combined_scores)', CombinedWritingScore.query.filter_by(
+            user_id=user_id
+        ).order_by(CombinedWritingScore.created_at.desc()), False),
+        ('chat context (chat_with_gpt)', AIChat.query.filter_by(
+            user_id=user_id
+        ).order_by(AIChat.seq.desc()).limit(5), False),
+        ('chat history (get_chat_history)', AIChat.query.filter_by(
+            user_id=user_id
+        ).order_by(AIChat.seq.desc()), False),
+        ('active subscription (get_user_data)', Subscription.query.filter_by(
+            user_id=user_id, status='active'
+        ).limit(1), False),
+        ('total revenue (admin stats)', db.session.query(func.sum(Payment.amount)).filter(
+            Payment.payment_status == 'success'
+        ), False),
+        ('revenue last 12 months (admin stats)', db.session.query(Payment.paid_at, Payment.amount).filter(
+            Payment.payment_status == 'success',
+            Payment.paid_at >= now - timedelta(days=365)
+        ), False),
+        ('recent successful payments (admin stats)', Payment.query.join(User).filter(
+            Payment.payment_status == 'success'
+        ).order_by(desc(Payment.paid_at)).limit(5), False),
+        ('recent payments (admin dashboard)', db.session.query(Payment).join(
+            User, Payment.user_id == User.id
+        ).order_by(desc(Payment.paid_at)).limit(5), True),
+    ]
+
+
+def explain(connection, statement, limited_index_walk=False):
+    """Return (plan lines, problems) for one statement on the connection's dialect."""
+    compiled = statement.statement.compile(dialect=connection.dialect, compile_kwargs={'literal_binds': True})
+    sql = str(compiled)
+    problems = []
+
+    if connection.dialect.name == 'sqlite':
+        rows = connection.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}").fetchall()
+        lines = [row[-1] for row in rows]
+        for detail in lines:
+            index_walk = detail.startswith('SCAN ') and ' USING ' in detail and 'INDEX' in detail
+            if (detail.startswith('SCAN ') and not (limited_index_walk and index_walk)) or detail.startswith('USE TEMP B-TREE'):
+                problems.append(detail)
+        return lines, problems
+
+    result = connection.exec_driver_sql(f"EXPLAIN {sql}")
+    columns = list(result.keys())
+    lines = []
+    for row in result.fetchall():
+        plan = dict(zip(columns, row))
+        lines.append(f"{plan.get('table')}: type={plan.get('type')} key={plan.get('key')} extra={plan.get('Extra')}")
+        if plan.get('type') == 'ALL' or (plan.get('type') == 'index' and not limited_index_walk):
+            problems.append(f"full scan of {plan.get('table')}")
+        if 'Using filesort' in (plan.get('Extra') or ''):
+            problems.append(f"filesort on {plan.get('table')}")
+    return lines, problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--database-url', help='scratch database to create and seed (default: temporary SQLite file)')
+    parser.add_argument('--users', type=int, default=50)
+    parser.add_argument('--rows-per-user', type=int, default=40)
+    parser.add_argument('--verbose', action='store_true', help='print every plan, not only failing ones')
+    args = parser.parse_args()
+
+    database_url = args.database_url or f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='query_plans_'), 'plans.db')}"
+    app = start_app(database_url)
+
+    from backend.extensions import db
+
+    failures = 0
+    with app.app_context():
+        db.create_all()
+        user_ids = seed(args.users, args.rows_per_user)
+        with db.engine.connect() as connection:
+            # Give the planner real statistics, as a long-running database would have
+            connection.exec_driver_sql('ANALYZE' if connection.dialect.name == 'sqlite' else
+                                       'ANALYZE TABLE WritingScores, CombinedWritingScores, AIChats, Subscriptions, Payments')
+            queries = hot_queries(user_ids[0])
+            for name, statement, limited_index_walk in queries:
+                lines, problems = explain(connection, statement, limited_index_walk)
+                print(f"{'FAIL' if problems else 'ok  '} {name}" + (f": {'; '.join(problems)}" if problems else ''))
+                if problems or args.verbose:
+                    for line in lines:
+                        print(f"       {line}")
+                failures += bool(problems)
+
+    print(f"\n{failures} of {len(queries)} hot queries scan or sort" if failures
+          else f"\nAll {len(queries)} hot queries use an index without sorting")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,109 @@
+"""Checks that the admin dashboard rollups follow ORM writes.
+
+Makes inserts, updates and deletes of Users, Payments and Subscriptions
+through the ORM against a scratch SQLite database (with foreign keys
+enforced, so ``ON DELETE CASCADE`` behaves as on MySQL), and after each step
+compares the incrementally maintained rollups (``services/rollups.py``) with
+a full ``rebuild_rollups()``. Fails (exit status 1) on any difference.
+
+    cd src && python -m backend.benchmarks.check_rollups
+"""
+import os
+import sys
+import tempfile
+from datetime import timedelta
+from decimal import Decimal
+
+
+def start_app():
+    # Configure before create_app() imports the controllers and services that read Config
+    from backend.config.config import Config
+
+    workdir = tempfile.mkdtemp(prefix='rollups_')
+    Config.SQLALCHEMY_DATABASE_URI = f"sqlite:///{os.path.join(workdir, 'rollups.db')}"
+    Config.LOG_DIR = os.path.join(workdir, 'logs')
+    Config.SCORING_JOBS_RESUME_ON_START = False
+    Config.CHAT_SUMMARY_ENABLED = False
+
+    from backend import create_app
+
+    return create_app()
+
+
+def main():
+    app = start_app()
+
+    from sqlalchemy import event
+    from backend.extensions import db
+    from backend.models import DailyPaymentRollup, DailySignupRollup, Payment, Subscription, SubscriptionRollup, User, local_now
+    from backend.services.rollups import rebuild_rollups
+
+    def snapshot():
+        db.session.expire_all()
+        return (
+            {(row.day, row.payment_status, row.method): (row.payment_count, Decimal(row.amount))
+             for row in DailyPaymentRollup.query if row.payment_count or row.amount},
+            {row.day: row.signup_count for row in DailySignupRollup.query if row.signup_count},
+            {(row.plan, row.status): row.subscription_count for row in SubscriptionRollup.query if row.subscription_count},
+        )
+
+    failures = 0
+
+    def check(name):
+        nonlocal failures
+        incremental = snapshot()
+        rebuild_rollups()
+        ok = incremental == snapshot()
+        failures += not ok
+        print(f"{name:<64} {'ok' if ok else 'FAIL'}")
+
+    with app.app_context():
+        @event.listens_for(db.engine, 'connect')
+        def enforce_foreign_keys(dbapi_connection, connection_record):
+            dbapi_connection.execute('PRAGMA foreign_keys=ON')
+
+        db.engine.dispose()
+        db.create_all()
+
+        now = local_now()
+        users = [User(email=f"rollups{index}@example.com", password_hash='x', created_at=now - timedelta(days=index))
+                 for index in range(3)]
+        db.session.add_all(users)
+        db.session.flush()
+        for index, user in enumerate(users):
+            db.session.add(Subscription(user_id=user.id, plan='pro' if index else 'student'))
+            db.session.add(Subscription(user_id=user.id, plan='free', status='expired'))
+            db.session.add(Payment(user_id=user.id, amount=Decimal('9.99'), method='momo', payment_status='success',
+                                   paid_at=now - timedelta(days=index)))
+            db.session.add(Payment(user_id=user.id, amount=Decimal('4.50'), method='paypal'))
+        db.session.commit()
+        check('inserts')
+
+        payment = Payment.query.filter_by(payment_status='pending').first()
+        payment.payment_status = 'success'
+        payment.paid_at = now - timedelta(days=40)
+        Subscription.query.filter_by(plan='pro').first().status = 'cancelled'
+        db.session.commit()
+        check('updates of rollup keys and amounts')
+
+        db.session.delete(Payment.query.filter_by(method='momo').first())
+        db.session.delete(Subscription.query.filter_by(plan='free').first())
+        db.session.commit()
+        check('deletes')
+
+        # As admin_controller.delete_user does: the user's rows would otherwise go by ON DELETE CASCADE
+        db.session.delete(db.session.get(User, users[1].id))
+        db.session.commit()
+        cascaded = (Payment.query.filter_by(user_id=users[1].id).count()
+                    + Subscription.query.filter_by(user_id=users[1].id).count())
+        if cascaded:
+            print(f"{cascaded} payments and subscriptions of the deleted user remain")
+            failures += 1
+        check('user deleted with their payments and subscriptions')
+
+    print(f"\n{failures} check(s) failed" if failures else "\nRollups match a full rebuild")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
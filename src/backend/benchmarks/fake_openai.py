@@ -0,0 +1,200 @@
+"""Local stub of the OpenAI chat-completions API for benchmarks.
+
+Answers ``POST /v1/chat/completions`` (blocking and ``stream=True``) after a
+configurable delay. Essay analysis requests, recognised by the examiner
+system prompt, get a valid analysis JSON whose corrections quote the
+submitted essay, so highlighting does real work; every other request gets a
+chat reply of ``chat_words`` words. Usage blocks report approximate token
+counts (characters / 4).
+
+Point the app at it with ``OPENAI_BASE_URL=http://127.0.0.1:<port>/v1``.
+
+    cd src && python -m backend.benchmarks.fake_openai --port 8765 --latency 2 --corrections 20
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ESSAY_MARKER = "**STUDENT'S ESSAY:**\n"
+FILLER = (
+    "practice writing regularly and read model answers to widen your range of vocabulary "
+    "while paying attention to paragraph structure linking words and accurate grammar"
+).split()
+
+
+class FakeOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # keep-alive, like the real API
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status, body):
+        payload = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.rstrip('/').endswith('/chat/completions'):
+            self._send_json(404, {'error': {'message': f'Unknown path {self.path}'}})
+            return
+
+        request = json.loads(body or b'{}')
+        server = self.server
+        with server.lock:
+            server.request_count += 1
+
+        time.sleep(max(0.0, random.gauss(server.latency, server.jitter)))
+
+        messages = request.get('messages', [])
+        content = server.build_content(messages)
+        prompt_tokens = sum(len(message.get('content') or '') for message in messages) // 4
+        completion_tokens = len(content) // 4
+        model = request.get('model', 'gpt-4')
+
+        if request.get('stream'):
+            self._stream(model, content)
+            return
+
+        self._send_json(200, {
+            'id': f'chatcmpl-{uuid.uuid4().hex}',
+            'object': 'chat.completion',
+            'created': int(time.time()),
+            'model': model,
+            'choices': [{
+                'index': 0,
+                'message': {'role': 'assistant', 'content': content},
+                'finish_reason': 'stop'
+            }],
+            'usage': {
+                'prompt_tokens': prompt_tokens,
+                'completion_tokens': completion_tokens,
+                'total_tokens': prompt_tokens + completion_tokens
+            }
+        })
+
+    def _stream(self, model, content):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        completion_id = f'chatcmpl-{uuid.uuid4().hex}'
+        step = self.server.chunk_chars
+        delay = self.server.chunk_delay
+        for start in range(0, len(content), step):
+            chunk = {
+                'id': completion_id,
+                'object': 'chat.completion.chunk',
+                'created': int(time.time()),
+                'model': model,
+                'choices': [{'index': 0, 'delta': {'content': content[start:start + step]}, 'finish_reason': None}]
+            }
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode('utf-8'))
+            self.wfile.flush()
+            if delay:
+                time.sleep(delay)
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.wfile.flush()
+        self.close_connection = True
+
+
+class FakeOpenAIServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port=0, latency=1.0, jitter=0.0, corrections=10, chat_words=150,
+                 chunk_chars=24, chunk_delay=0.0, scores=None):
+        super().__init__(('127.0.0.1', port), FakeOpenAIHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.corrections = corrections
+        self.chat_words = chat_words
+        self.chunk_chars = chunk_chars
+        self.chunk_delay = chunk_delay
+        self.scores = scores or {
+            'task_achievement': 6.0,
+            'coherence_cohesion': 6.5,
+            'lexical_resource': 6.0,
+            'grammatical_range': 5.5
+        }
+        self.lock = threading.Lock()
+        self.request_count = 0
+
+    @property
+    def base_url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/v1"
+
+    def build_content(self, messages):
+        system = messages[0].get('content', '') if messages else ''
+        if 'IELTS examiner' in system:
+            return json.dumps(self.build_analysis(messages[-1].get('content', '')))
+        rng = random.Random(len(messages))
+        return ' '.join(rng.choice(FILLER) for _ in range(self.chat_words)).capitalize() + '.'
+
+    def build_analysis(self, user_prompt):
+        essay = user_prompt.split(ESSAY_MARKER, 1)[1].split('\n**', 1)[0] if ESSAY_MARKER in user_prompt else ''
+        words = essay.split()
+        rng = random.Random(hash(essay))
+
+        corrections = {'grammar': [], 'vocabulary': [], 'structure': []}
+        for index in range(self.corrections if len(words) > 4 else 0):
+            start = rng.randrange(0, len(words) - 3)
+            snippet = ' '.join(words[start:start + rng.randint(1, 3)])
+            if index % 3 == 0:
+                corrections['vocabulary'].append({'original': snippet, 'suggestion': snippet, 'explanation': 'Consider a more precise word.'})
+            elif index % 3 == 1:
+                corrections['grammar'].append({'original': snippet, 'correction': snippet, 'explanation': 'Check agreement and tense.'})
+            else:
+                corrections['structure'].append({'issue': 'Long paragraph', 'suggestion': 'Split the argument', 'example': snippet})
+
+        feedback = ' '.join(FILLER[:20])
+        return {
+            'scores': dict(self.scores),
+            'feedback': {key: feedback for key in self.scores},
+            'corrections': corrections
+        }
+
+
+def start_fake_openai(**options):
+    """Start a FakeOpenAIServer on a background thread and return it (``server.shutdown()`` to stop)."""
+    server = FakeOpenAIServer(**options)
+    threading.Thread(target=server.serve_forever, name='fake-openai', daemon=True).start()
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=1.0, help='mean seconds before a response starts')
+    parser.add_argument('--jitter', type=float, default=0.0, help='standard deviation of the latency')
+    parser.add_argument('--corrections', type=int, default=10, help='corrections per essay analysis')
+    parser.add_argument('--chat-words', type=int, default=150, help='words per chat reply')
+    parser.add_argument('--chunk-chars', type=int, default=24, help='characters per streamed chunk')
+    parser.add_argument('--chunk-delay', type=float, default=0.0, help='seconds between streamed chunks')
+    args = parser.parse_args()
+
+    server = FakeOpenAIServer(
+        port=args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        corrections=args.corrections,
+        chat_words=args.chat_words,
+        chunk_chars=args.chunk_chars,
+        chunk_delay=args.chunk_delay
+    )
+    print(f"Fake OpenAI API listening on {server.base_url}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -20,7 +20,107 @@ class Config:
     
     # OpenAI config
     OPENAI_API_KEY = os.environ.get('OPENAI_API_KEY')
-    
+    OPENAI_BASE_URL = os.environ.get('OPENAI_BASE_URL')  # e.g. a proxy, or benchmarks/fake_openai.py
+
+    # Shared LLM client (services/llm_client.py): timeouts in seconds per route
+    LLM_CONNECT_TIMEOUT = float(os.environ.get('LLM_CONNECT_TIMEOUT', 5))
+    LLM_TIMEOUT_ANALYSIS = float(os.environ.get('LLM_TIMEOUT_ANALYSIS', 60))
+    LLM_TIMEOUT_STREAM = float(os.environ.get('LLM_TIMEOUT_STREAM', 30))  # max wait between streamed chunks
+    LLM_TIMEOUT_CHAT = float(os.environ.get('LLM_TIMEOUT_CHAT', 30))
+    LLM_MAX_RETRIES = int(os.environ.get('LLM_MAX_RETRIES', 2))
+    LLM_BACKOFF_BASE = float(os.environ.get('LLM_BACKOFF_BASE', 0.5))
+    LLM_BACKOFF_MAX = float(os.environ.get('LLM_BACKOFF_MAX', 8))
+    LLM_BREAKER_FAILURES = int(os.environ.get('LLM_BREAKER_FAILURES', 5))  # consecutive failures before failing fast
+    LLM_BREAKER_RESET = float(os.environ.get('LLM_BREAKER_RESET', 30))  # seconds before a probe request is let through
+    LLM_POOL_MAX_CONNECTIONS = int(os.environ.get('LLM_POOL_MAX_CONNECTIONS', 50))
+    LLM_POOL_MAX_KEEPALIVE = int(os.environ.get('LLM_POOL_MAX_KEEPALIVE', 20))
+    LLM_POOL_KEEPALIVE_EXPIRY = float(os.environ.get('LLM_POOL_KEEPALIVE_EXPIRY', 60))
+    # Send a duplicate request after this many seconds without an answer (unset = no hedging; doubles cost on slow calls)
+    LLM_HEDGE_ANALYSIS_AFTER = float(os.environ['LLM_HEDGE_ANALYSIS_AFTER']) if os.environ.get('LLM_HEDGE_ANALYSIS_AFTER') else None
+    LLM_HEDGE_CHAT_AFTER = float(os.environ['LLM_HEDGE_CHAT_AFTER']) if os.environ.get('LLM_HEDGE_CHAT_AFTER') else None
+
+    # Essay analysis result cache (in-process LRU + AnalysisCache table)
+    ANALYSIS_CACHE_ENABLED = os.environ.get('ANALYSIS_CACHE_ENABLED', 'true').lower() == 'true'
+    ANALYSIS_CACHE_MAX_ENTRIES = int(os.environ.get('ANALYSIS_CACHE_MAX_ENTRIES', 512))
+    ANALYSIS_CACHE_TTL = int(os.environ.get('ANALYSIS_CACHE_TTL', 6 * 3600))  # seconds, memory tier
+    ANALYSIS_CACHE_DB_TTL = int(os.environ.get('ANALYSIS_CACHE_DB_TTL', 30 * 24 * 3600))  # seconds, DB tier
+
+    # Asynchronous scoring jobs (in-process worker pool, state kept in ScoringJobs)
+    SCORING_JOB_WORKERS = int(os.environ.get('SCORING_JOB_WORKERS', 4))
+    SCORING_JOB_MAX_PENDING = int(os.environ.get('SCORING_JOB_MAX_PENDING', 100))
+    SCORING_JOB_MAX_WAIT = int(os.environ.get('SCORING_JOB_MAX_WAIT', 30))  # seconds, long-poll cap
+    SCORING_JOB_STALE_AFTER = int(os.environ.get('SCORING_JOB_STALE_AFTER', 600))  # seconds before a running job is requeued
+    SCORING_JOBS_RESUME_ON_START = os.environ.get('SCORING_JOBS_RESUME_ON_START', 'true').lower() == 'true'
+
+    # Credit reservations still open after this long (a crashed request) are released
+    CREDIT_RESERVATION_TTL = int(os.environ.get('CREDIT_RESERVATION_TTL', 900))  # seconds
+
+    # Batch scoring (POST /api/writing/score/batch)
+    SCORING_BATCH_MAX_ITEMS = int(os.environ.get('SCORING_BATCH_MAX_ITEMS', 60))
+    SCORING_BATCH_CONCURRENCY = int(os.environ.get('SCORING_BATCH_CONCURRENCY', 10))
+
+    # Essay analysis prompt template ('standard' or 'compact', see services/prompt_templates.py)
+    ANALYSIS_PROMPT_VARIANT = os.environ.get('ANALYSIS_PROMPT_VARIANT', 'standard')
+
+    # Local pre-scoring gate run before GPT; each rule is 'off', 'annotate' or 'provisional'
+    PRESCORING_ENABLED = os.environ.get('PRESCORING_ENABLED', 'true').lower() == 'true'
+    PRESCORING_SHORT_RATIO = float(os.environ.get('PRESCORING_SHORT_RATIO', 0.4))  # of the task's minimum word count
+    PRESCORING_SHORT_ACTION = os.environ.get('PRESCORING_SHORT_ACTION', 'provisional')
+    PRESCORING_MIN_SIMILARITY = float(os.environ.get('PRESCORING_MIN_SIMILARITY', 0.05))
+    PRESCORING_MIN_PROMPT_TERMS = int(os.environ.get('PRESCORING_MIN_PROMPT_TERMS', 5))
+    PRESCORING_OFF_TOPIC_ACTION = os.environ.get('PRESCORING_OFF_TOPIC_ACTION', 'annotate')
+    PRESCORING_FORMAT_ACTION = os.environ.get('PRESCORING_FORMAT_ACTION', 'annotate')
+    PRESCORING_PROVISIONAL_MAX_BAND = float(os.environ.get('PRESCORING_PROVISIONAL_MAX_BAND', 5.0))
+
+    # GPT analysis logging (JSON lines, one file per worker process)
+    LOG_DIR = os.environ.get('LOG_DIR') or os.path.join(os.path.dirname(os.path.dirname(__file__)), 'logs')
+    GPT_LOG_MAX_BYTES = int(os.environ.get('GPT_LOG_MAX_BYTES', 20 * 1024 * 1024))
+    GPT_LOG_BACKUP_COUNT = int(os.environ.get('GPT_LOG_BACKUP_COUNT', 14))
+    GPT_LOG_QUEUE_SIZE = int(os.environ.get('GPT_LOG_QUEUE_SIZE', 10000))  # records are dropped, not blocked on, past this
+
+    # GET /api/writing/scores cursor pagination
+    SCORES_PAGE_DEFAULT = int(os.environ.get('SCORES_PAGE_DEFAULT', 20))
+    SCORES_PAGE_MAX = int(os.environ.get('SCORES_PAGE_MAX', 100))
+
+    # Chat messages written behind the request in batches (services/chat_write_buffer.py); off by
+    # default because queued messages are lost if the process dies
+    CHAT_WRITE_BEHIND = os.environ.get('CHAT_WRITE_BEHIND', 'false').lower() == 'true'
+    CHAT_WRITE_BEHIND_BATCH = int(os.environ.get('CHAT_WRITE_BEHIND_BATCH', 100))
+    CHAT_WRITE_BEHIND_INTERVAL = float(os.environ.get('CHAT_WRITE_BEHIND_INTERVAL', 0.5))  # seconds
+    CHAT_WRITE_BEHIND_MAX_PENDING = int(os.environ.get('CHAT_WRITE_BEHIND_MAX_PENDING', 5000))
+
+    # GET /api/chat/<user_id> cursor pagination
+    CHAT_HISTORY_PAGE_DEFAULT = int(os.environ.get('CHAT_HISTORY_PAGE_DEFAULT', 50))
+    CHAT_HISTORY_PAGE_MAX = int(os.environ.get('CHAT_HISTORY_PAGE_MAX', 200))
+
+    # Admin statistics response cache (services/response_cache.py), per process
+    ADMIN_STATS_CACHE_ENABLED = os.environ.get('ADMIN_STATS_CACHE_ENABLED', 'true').lower() == 'true'
+    ADMIN_STATS_CACHE_TTL = int(os.environ.get('ADMIN_STATS_CACHE_TTL', 30))  # seconds
+
+    # Chat context (services/chat_context.py): history sent to GPT is filled newest first up to
+    # CHAT_CONTEXT_TOKENS (summary + history + new message); older turns are folded into a
+    # per-user rolling summary by a background worker
+    CHAT_CONTEXT_TOKENS = int(os.environ.get('CHAT_CONTEXT_TOKENS', 3000))
+    CHAT_CONTEXT_MAX_MESSAGES = int(os.environ.get('CHAT_CONTEXT_MAX_MESSAGES', 50))  # rows read per turn
+    CHAT_SUMMARY_ENABLED = os.environ.get('CHAT_SUMMARY_ENABLED', 'true').lower() == 'true'
+    CHAT_SUMMARY_MIN_MESSAGES = int(os.environ.get('CHAT_SUMMARY_MIN_MESSAGES', 4))  # unsummarized messages before an update
+    CHAT_SUMMARY_SOURCE_TOKENS = int(os.environ.get('CHAT_SUMMARY_SOURCE_TOKENS', 4000))  # new messages read per update
+    CHAT_SUMMARY_MAX_TOKENS = int(os.environ.get('CHAT_SUMMARY_MAX_TOKENS', 300))
+    CHAT_SUMMARY_WORKERS = int(os.environ.get('CHAT_SUMMARY_WORKERS', 2))
+
+    # Chat FAQ cache (services/chat_faq.py): near-duplicates of curated or frequently asked
+    # questions are answered locally instead of by GPT
+    CHAT_FAQ_ENABLED = os.environ.get('CHAT_FAQ_ENABLED', 'true').lower() == 'true'
+    CHAT_FAQ_MIN_SIMILARITY = float(os.environ.get('CHAT_FAQ_MIN_SIMILARITY', 0.8))  # TF-IDF cosine
+    CHAT_FAQ_MAX_QUESTION_CHARS = int(os.environ.get('CHAT_FAQ_MAX_QUESTION_CHARS', 300))  # longer messages always go to GPT
+    CHAT_FAQ_TTL = int(os.environ.get('CHAT_FAQ_TTL', 7 * 24 * 3600))  # seconds, harvested entries from approval
+    CHAT_FAQ_RELOAD_INTERVAL = int(os.environ.get('CHAT_FAQ_RELOAD_INTERVAL', 60))  # seconds before other processes see edits
+    CHAT_FAQ_HARVEST_DAYS = int(os.environ.get('CHAT_FAQ_HARVEST_DAYS', 30))
+    CHAT_FAQ_HARVEST_MIN_USERS = int(os.environ.get('CHAT_FAQ_HARVEST_MIN_USERS', 3))  # distinct askers per entry
+
+    # Rows fetched per round trip by the admin CSV exports (services/csv_export.py)
+    ADMIN_EXPORT_BATCH_SIZE = int(os.environ.get('ADMIN_EXPORT_BATCH_SIZE', 1000))
+
     # Payment config
     STRIPE_SECRET_KEY = os.environ.get('STRIPE_SECRET_KEY')
     STRIPE_PUBLISHABLE_KEY = os.environ.get('STRIPE_PUBLISHABLE_KEY')
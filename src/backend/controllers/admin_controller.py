@@ -1,11 +1,18 @@
 from flask import jsonify, request
+from ..config.config import Config
 from ..extensions import db
-from ..models import User, Subscription, Payment, WritingScore, Essay
+from ..models import User, Subscription, Payment, WritingScore, Essay, UserCredits, ChatFaqEntry
 from datetime import datetime, timedelta
-from sqlalchemy import func, extract, text, desc, and_
+from sqlalchemy import func, extract, text, desc, and_, select
 from sqlalchemy.sql.expression import func as sql_func, case
 from ..schemas import users_schema, user_schema, payments_schema
 from sqlalchemy.orm import aliased
+from ..services.analysis_cache import analysis_cache
+from ..services.chat_faq import chat_faq_cache
+from ..services.llm_client import llm_client
+from ..services import admin_search, rollups
+from ..services.csv_export import csv_response
+from ..models import local_now
 
 # Custom date_trunc function for MySQL
 def mysql_date_trunc(interval, field):
@@ -23,15 +30,13 @@ def get_users():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
-        search = request.args.get('search', '')
+        search = admin_search.normalize_term(request.args.get('search'))
         
         query = User.query
         
         if search:
-            search = f"%{search}%"
-            query = query.filter(
-                (User.email.ilike(search)) | 
-                (User.full_name.ilike(search))
+            query = query.filter(admin_search.user_search_condition(search)).order_by(
+                *admin_search.user_search_ranking(search), User.created_at.desc()
             )
             
         users = query.paginate(page=page, per_page=per_page, error_out=False)
@@ -86,12 +91,46 @@ def delete_user(user_id):
         db.session.rollback()
         return jsonify({'message': f'Error deleting user: {str(e)}'}), 500
 
+def filter_orders(query, status=None, start_date=None, end_date=None, user_id=None, subscription_plan=None, search=None):
+    """Order list filters, shared by get_orders and export_orders.
+
+    ``query`` selects from Subscriptions joined to Users; dates are
+    'YYYY-MM-DD' strings (ignored when malformed) and ``search`` a normalized term.
+    """
+    if status:
+        query = query.filter(Subscription.status == status)
+        
+    if user_id:
+        query = query.filter(Subscription.user_id == user_id)
+        
+    if subscription_plan:
+        query = query.filter(Subscription.plan == subscription_plan)
+        
+    if search:
+        query = query.filter(admin_search.order_search_condition(search))
+        
+    if start_date:
+        try:
+            start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
+            query = query.filter(Subscription.start_date >= start_date)
+        except ValueError:
+            pass
+            
+    if end_date:
+        try:
+            end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
+            query = query.filter(Subscription.start_date <= end_date)
+        except ValueError:
+            pass
+    
+    return query
+
 def get_orders():
     try:
         page = request.args.get('page', 1, type=int)
         per_page = request.args.get('per_page', 10, type=int)
         status = request.args.get('status')
-        search = request.args.get('search', '')
+        search = admin_search.normalize_term(request.args.get('search'))
         start_date = request.args.get('start_date')
         end_date = request.args.get('end_date')
         user_id = request.args.get('user_id')
@@ -103,38 +142,11 @@ def get_orders():
         )
         
         # Apply filters
-        if status:
-            query = query.filter(Subscription.status == status)
-            
-        if user_id:
-            query = query.filter(Subscription.user_id == user_id)
-            
-        if subscription_plan:
-            query = query.filter(Subscription.plan == subscription_plan)
-            
+        query = filter_orders(query, status, start_date, end_date, user_id, subscription_plan, search)
+        
+        # Closest matches first when searching, then most recent first
         if search:
-            search = f"%{search}%"
-            query = query.filter(
-                (User.email.ilike(search)) |
-                (User.full_name.ilike(search)) |
-                (Subscription.plan.ilike(search))
-            )
-            
-        if start_date:
-            try:
-                start_date = datetime.strptime(start_date, '%Y-%m-%d').date()
-                query = query.filter(Subscription.start_date >= start_date)
-            except ValueError:
-                pass
-                
-        if end_date:
-            try:
-                end_date = datetime.strptime(end_date, '%Y-%m-%d').date()
-                query = query.filter(Subscription.start_date <= end_date)
-            except ValueError:
-                pass
-        
-        # Order by most recent first
+            query = query.order_by(*admin_search.user_search_ranking(search))
         query = query.order_by(Subscription.start_date.desc())
         
         # Pagination
@@ -179,35 +191,20 @@ def get_orders():
         
 def get_order_stats():
     try:
-        # Total revenue
-        total_revenue = db.session.query(func.sum(Payment.amount)).filter(
-            Payment.payment_status == 'success'
-        ).scalar() or 0
+        # Totals come from the rollup tables (services/rollups.py)
+        total_revenue = rollups.revenue_total()
         
         # Monthly revenue for the last 12 months
-        monthly_revenue = db.session.query(
-            func.DATE_FORMAT(Payment.paid_at, '%Y-%m').label('month'),
-            func.sum(Payment.amount).label('total')
-        ).filter(
-            Payment.payment_status == 'success',
-            Payment.paid_at >= datetime.utcnow() - timedelta(days=365)
-        ).group_by('month').order_by('month').all()
+        monthly_revenue = [
+            (month.strftime('%Y-%m'), total)
+            for month, total in rollups.monthly_revenue((local_now() - timedelta(days=365)).date())
+        ]
         
         # Payment methods distribution
-        payment_methods = db.session.query(
-            Payment.method,
-            func.count(Payment.id).label('count'),
-            func.sum(Payment.amount).label('total')
-        ).filter(
-            Payment.payment_status == 'success'
-        ).group_by(Payment.method).all()
+        payment_methods = rollups.payment_method_totals()
         
         # Subscription plan distribution
-        subscription_stats = db.session.query(
-            Subscription.plan,
-            func.count(Subscription.id).label('count'),
-            func.sum(case([(Subscription.plan == 'free', 0)], else_=1)).label('paid_count')
-        ).group_by(Subscription.plan).all()
+        subscription_stats = rollups.subscription_counts()
         
         # Recent transactions
         recent_transactions = Payment.query.join(User).filter(
@@ -247,56 +244,32 @@ def get_order_stats():
 
 def get_dashboard_stats():
     try:
+        # Counts and totals come from the rollup tables (services/rollups.py)
+        today = local_now().date()
+        
         # Total users
-        total_users = User.query.count()
+        total_users = rollups.signup_total()
         
         # New users this month
-        current_month = datetime.utcnow().month
-        current_year = datetime.utcnow().year
-        new_users_this_month = User.query.filter(
-            extract('month', User.created_at) == current_month,
-            extract('year', User.created_at) == current_year
-        ).count()
+        new_users_this_month = rollups.signup_total(since=today.replace(day=1))
         
         # Total revenue
-        total_revenue = db.session.query(func.sum(Payment.amount)).filter(
-            Payment.payment_status == 'success'
-        ).scalar() or 0
+        total_revenue = rollups.revenue_total()
         
-        # Monthly revenue - MySQL compatible version
-        monthly_revenue = db.session.query(
-            func.DATE_FORMAT(Payment.paid_at, '%Y-%m-01').label('month'),
-            func.sum(Payment.amount).label('total')
-        ).filter(
-            Payment.payment_status == 'success',
-            Payment.paid_at >= datetime.utcnow() - timedelta(days=365)
-        ).group_by('month').order_by('month').all()
+        # Monthly revenue for the last 12 months
+        monthly_revenue = [
+            (month.strftime('%Y-%m-01'), total)
+            for month, total in rollups.monthly_revenue((local_now() - timedelta(days=365)).date())
+        ]
         
-        # User growth with custom date_trunc
-        user_growth = db.session.query(
-            func.DATE_FORMAT(User.created_at, '%Y-%m-01').label('month'),
-            func.count(User.id).label('count')
-        ).group_by('month').order_by('month').all()
+        # User growth
+        user_growth = [(month.strftime('%Y-%m-01'), count) for month, count in rollups.monthly_signups()]
         
         # Package statistics
-        package_stats = db.session.query(
-            Subscription.plan,
-            func.count(Subscription.id).label('count')
-        ).filter(
-            Subscription.status == 'active'
-        ).group_by(Subscription.plan).all()
+        package_stats = rollups.subscription_counts(status='active')
         
         # Order statistics
-        order_stats = db.session.query(
-            Payment.payment_status,
-            func.count(Payment.id).label('count'),
-            func.sum(
-                case(
-                    (Payment.payment_status == 'success', Payment.amount),
-                    else_=0
-                )
-            ).label('total')
-        ).group_by(Payment.payment_status).all()
+        order_stats = rollups.order_status_totals()
         
         # Recent activities
         recent_activities = []
@@ -375,30 +348,17 @@ def get_dashboard_stats():
 
 def get_monthly_revenue():
     try:
-        # Get monthly revenue for the last 12 months
-        one_year_ago = datetime.utcnow() - timedelta(days=365)
-        
-        # Query to get monthly revenue
-        monthly_revenue = db.session.query(
-            func.YEAR(Payment.paid_at).label('year'),
-            func.MONTH(Payment.paid_at).label('month'),
-            func.sum(Payment.amount).label('revenue')
-        ).filter(
-            Payment.paid_at >= one_year_ago,
-            Payment.payment_status == 'success'
-        ).group_by(
-            'year', 'month'
-        ).order_by(
-            'year', 'month'
-        ).all()
+        # Get monthly revenue for the last 12 months, from the payment rollup
+        one_year_ago = (local_now() - timedelta(days=365)).date()
+        monthly_revenue = rollups.monthly_revenue(one_year_ago)
         
         # Format the response
         result = [
             {
-                'month': f"{row.year}-{row.month:02d}-01",
-                'revenue': float(row.revenue) if row.revenue else 0
+                'month': month.strftime('%Y-%m-01'),
+                'revenue': float(revenue) if revenue else 0
             }
-            for row in monthly_revenue
+            for month, revenue in monthly_revenue
         ]
         
         return jsonify(result), 200
@@ -409,29 +369,17 @@ def get_monthly_revenue():
 
 def get_user_growth():
     try:
-        # Get user growth for the last 12 months
-        one_year_ago = datetime.utcnow() - timedelta(days=365)
-        
-        # Query to get monthly user growth
-        monthly_users = db.session.query(
-            func.YEAR(User.created_at).label('year'),
-            func.MONTH(User.created_at).label('month'),
-            func.count(User.id).label('count')
-        ).filter(
-            User.created_at >= one_year_ago
-        ).group_by(
-            'year', 'month'
-        ).order_by(
-            'year', 'month'
-        ).all()
+        # Get user growth for the last 12 months, from the signup rollup
+        one_year_ago = (local_now() - timedelta(days=365)).date()
+        monthly_users = rollups.monthly_signups(since=one_year_ago)
         
         # Format the response
         result = [
             {
-                'month': f"{row.year}-{row.month:02d}-01",
-                'count': row.count
+                'month': month.strftime('%Y-%m-01'),
+                'count': count
             }
-            for row in monthly_users
+            for month, count in monthly_users
         ]
         
         return jsonify(result), 200
@@ -483,3 +431,199 @@ def get_subscription_stats():
     except Exception as e:
         db.session.rollback()
         return jsonify({'message': f'Error fetching subscription stats: {str(e)}'}), 500
+
+def get_analysis_cache_stats():
+    try:
+        return jsonify(analysis_cache.get_stats()), 200
+    except Exception as e:
+        return jsonify({'message': f'Error fetching analysis cache stats: {str(e)}'}), 500
+
+def purge_analysis_cache():
+    try:
+        expired_only = request.args.get('expired_only', 'false').lower() == 'true'
+        removed = analysis_cache.purge(expired_only=expired_only)
+        return jsonify({
+            'message': 'Analysis cache purged successfully',
+            'removed': removed
+        }), 200
+    except Exception as e:
+        return jsonify({'message': f'Error purging analysis cache: {str(e)}'}), 500
+
+def get_llm_metrics():
+    try:
+        metrics = llm_client.get_metrics()
+        if request.args.get('reset', 'false').lower() == 'true':
+            llm_client.reset_metrics()
+        return jsonify(metrics), 200
+    except Exception as e:
+        return jsonify({'message': f'Error fetching LLM metrics: {str(e)}'}), 500
+
+def _faq_expires_at(ttl):
+    """Expiry of a chat FAQ entry from a TTL in seconds (None: never)."""
+    if ttl is None:
+        return None
+    ttl = int(ttl)
+    if ttl <= 0:
+        raise ValueError('ttl must be a positive number of seconds')
+    return local_now() + timedelta(seconds=ttl)
+
+def _faq_text(data, field):
+    value = data.get(field)
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f'{field} is required')
+    return value.strip()
+
+def get_chat_faq_entries():
+    try:
+        page = request.args.get('page', 1, type=int)
+        per_page = request.args.get('per_page', 20, type=int)
+        source = request.args.get('source')
+        enabled = request.args.get('enabled')
+        
+        query = ChatFaqEntry.query
+        if source:
+            query = query.filter(ChatFaqEntry.source == source)
+        if enabled in ('true', 'false'):
+            # enabled=false&source=history: harvested entries awaiting approval
+            query = query.filter(ChatFaqEntry.enabled.is_(enabled == 'true'))
+        entries = query.order_by(ChatFaqEntry.hit_count.desc(), ChatFaqEntry.created_at.desc()).paginate(
+            page=page, per_page=per_page, error_out=False
+        )
+        
+        return jsonify({
+            'entries': [entry.to_dict() for entry in entries.items],
+            'total': entries.total,
+            'pages': entries.pages,
+            'current_page': entries.page,
+            'stats': chat_faq_cache.get_stats()
+        }), 200
+    except Exception as e:
+        return jsonify({'message': f'Error fetching chat FAQ entries: {str(e)}'}), 500
+
+def create_chat_faq_entry(admin_id):
+    data = request.get_json() or {}
+    try:
+        entry = ChatFaqEntry(
+            question=_faq_text(data, 'question'),
+            answer=_faq_text(data, 'answer'),
+            source='admin',
+            enabled=bool(data.get('enabled', True)),
+            created_by=admin_id,
+            expires_at=_faq_expires_at(data.get('ttl'))
+        )
+    except (TypeError, ValueError) as e:
+        return jsonify({'message': str(e)}), 400
+    
+    try:
+        db.session.add(entry)
+        db.session.commit()
+        chat_faq_cache.invalidate()
+        return jsonify(entry.to_dict()), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error creating chat FAQ entry: {str(e)}'}), 500
+
+def update_chat_faq_entry(entry_id):
+    entry = db.session.get(ChatFaqEntry, entry_id)
+    if entry is None:
+        return jsonify({'message': 'Chat FAQ entry not found'}), 404
+    data = request.get_json() or {}
+    try:
+        if 'question' in data:
+            entry.question = _faq_text(data, 'question')
+        if 'answer' in data:
+            entry.answer = _faq_text(data, 'answer')
+        if 'enabled' in data:
+            approved = bool(data['enabled']) and not entry.enabled and entry.source == 'history'
+            entry.enabled = bool(data['enabled'])
+            if approved and entry.expires_at is None:
+                # A harvested entry's TTL runs from its approval
+                entry.expires_at = _faq_expires_at(Config.CHAT_FAQ_TTL)
+        if 'ttl' in data:
+            entry.expires_at = _faq_expires_at(data['ttl'])
+    except (TypeError, ValueError) as e:
+        db.session.rollback()
+        return jsonify({'message': str(e)}), 400
+    
+    try:
+        db.session.commit()
+        chat_faq_cache.invalidate()
+        return jsonify(entry.to_dict()), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error updating chat FAQ entry: {str(e)}'}), 500
+
+def delete_chat_faq_entry(entry_id):
+    try:
+        entry = db.session.get(ChatFaqEntry, entry_id)
+        if entry is None:
+            return jsonify({'message': 'Chat FAQ entry not found'}), 404
+        db.session.delete(entry)
+        db.session.commit()
+        chat_faq_cache.invalidate()
+        return jsonify({'message': 'Chat FAQ entry deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error deleting chat FAQ entry: {str(e)}'}), 500
+
+def harvest_chat_faq():
+    try:
+        data = request.get_json(silent=True) or {}
+        result = chat_faq_cache.harvest(days=data.get('days'), min_users=data.get('min_users'))
+        return jsonify({'message': 'Chat FAQ entries proposed from chat history; enable them to use them', **result}), 200
+    except Exception as e:
+        return jsonify({'message': f'Error harvesting chat FAQ entries: {str(e)}'}), 500
+
+def match_chat_faq():
+    """What the chat FAQ cache would answer to ``?q=``, without counting or logging a hit."""
+    try:
+        question = request.args.get('q', '')
+        match = chat_faq_cache.lookup(question, record=False)
+        return jsonify({
+            'question': question,
+            'match': match._asdict() if match is not None else None
+        }), 200
+    except Exception as e:
+        return jsonify({'message': f'Error matching chat FAQ entries: {str(e)}'}), 500
+
+def _isoformat(value):
+    return value.isoformat() if value else None
+
+def export_orders(status=None, start_date=None, end_date=None):
+    try:
+        # Plain columns rather than entities: nothing accumulates in the session while streaming
+        statement = filter_orders(
+            select(
+                Subscription.id, Subscription.plan, Subscription.status, Subscription.start_date,
+                Subscription.end_date, Subscription.created_at, User.id, User.email, User.full_name
+            ).join(User, Subscription.user_id == User.id),
+            status, start_date, end_date
+        ).order_by(Subscription.start_date.desc())
+        
+        return csv_response(
+            'orders',
+            ['order_id', 'plan', 'status', 'start_date', 'end_date', 'created_at', 'user_id', 'user_email', 'user_name'],
+            statement,
+            lambda row: [row[0], row[1], row[2], _isoformat(row[3]), _isoformat(row[4]), _isoformat(row[5]), row[6], row[7], row[8]]
+        )
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error exporting orders: {str(e)}'}), 500
+
+def export_users():
+    try:
+        statement = select(
+            User.id, User.email, User.full_name, User.role, User.created_at, UserCredits.available_credits
+        ).outerjoin(UserCredits, UserCredits.user_id == User.id).order_by(User.created_at.desc())
+        
+        return csv_response(
+            'users',
+            ['user_id', 'email', 'full_name', 'role', 'created_at', 'available_credits'],
+            statement,
+            lambda row: [row[0], row[1], row[2], row[3], _isoformat(row[4]), row[5]]
+        )
+        
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'message': f'Error exporting users: {str(e)}'}), 500
@@ -3,6 +3,7 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from flask_jwt_extended import create_access_token
 from backend.models import User, Subscription, UserCredits
 from backend.extensions import db
+from backend.services.credits import record_credit_transaction
 import uuid
 from datetime import datetime, date, timedelta
 
@@ -73,6 +74,7 @@ def register_user(data):
             last_updated=datetime.utcnow()
         )
         db.session.add(new_user_credits)
+        record_credit_transaction(new_user.id, 10, 'grant', 'signup')
 
         db.session.commit()
     except Exception as e:
@@ -1,21 +1,29 @@
 from flask import jsonify, request
+from ..config.config import Config
 from ..extensions import db
-from ..models import AIChat, User
-from ..schemas import chat_schema, chats_schema
-from openai import OpenAI
-from ..config.openai_config import OPENAI_API_KEY, OPENAI_MODEL, SYSTEM_MESSAGE
+from ..models import AIChat, User, local_now
+from ..schemas import chat_schema
+from ..config.openai_config import OPENAI_MODEL, SYSTEM_MESSAGE
+from ..services.chat_context import build_context
+from ..services.chat_faq import chat_faq_cache
+from ..services.chat_write_buffer import chat_write_buffer
+from ..services.llm_client import llm_client
+from ..services.pagination import (
+    decode_cursor, decode_sequence_cursor, encode_sequence_cursor, parse_limit, sequence_page, sequence_page_after
+)
+from ..services.structured_logging import log_event
+import json
+import logging
 import uuid
 from datetime import datetime
 
-# Initialize OpenAI client
-client = OpenAI(api_key=OPENAI_API_KEY)
-
 def get_chatgpt_response(messages):
     try:
         # Add system message to guide the model's behavior
         full_messages = [{"role": "system", "content": SYSTEM_MESSAGE}] + messages
         
-        response = client.chat.completions.create(
+        response = llm_client.chat_completion(
+            'chat',
             model=OPENAI_MODEL,
             messages=full_messages,
             temperature=0.7,
@@ -66,8 +74,226 @@ def create_chat():
         return jsonify({'message': str(e)}), 400
 
 def get_chats(user_id):
+    """A user's chat messages.
+    
+    Without ``limit``, ``cursor`` or ``after`` every message is returned as a
+    plain list, newest first, as before. ``limit``/``cursor`` return one page
+    of older messages, newest first; ``after`` (a cursor) returns the messages
+    newer than it, oldest first, for incremental sync. Pages are
+    ``{'items', 'next_cursor', 'has_more', 'limit', 'sync_cursor'}``, where
+    ``sync_cursor`` marks the newest message returned and is the ``after``
+    of the next sync. Cursors are positions in insertion order (``AIChat.seq``),
+    so a message stored after a sync, even one with an earlier ``created_at``
+    (write-behind), is returned by the next one.
+    """
+    try:
+        limit = request.args.get('limit', type=int)
+        cursor = request.args.get('cursor')
+        after = request.args.get('after')
+        if cursor and after:
+            raise ValueError("cursor and after cannot be combined")
+        
+        query = AIChat.query.filter_by(user_id=user_id)
+        if limit is None and cursor is None and after is None:
+            chats = query.order_by(AIChat.seq.desc()).all()
+            return jsonify([chat.to_dict() for chat in chats]), 200
+        
+        limit = parse_limit(limit, Config.CHAT_HISTORY_PAGE_DEFAULT, Config.CHAT_HISTORY_PAGE_MAX)
+        if after:
+            chats, has_more = sequence_page_after(query, AIChat.seq, limit, _cursor_seq(after))
+            next_cursor = None
+            newest = chats[-1] if chats else None
+        else:
+            chats, next_cursor = sequence_page(query, AIChat.seq, limit, _cursor_seq(cursor) if cursor else None)
+            has_more = next_cursor is not None
+            newest = chats[0] if chats else None
+        
+        return jsonify({
+            'items': [chat.to_dict() for chat in chats],
+            'next_cursor': next_cursor,
+            'has_more': has_more,
+            'limit': limit,
+            'sync_cursor': encode_sequence_cursor(newest.seq) if newest else after
+        }), 200
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400 
+
+def _cursor_seq(cursor):
+    try:
+        return decode_sequence_cursor(cursor)
+    except ValueError:
+        # Cursors issued before messages were numbered hold the (created_at, id) of a message
+        _, chat_id = decode_cursor(cursor)
+        seq = db.session.scalar(db.select(AIChat.seq).where(AIChat.id == chat_id))
+        if seq is None:
+            raise ValueError("Invalid cursor")
+        return seq
+
+def build_chat_messages(user_id, user_message):
+    """The user's summary and recent history plus the new message, in OpenAI format (no system prompt)."""
+    return build_context(user_id, user_message)
+
+def find_faq_answer(data):
+    """The chat FAQ cache's match for the turn's message, or None.
+    
+    Requests opt out with ``"cache": false`` in the body or a
+    ``Cache-Control: no-cache`` header.
+    """
+    if data.get('cache') is False or 'no-cache' in request.headers.get('Cache-Control', ''):
+        return None
+    return chat_faq_cache.lookup(data['message'], user_id=data['user_id'])
+
+def start_chat_turn(data):
+    """Validate a turn and build its context; returns ``(messages, user_chat, user_exists, faq_match)``.
+    
+    When the FAQ cache answers the question, ``faq_match`` holds the answer
+    and ``messages`` is None: no context is needed. Nothing is written: the
+    user's message is saved with the reply by ``save_chat_turn``. The read
+    transaction is ended so no connection is held during the GPT call.
+    """
+    if not data or 'user_id' not in data or 'message' not in data:
+        raise ValueError('Missing required fields')
+    
+    user_id = data['user_id']
+    faq_match = find_faq_answer(data)
+    messages = build_chat_messages(user_id, data['message']) if faq_match is None else None
+    user_exists = db.session.get(User, user_id) is not None
+    db.session.rollback()
+    
+    user_chat = AIChat(
+        id=str(uuid.uuid4()),
+        user_id=user_id,
+        message=data['message'],
+        role='user',
+        created_at=local_now()
+    )
+    return messages, user_chat, user_exists, faq_match
+
+def _chat_row(chat):
+    return {
+        'id': chat.id,
+        'user_id': chat.user_id,
+        'message': chat.message,
+        'role': chat.role,
+        'created_at': chat.created_at
+    }
+
+def save_chat_turn(user_chat, reply=None, user_exists=True):
+    """Save the user's message and the assistant's ``reply`` (if any) as one unit of work.
+    
+    An unknown user gets a temporary account in the same transaction. With
+    ``CHAT_WRITE_BEHIND`` the rows are queued for a batched insert instead
+    (see services/chat_write_buffer.py). Returns ``(user_message, ai_response)``
+    as dicts, ``ai_response`` being None without a reply; they are built
+    before the commit, which expires the instances.
+    """
+    chats = [user_chat]
+    ai_chat = None
+    if reply is not None:
+        ai_chat = AIChat(
+            id=str(uuid.uuid4()),
+            user_id=user_chat.user_id,
+            message=reply,
+            role='assistant',
+            created_at=local_now()
+        )
+        chats.append(ai_chat)
+    result = (user_chat.to_dict(), ai_chat.to_dict() if ai_chat is not None else None)
+    
+    if user_exists and chat_write_buffer.add([_chat_row(chat) for chat in chats]):
+        return result
+    
+    try:
+        if not user_exists:
+            db.session.add(User(
+                id=user_chat.user_id,
+                email=f"temp_{user_chat.user_id}@temp.com",
+                password_hash="temporary",
+                full_name="Temporary User",
+                role="user"
+            ))
+        db.session.add_all(chats)
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    return result
+
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _chat_stream_events(messages, user_chat, user_exists, faq_match=None):
+    # Sent before the GPT call so the client can render the user's message straight away
+    yield _sse('start', {'user_message': user_chat.to_dict()})
+    
+    if faq_match is not None:
+        # Answered from the FAQ cache: the whole reply in one token
+        yield _sse('token', {'content': faq_match.answer})
+        try:
+            _, ai_response = save_chat_turn(user_chat, faq_match.answer, user_exists)
+        except Exception as e:
+            log_event('chat_stream_save_failed', level=logging.ERROR, user_id=user_chat.user_id, error=str(e))
+            yield _sse('error', {'error': str(e)})
+            return
+        yield _sse('done', {'ai_response': ai_response, 'cached': True})
+        return
+    
+    user_id = user_chat.user_id
+    stream = None
+    content_parts = []
+    finished = False
     try:
-        chats = AIChat.query.filter_by(user_id=user_id).order_by(AIChat.created_at.desc()).all()
-        return chats_schema.dump(chats)
+        stream = llm_client.chat_completion(
+            'chat_stream',
+            model=OPENAI_MODEL,
+            messages=[{"role": "system", "content": SYSTEM_MESSAGE}] + messages,
+            temperature=0.7,
+            max_tokens=1000,
+            stream=True
+        )
+        for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta.content
+            if delta:
+                content_parts.append(delta)
+                yield _sse('token', {'content': delta})
+        
+        finished = True
+        _, ai_response = save_chat_turn(user_chat, "".join(content_parts), user_exists)
+        yield _sse('done', {'ai_response': ai_response, 'cached': False})
+        
     except Exception as e:
-        return jsonify({'message': str(e)}), 400 
\ No newline at end of file
+        log_event('chat_stream_failed', level=logging.ERROR, user_id=user_id, error=str(e))
+        if not finished:
+            # No reply, but the user's message is kept as it would have been before the call
+            finished = True
+            _save_quietly(user_chat, None, user_exists)
+        yield _sse('error', {'error': str(e)})
+    finally:
+        if not finished:
+            # The client went away mid-reply: stop generating, and keep what it was shown
+            # so the history (and the next turn's context) matches its screen
+            if stream is not None and hasattr(stream, 'close'):
+                stream.close()
+            log_event('chat_stream_disconnected', user_id=user_id, characters=sum(len(part) for part in content_parts))
+            _save_quietly(user_chat, "".join(content_parts) or None, user_exists)
+
+def _save_quietly(user_chat, reply, user_exists):
+    try:
+        save_chat_turn(user_chat, reply, user_exists)
+    except Exception as e:
+        log_event('chat_stream_save_failed', level=logging.ERROR, user_id=user_chat.user_id, error=str(e))
+
+def stream_chat_with_gpt(data):
+    """Return the SSE events of a chat turn.
+    
+    Events: ``start`` (the user's message), one ``token`` per chunk of the
+    reply, then ``done`` (the assistant message) or ``error``. Both messages
+    are saved together once the stream completes; if the client disconnects
+    first, the part of the reply it received is saved instead, and if GPT
+    fails only the user's message is. A reply from the FAQ cache comes as a
+    single ``token``, and ``done`` says whether the reply was ``cached``.
+    """
+    messages, user_chat, user_exists, faq_match = start_chat_turn(data)
+    return _chat_stream_events(messages, user_chat, user_exists, faq_match)
@@ -1,5 +1,6 @@
 from ..extensions import db
 from ..models import User, Subscription, UserCredits
+from ..services.credits import grant_plan_credits
 from datetime import datetime, timedelta, date
 import uuid
 from flask import jsonify, request
@@ -63,18 +64,8 @@ def create_subscription():
             )
             db.session.add(subscription)
 
-        # Update user credits
-        user_credits = UserCredits.query.filter_by(user_id=current_user_id).first()
-        if not user_credits:
-            user_credits = UserCredits(
-                user_id=current_user_id,
-                available_credits=PLAN_CREDITS[plan],
-                last_updated=datetime.utcnow()
-            )
-            db.session.add(user_credits)
-        else:
-            user_credits.available_credits = PLAN_CREDITS[plan]
-            user_credits.last_updated = datetime.utcnow()
+        # The plan resets the balance; the ledger records the difference
+        credits = grant_plan_credits(current_user_id, PLAN_CREDITS[plan], f'subscription:{plan}')
 
         db.session.commit()
         
@@ -86,7 +77,7 @@ def create_subscription():
                 'start_date': subscription.start_date.isoformat(),
                 'end_date': subscription.end_date.isoformat()
             },
-            'credits': user_credits.available_credits
+            'credits': credits
         }), 201
 
     except Exception as e:
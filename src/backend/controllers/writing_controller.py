@@ -1,17 +1,37 @@
 from flask import jsonify, request
-from ..models import WritingScore, CombinedWritingScore, db, UserCredits
-from ..schemas import writing_score_schema, writing_scores_schema
+from ..models import WritingScore, CombinedWritingScore, LatestWritingScore, db, ScoringJob, local_now
+from ..schemas import writing_score_schema, writing_scores_schema, writing_score_summary_schema, writing_score_summaries_schema, WRITING_SCORE_SUMMARY_FIELDS
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from openai import OpenAI
 import json
+import logging
 import re
 import sys
+import os
+import datetime
+import time
+import traceback
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+from sqlalchemy.orm import joinedload, load_only
 from ..config.config import Config
+from ..services.analysis_cache import analysis_cache, make_cache_key
+from ..services.credits import reserve_credits, reserve_credits_batch, confirm_reservation, release_reservation
+from ..services.json_stream import IncrementalJSONScanner
+from ..services.highlighter import find_all_positions
+from ..services.llm_client import llm_client, CircuitOpenError
+from ..services.prompt_templates import get_prompt_template, count_chat_tokens, count_tokens
+from ..services.pagination import keyset_page, parse_limit
+from ..services.prescoring import analyze_locally, evaluate_gate, provisional_analysis
+from ..services.structured_logging import log_event, request_id_var, bind_request_id
 
-client = OpenAI(api_key=Config.OPENAI_API_KEY)
 
 CREDITS_PER_ANALYSIS = 1  # Define how many credits each analysis costs
 
+ANALYSIS_MODEL = "gpt-4"
+
+SCORE_KEYS = ['task_achievement', 'coherence_cohesion', 'lexical_resource', 'grammatical_range']
+
 def ielts_round(score):
 
     if score is None:
@@ -60,8 +80,11 @@ def calculate_overall_score(scores):
     average_score = sum(scores) / len(scores)
     return ielts_round(average_score)
 
+def minimum_words(task_type):
+    return 150 if task_type == 'task1' else 250
+
 def calculate_word_count_penalty(word_count, task_type):
-    min_words = 150 if task_type == 'task1' else 250
+    min_words = minimum_words(task_type)
     if word_count >= min_words:
         return 0.0
     
@@ -95,229 +118,118 @@ def find_text_positions(essay_text, corrections):
         'structure': []
     }
     
+    # Structure corrections don't have specific text positions
+    originals = [
+        correction.get('original')
+        for category in ['grammar', 'vocabulary']
+        for correction in corrections.get(category, [])
+        if isinstance(correction.get('original'), str)
+    ]
+    # Each distinct snippet is searched once, with a normalised fallback for near matches
+    positions_by_text = find_all_positions(essay_text, originals)
+    
     for category in ['grammar', 'vocabulary', 'structure']:
         if category in corrections:
             for correction in corrections[category]:
-                original_text = correction.get('original', '')
-                if original_text and category != 'structure':  # Structure corrections don't have specific text positions
-                    # Find all occurrences of the original text
-                    positions = []
-                    start = 0
-                    while True:
-                        pos = essay_text.find(original_text, start)
-                        if pos == -1:
-                            break
-                        positions.append({
-                            'start': pos,
-                            'end': pos + len(original_text),
-                            'text': original_text
-                        })
-                        start = pos + 1
-                    
-                    if positions:
-                        correction_with_positions = correction.copy()
-                        correction_with_positions['positions'] = positions
-                        highlighted_corrections[category].append(correction_with_positions)
-                    else:
-                        highlighted_corrections[category].append(correction)
+                original_text = correction.get('original')
+                positions = None
+                if category != 'structure' and isinstance(original_text, str):
+                    positions = positions_by_text.get(original_text)
+                if positions:
+                    correction_with_positions = correction.copy()
+                    correction_with_positions['positions'] = list(positions)
+                    highlighted_corrections[category].append(correction_with_positions)
                 else:
                     highlighted_corrections[category].append(correction)
     
     return highlighted_corrections
 
-def analyze_essay(essay_text, task_type, prompt=None, context=None, instructions=None, source=None):
-    """Analyze essay using GPT-4 and return scores, feedback, and corrections with highlighting."""
-    
-    # Setup file logging
-    import datetime
-    log_file = f"backend/logs/gpt_analysis_{datetime.datetime.now().strftime('%Y%m%d')}.log"
-    import os
-    os.makedirs(os.path.dirname(log_file), exist_ok=True)
-    
-    def log_to_file(message):
-        with open(log_file, 'a', encoding='utf-8') as f:
-            timestamp = datetime.datetime.now().strftime('%H:%M:%S')
-            f.write(f"[{timestamp}] {message}\n")
-    
-    log_to_file(f"=== ANALYZE_ESSAY START ===")
-    log_to_file(f"Task Type: {task_type}")
-    log_to_file(f"Prompt: {prompt}")
-    log_to_file(f"Essay Length: {len(essay_text)} chars")
-    log_to_file(f"Context: {context}")
-    log_to_file(f"Instructions: {instructions}")
-    log_to_file(f"Source: {source}")
-    
-    system_prompt = """You are a STRICT IELTS examiner who MUST penalize off-topic or incorrectly formatted responses heavily.
-    Your primary job is to check if the student has completed the EXACT task requested. If they haven't, you MUST give very low scores regardless of language quality.
-    
-    CRITICAL RULE: If the content doesn't match the task prompt or has wrong format, Task Achievement MUST be 0-2.
-    
-    You MUST respond in the following JSON format only:
-    {
-        "scores": {
-            "task_achievement": <score 0-9>,
-            "coherence_cohesion": <score 0-9>,
-            "lexical_resource": <score 0-9>,
-            "grammatical_range": <score 0-9>
-        },
-        "feedback": {
-            "task_achievement": "<detailed feedback about how well the response addresses the specific task prompt, format requirements, and task completion>",
-            "coherence_cohesion": "<detailed feedback>",
-            "lexical_resource": "<detailed feedback>",
-            "grammatical_range": "<detailed feedback>"
-        },
-        "corrections": {
-            "grammar": [
-                {
-                    "original": "<exact text from essay>",
-                    "correction": "<corrected text>",
-                    "explanation": "<why this correction is needed>"
-                }
-            ],
-            "vocabulary": [
-                {
-                    "original": "<exact word/phrase from essay>",
-                    "suggestion": "<better word/phrase>",
-                    "explanation": "<why this word is better>"
-                }
-            ],
-            "structure": [
-                {
-                    "issue": "<structural issue description>",
-                    "suggestion": "<how to improve the structure>",
-                    "example": "<example of improved structure>"
-                }
-            ]
-        }
+def parse_analysis_response(content, essay_text):
+    """Parse and validate the GPT JSON analysis, adding highlight positions to corrections."""
+    try:
+        result = json.loads(content)
+        
+        scores = result.get('scores', {}) if isinstance(result, dict) else {}
+        log_event('gpt_response', scores={key: scores.get(key, 'N/A') for key in SCORE_KEYS})
+        
+        task_score = scores.get('task_achievement', 0)
+        if task_score > 3:
+            log_event('high_task_achievement', level=logging.WARNING, task_achievement=task_score)
+        
+        # Validate response structure
+        required_keys = ['scores', 'feedback', 'corrections']
+        
+        if not all(key in result for key in required_keys):
+            raise ValueError("Invalid response format: missing required keys")
+        
+        if not all(key in result['scores'] for key in SCORE_KEYS):
+            raise ValueError("Invalid response format: missing score keys")
+        
+        if not all(key in result['feedback'] for key in SCORE_KEYS):
+            raise ValueError("Invalid response format: missing feedback keys")
+        
+        if 'corrections' not in result:
+            raise ValueError("Invalid response format: missing corrections")
+        
+        # Add text highlighting positions
+        result['corrections'] = find_text_positions(essay_text, result['corrections'])
+        
+        log_event('analysis_complete')
+        
+        return result
+    except json.JSONDecodeError as e:
+        log_event('gpt_response_invalid_json', level=logging.ERROR, error=str(e))
+        raise ValueError("Failed to parse GPT response as JSON")
+    except Exception as e:
+        log_event('gpt_response_invalid_format', level=logging.ERROR, error=str(e))
+        raise ValueError(f"Invalid response format: {str(e)}")
+
+def _usage(template, prompt_tokens, completion_tokens, cached=False):
+    """Token usage of one analysis; cache hits cost no tokens."""
+    return {
+        'prompt_version': template.version,
+        'prompt_tokens': prompt_tokens,
+        'completion_tokens': completion_tokens,
+        'cached': cached
     }
-    
-    IMPORTANT: For grammar and vocabulary corrections, use the EXACT text as it appears in the essay for the "original" field.
-    This is crucial for text highlighting functionality.
-    
-    For each criterion:
-    1. Score must be between 0-9 (allowing 0.5 increments)
-    2. Feedback must include:
-       - Strengths
-       - Areas for improvement
-       - Specific examples from the text
-       - Suggestions for improvement
-    
-    For corrections:
-    1. Grammar: Identify grammatical errors and provide corrections using exact text from essay
-    2. Vocabulary: Suggest better word choices using exact words/phrases from essay
-    3. Structure: Suggest improvements for sentence and paragraph structure
-    
-    CRITICAL SCORING GUIDELINES - ZERO TOLERANCE FOR TASK DEVIATION:
-    
-    **TASK ACHIEVEMENT/RESPONSE SCORING (MOST CRITICAL):**
-    YOU MUST BE RUTHLESS - DO NOT BE LENIENT:
-    - Score 0: Completely different topic (e.g., social media when asked about house-sitting)
-    - Score 1: Wrong topic + wrong format (essay when email required)
-    - Score 2: Correct general topic but completely wrong format 
-    - Score 3: Partially relevant but misses most key requirements
-    - Score 4: Addresses some aspects but significant gaps
-    - Score 5-6: Adequate task completion with minor issues
-    - Score 7-8: Good task completion
-    - Score 9: Perfect task completion
-    
-    WARNING: DO NOT give high scores just because the English is good. TASK COMPLETION IS EVERYTHING.
-    
-    **EMAIL/LETTER FORMAT REQUIREMENTS (Task 1):**
-    If task requires an EMAIL/LETTER, the response MUST include:
-    - Appropriate greeting (Dear Brianna, Hi, etc.)
-    - Clear purpose statement related to the specific situation
-    - Direct responses to ALL questions/requests in the prompt
-    - Appropriate closing (Best regards, etc.)
-    - Conversational tone appropriate for relationship
-    
-    **ESSAY FORMAT REQUIREMENTS (Task 2):**
-    If task requires an ESSAY, the response MUST:
-    - Have clear introduction with thesis statement addressing the specific question
-    - Body paragraphs with arguments relevant to the exact topic given
-    - Conclusion that summarizes position on the specific issue
-    - Academic tone throughout
-    
-    **MANDATORY SEVERE PENALTIES - NO EXCEPTIONS:**
-    YOU MUST APPLY THESE PENALTIES STRICTLY:
-    - Content about completely different topic = Task Achievement 0 (MANDATORY)
-    - Wrong topic + wrong format = Task Achievement 0-1 (MANDATORY)
-    - Correct topic but wrong format = Task Achievement 1-2 (MANDATORY)
-    - Missing major prompt requirements = Task Achievement maximum 3 (MANDATORY)
-    - Generic content not addressing specific context = Task Achievement maximum 3 (MANDATORY)
-    
-    **REAL EXAMPLES - APPLY THESE EXACT SCORES:**
-    - Task: "Write email to Brianna about house-sitting" + Response: "Essay about social media regulation" = Task Achievement 0
-    - Task: "Write email about travel plans" + Response: "Academic essay about education" = Task Achievement 0
-    - Task: "Discuss music bringing people together" + Response: "Essay about technology impact" = Task Achievement 0
-    - Task: "Write informal email" + Response: "Formal business letter format" = Task Achievement 2-3
-    
-    REMEMBER: Perfect grammar cannot save a response that fails the basic task. BE RUTHLESS.
-    """
 
-    # Build comprehensive user prompt with task context
-    user_prompt_parts = [f"Please analyze this IELTS Writing {task_type} essay and respond in the required JSON format:"]
-    
-    # Add task information if available
-    if prompt:
-        user_prompt_parts.append(f"\n**TASK PROMPT:**\n{prompt}")
-    
-    if context:
-        user_prompt_parts.append(f"\n**TASK CONTEXT:**\n{context}")
-    
-    if instructions:
-        user_prompt_parts.append(f"\n**INSTRUCTIONS:**\n{instructions}")
-    
-    if source:
-        user_prompt_parts.append(f"\n**SOURCE:** {source}")
-    
-    # Add the actual essay
-    user_prompt_parts.append(f"\n**STUDENT'S ESSAY:**\n{essay_text}")
-    
-    # Add specific analysis instruction
-    analysis_requirements = "\n**ANALYSIS REQUIREMENTS:**\n\n"
-    analysis_requirements += "FIRST AND MOST IMPORTANT: Check if the student's response addresses the EXACT task prompt above.\n\n"
-    analysis_requirements += "**TASK COMPLIANCE CHECK:**\n"
-    analysis_requirements += "1. Does the content match the topic in the task prompt? (If prompt is about house-sitting but response is about social media = MAJOR PENALTY)\n"
-    analysis_requirements += "2. Is the format correct? (Email vs Essay vs Letter as requested)\n"
-    analysis_requirements += "3. Does it respond to ALL specific questions/requests in the prompt?\n"
-    analysis_requirements += "4. Is the tone appropriate for the context? (Formal vs informal as indicated)\n\n"
-    analysis_requirements += "**MANDATORY SCORING LOGIC - FOLLOW EXACTLY:**\n"
-    analysis_requirements += "- If response is about a completely different topic: Task Achievement = 0 (NO EXCEPTIONS)\n"
-    analysis_requirements += "- If wrong topic + wrong format: Task Achievement = 0-1 (NO EXCEPTIONS)\n"
-    analysis_requirements += "- If correct topic but wrong format: Task Achievement = 1-2 (NO EXCEPTIONS)\n"
-    analysis_requirements += "- If missing major prompt requirements: Task Achievement maximum 3\n"
-    analysis_requirements += "- If content doesn't match the specific situation/context: Task Achievement maximum 3\n\n"
-    analysis_requirements += "**EVALUATION CRITERIA:**\n"
-    analysis_requirements += "- Task Achievement/Response: STRICT adherence to the specific prompt and requirements\n"
-    analysis_requirements += "- Coherence and Cohesion: logical organization appropriate for the format\n"
-    analysis_requirements += "- Lexical Resource: vocabulary suitable for the task and context\n"
-    analysis_requirements += "- Grammatical Range and Accuracy: grammar appropriate for the format and purpose\n\n"
-    analysis_requirements += "**REMEMBER:** A beautifully written piece about the wrong topic should score very low on Task Achievement.\n\n"
-    analysis_requirements += "**SPECIFIC EXAMPLE - FOLLOW THIS EXACT SCORING:**\n"
-    analysis_requirements += "Task: 'Write an email to respond to Brianna' about house-sitting and pet care\n"
-    analysis_requirements += "Student Response: Essay about 'social media regulation and government oversight'\n"
-    analysis_requirements += "REQUIRED SCORING:\n"
-    analysis_requirements += "- Task Achievement: 0 (completely wrong topic AND wrong format)\n"
-    analysis_requirements += "- Coherence & Cohesion: Maximum 4 (well-organized but irrelevant)\n"
-    analysis_requirements += "- Lexical Resource: Maximum 5 (good vocabulary but wrong context)\n"
-    analysis_requirements += "- Grammar: Can score normally but overall will be very low\n"
-    analysis_requirements += "- Overall Band Score: Should be around 1-2 due to complete task failure\n\n"
-    analysis_requirements += "FINAL INSTRUCTION: You MUST be ruthless about task compliance. Perfect English cannot save a response that completely misses the task.\n"
-    
-    user_prompt_parts.append(analysis_requirements)
-    
-    user_prompt = "".join(user_prompt_parts)
-    
-    # Log GPT request
-    log_to_file(f"=== GPT REQUEST ===")
-    log_to_file(f"Model: gpt-4")
-    log_to_file(f"System Prompt Length: {len(system_prompt)} chars")
-    log_to_file(f"User Prompt Length: {len(user_prompt)} chars")
+def analyze_essay(essay_text, task_type, prompt=None, context=None, instructions=None, source=None, notes=None):
+    """Analyze essay using GPT-4 and return scores, feedback, and corrections with highlighting."""
+    
+    log_event(
+        'analyze_essay_start',
+        task_type=task_type,
+        prompt=prompt,
+        essay_length=len(essay_text),
+        context=context,
+        instructions=instructions,
+        source=source
+    )
+    
+    template = get_prompt_template()
+    cache_key = make_cache_key(essay_text, task_type, prompt, context, instructions, source, ANALYSIS_MODEL, template.version, notes)
+    cached_result = analysis_cache.get(cache_key)
+    if cached_result is not None:
+        log_event('analysis_cache_hit', cache_key=cache_key)
+        cached_result['usage'] = _usage(template, 0, 0, cached=True)
+        return cached_result
+    log_event('analysis_cache_miss', cache_key=cache_key)
+    
+    system_prompt, user_prompt = template.render(essay_text, task_type, prompt, context, instructions, source, notes)
+    
+    log_event(
+        'gpt_request',
+        model=ANALYSIS_MODEL,
+        prompt_version=template.version,
+        system_prompt_length=len(system_prompt),
+        user_prompt_length=len(user_prompt)
+    )
     
     try:
-        log_to_file("Calling GPT API...")
-        response = client.chat.completions.create(
-            model="gpt-4",
+        started = time.perf_counter()
+        response = llm_client.chat_completion(
+            'analysis',
+            model=ANALYSIS_MODEL,
             messages=[
                 {"role": "system", "content": system_prompt},
                 {"role": "user", "content": user_prompt}
@@ -325,205 +237,587 @@ def analyze_essay(essay_text, task_type, prompt=None, context=None, instructions
             temperature=0.3
         )
         
-        log_to_file("GPT API call successful")
+        usage = _usage(template, response.usage.prompt_tokens, response.usage.completion_tokens)
+        log_event(
+            'gpt_call_succeeded',
+            duration_ms=round((time.perf_counter() - started) * 1000, 1),
+            prompt_tokens=usage['prompt_tokens'],
+            completion_tokens=usage['completion_tokens']
+        )
         
-        # Parse the JSON response
-        try:
-            result = json.loads(response.choices[0].message.content)
-            
-            # Log results to file
-            log_to_file(f"=== GPT RESPONSE ===")
-            log_to_file(f"Task Achievement: {result.get('scores', {}).get('task_achievement', 'N/A')}")
-            log_to_file(f"Coherence & Cohesion: {result.get('scores', {}).get('coherence_cohesion', 'N/A')}")
-            log_to_file(f"Lexical Resource: {result.get('scores', {}).get('lexical_resource', 'N/A')}")
-            log_to_file(f"Grammar: {result.get('scores', {}).get('grammatical_range', 'N/A')}")
-            
-            task_score = result.get('scores', {}).get('task_achievement', 0)
-            if task_score > 3:
-                log_to_file(f"WARNING: High Task Achievement {task_score} - verify topic match")
-            
-            # Validate response structure
-            required_keys = ['scores', 'feedback', 'corrections']
-            score_keys = ['task_achievement', 'coherence_cohesion', 'lexical_resource', 'grammatical_range']
-            
-            if not all(key in result for key in required_keys):
-                raise ValueError("Invalid response format: missing required keys")
-            
-            if not all(key in result['scores'] for key in score_keys):
-                raise ValueError("Invalid response format: missing score keys")
-            
-            if not all(key in result['feedback'] for key in score_keys):
-                raise ValueError("Invalid response format: missing feedback keys")
-            
-            if 'corrections' not in result:
-                raise ValueError("Invalid response format: missing corrections")
-            
-            # Add text highlighting positions
-            result['corrections'] = find_text_positions(essay_text, result['corrections'])
-            
-            log_to_file(f"=== ANALYSIS COMPLETE ===")
-            log_to_file(f"Final scores logged successfully")
-            
-            return result
-        except json.JSONDecodeError as e:
-            log_to_file(f"ERROR: Failed to parse GPT response as JSON - {str(e)}")
-            raise ValueError("Failed to parse GPT response as JSON")
-        except Exception as e:
-            log_to_file(f"ERROR: Invalid response format - {str(e)}")
-            raise ValueError(f"Invalid response format: {str(e)}")
+        result = parse_analysis_response(response.choices[0].message.content, essay_text)
+        analysis_cache.set(cache_key, result, ANALYSIS_MODEL, template.version)
+        result['usage'] = usage
+        return result
 
+    except CircuitOpenError:
+        log_event('analyze_essay_rejected', level=logging.WARNING, reason='circuit_open')
+        raise
     except Exception as e:
-        log_to_file(f"FATAL ERROR in analyze_essay: {str(e)}")
-        import traceback
-        log_to_file(f"Traceback: {traceback.format_exc()}")
+        log_event('analyze_essay_failed', level=logging.ERROR, error=str(e), traceback=traceback.format_exc())
         raise Exception(f"Failed to analyze essay: {str(e)}")
 
-def check_and_deduct_credits(user_id):
-    """Check if user has enough credits and deduct them."""
-    user_credits = UserCredits.query.filter_by(user_id=user_id).first()
+def parse_score_request(data):
+    """Validate a scoring request body and extract the fields used for analysis."""
+    if not data or 'essay_text' not in data or 'task_type' not in data:
+        raise ValueError("Missing required fields")
+    
+    return {
+        'essay_text': data['essay_text'],
+        'task_type': data['task_type'],
+        'time_spent': data.get('time_spent'),  # Optional time tracking
+        # Additional context information for better analysis
+        'prompt': data.get('prompt'),  # The task prompt/question
+        'context': data.get('context'),  # Additional context (for emails, scenarios)
+        'instructions': data.get('instructions'),  # Specific instructions
+        'source': data.get('source')  # Source information
+    }
+
+def save_writing_score(user_id, essay_request, analysis, provisional=False, commit=True):
+    """Apply IELTS rounding and penalties to an analysis and store it as a WritingScore.
     
-    if not user_credits:
-        raise ValueError("User credits not found")
+    The score, the user's latest-score pointer and any new combined score are
+    written in one transaction. With ``commit=False`` the caller commits it,
+    together with its own changes.
+    """
+    essay_text = essay_request['essay_text']
+    task_type = essay_request['task_type']
+    time_spent = essay_request['time_spent']
+    usage = analysis.get('usage') or {}
+    
+    # Calculate word count
+    word_count = len(essay_text.strip().split())
+    
+    # Apply IELTS rounding to individual criterion scores
+    task_achievement = ielts_round(analysis['scores']['task_achievement'])
+    coherence_cohesion = ielts_round(analysis['scores']['coherence_cohesion'])
+    lexical_resource = ielts_round(analysis['scores']['lexical_resource'])
+    grammatical_range = ielts_round(analysis['scores']['grammatical_range'])
+    
+    # Calculate base overall score using rounded individual scores
+    base_scores = [task_achievement, coherence_cohesion, lexical_resource, grammatical_range]
+    overall_score = calculate_overall_score(base_scores)
+    
+    # Calculate penalties
+    word_count_penalty = calculate_word_count_penalty(word_count, task_type)
+    time_penalty = calculate_time_penalty(time_spent, task_type)
+    
+    # Calculate adjusted score with IELTS rounding
+    adjusted_score_raw = max(0.0, overall_score - word_count_penalty - time_penalty)
+    adjusted_score = ielts_round(adjusted_score_raw)
+    
+    # Create new writing score record
+    writing_score = WritingScore(
+        user_id=user_id,
+        task_type=task_type,
+        essay_text=essay_text,
+        word_count=word_count,
+        time_spent=time_spent,
+        task_achievement=task_achievement,
+        coherence_cohesion=coherence_cohesion,
+        lexical_resource=lexical_resource,
+        grammatical_range=grammatical_range,
+        overall_score=overall_score,
+        word_count_penalty=word_count_penalty,
+        time_penalty=time_penalty,
+        adjusted_score=adjusted_score,
+        task_achievement_feedback=analysis['feedback']['task_achievement'],
+        coherence_cohesion_feedback=analysis['feedback']['coherence_cohesion'],
+        lexical_resource_feedback=analysis['feedback']['lexical_resource'],
+        grammatical_range_feedback=analysis['feedback']['grammatical_range'],
+        corrections=analysis['corrections'],  # Encoded once to the JSON column
+        is_provisional=provisional,
+        prompt_version=usage.get('prompt_version'),
+        prompt_tokens=usage.get('prompt_tokens'),
+        completion_tokens=usage.get('completion_tokens')
+    )
+    
+    # Save to database
+    db.session.add(writing_score)
+    
+    # Check for combined score calculation
+    db.session.flush()
+    if not provisional:
+        calculate_combined_score(user_id, writing_score)
     
-    if user_credits.available_credits < CREDITS_PER_ANALYSIS:
-        raise ValueError("Insufficient credits")
+    if commit:
+        db.session.commit()
     
-    user_credits.available_credits -= CREDITS_PER_ANALYSIS
-    db.session.commit()
+    # Return the created record with corrections (already decoded: they came from the analysis)
+    result = writing_score_schema.dump(writing_score)
+    result['corrections'] = analysis['corrections']
+    return result
+
+def prescore_essay(essay_request):
+    """Run the local pre-scoring gate and log its verdict so the rules can be tuned."""
+    if not Config.PRESCORING_ENABLED:
+        return {'action': 'pass', 'reasons': [], 'notes': [], 'stats': None}
+    
+    task_type = essay_request['task_type']
+    stats = analyze_locally(essay_request['essay_text'], task_type, essay_request['prompt'], essay_request['context'])
+    verdict = evaluate_gate(stats, task_type, minimum_words(task_type))
+    log_event('prescoring_verdict', action=verdict['action'], reasons=verdict['reasons'], task_type=task_type, **stats)
+    verdict['stats'] = stats
+    return verdict
+
+def apply_prescoring(user_id, essay_request, commit=True):
+    """Run the gate on a scoring request, as every scoring path does.
+    
+    Returns the saved provisional score (free of charge, no GPT call) when a
+    rule answers locally, else None; the gate's notes for GPT are then left
+    in ``essay_request['notes']`` (None unless a rule annotates).
+    """
+    verdict = prescore_essay(essay_request)
+    if verdict['action'] == 'provisional':
+        result = save_writing_score(
+            user_id, essay_request, provisional_analysis(verdict['stats'], verdict), provisional=True, commit=commit
+        )
+        result['prescoring'] = {'reasons': verdict['reasons'], 'notes': verdict['notes']}
+        return result
+    essay_request['notes'] = verdict['notes'] if verdict['action'] == 'annotate' else None
+    return None
 
 def score_essay(user_id, data):
     """Score a writing task and provide feedback with penalties and highlighting."""
+    reservation_id = None
     try:
-        # Validate request data
-        if not data or 'essay_text' not in data or 'task_type' not in data:
-            raise ValueError("Missing required fields")
-        
-        essay_text = data['essay_text']
-        task_type = data['task_type']
-        time_spent = data.get('time_spent')  # Optional time tracking
-        
-        # Extract additional context information for better analysis
-        prompt = data.get('prompt')  # The task prompt/question
-        context = data.get('context')  # Additional context (for emails, scenarios)
-        instructions = data.get('instructions')  # Specific instructions
-        source = data.get('source')  # Source information
+        essay_request = parse_score_request(data)
         
-        # Calculate word count
-        word_count = len(essay_text.strip().split())
+        # Obvious failures are answered locally, free of charge, without a GPT call
+        provisional = apply_prescoring(user_id, essay_request)
+        if provisional is not None:
+            return provisional
         
-        # Check and deduct credits before processing
-        check_and_deduct_credits(user_id)
+        # Reserve the credits before processing; they are only spent if the score is saved
+        reservation_id = reserve_credits(user_id, CREDITS_PER_ANALYSIS, 'writing_score')
             
         # Analyze essay using GPT-4 with task context
-        analysis = analyze_essay(essay_text, task_type, prompt, context, instructions, source)
-        
-        # Apply IELTS rounding to individual criterion scores
-        task_achievement = ielts_round(analysis['scores']['task_achievement'])
-        coherence_cohesion = ielts_round(analysis['scores']['coherence_cohesion'])
-        lexical_resource = ielts_round(analysis['scores']['lexical_resource'])
-        grammatical_range = ielts_round(analysis['scores']['grammatical_range'])
-        
-        # Calculate base overall score using rounded individual scores
-        base_scores = [task_achievement, coherence_cohesion, lexical_resource, grammatical_range]
-        overall_score = calculate_overall_score(base_scores)
-        
-        # Calculate penalties
-        word_count_penalty = calculate_word_count_penalty(word_count, task_type)
-        time_penalty = calculate_time_penalty(time_spent, task_type)
-        
-        # Calculate adjusted score with IELTS rounding
-        adjusted_score_raw = max(0.0, overall_score - word_count_penalty - time_penalty)
-        adjusted_score = ielts_round(adjusted_score_raw)
-        
-        # Create new writing score record
-        writing_score = WritingScore(
-            user_id=user_id,
-            task_type=task_type,
-            essay_text=essay_text,
-            word_count=word_count,
-            time_spent=time_spent,
-            task_achievement=task_achievement,
-            coherence_cohesion=coherence_cohesion,
-            lexical_resource=lexical_resource,
-            grammatical_range=grammatical_range,
-            overall_score=overall_score,
-            word_count_penalty=word_count_penalty,
-            time_penalty=time_penalty,
-            adjusted_score=adjusted_score,
-            task_achievement_feedback=analysis['feedback']['task_achievement'],
-            coherence_cohesion_feedback=analysis['feedback']['coherence_cohesion'],
-            lexical_resource_feedback=analysis['feedback']['lexical_resource'],
-            grammatical_range_feedback=analysis['feedback']['grammatical_range'],
-            corrections=json.dumps(analysis['corrections'])  # Store corrections with positions as JSON string
+        analysis = analyze_essay(
+            essay_request['essay_text'],
+            essay_request['task_type'],
+            essay_request['prompt'],
+            essay_request['context'],
+            essay_request['instructions'],
+            essay_request['source'],
+            notes=essay_request['notes']
         )
         
-        # Save to database
-        db.session.add(writing_score)
+        result = save_writing_score(user_id, essay_request, analysis, commit=False)
+        confirm_reservation(reservation_id, result['id'])
         db.session.commit()
-        
-        # Check for combined score calculation
-        calculate_combined_score(user_id, writing_score)
-        
-        # Return the created record with corrections
-        result = writing_score_schema.dump(writing_score)
-        result['corrections'] = json.loads(writing_score.corrections) if writing_score.corrections else {}
         return result
         
     except Exception as e:
         db.session.rollback()
-        if isinstance(e, ValueError):
+        if reservation_id:
+            release_reservation(reservation_id)
+        if isinstance(e, (ValueError, CircuitOpenError)):
             raise e
         raise Exception(f"Failed to score essay: {str(e)}")
 
-def calculate_combined_score(user_id, new_score):
-    """Calculate combined score when both Task 1 and Task 2 are available."""
+def _sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+
+def _analysis_event(path, value, essay_text):
+    """Map a completed value of the GPT JSON to an SSE event, if the client cares about it."""
+    if len(path) == 2 and path[0] == 'scores' and path[1] in SCORE_KEYS:
+        return 'score', {'criterion': path[1], 'score': ielts_round(value)}
+    if len(path) == 2 and path[0] == 'feedback' and path[1] in SCORE_KEYS:
+        return 'feedback', {'criterion': path[1], 'feedback': value}
+    if len(path) == 3 and path[0] == 'corrections' and isinstance(value, dict):
+        category = path[1]
+        if category in ('grammar', 'vocabulary', 'structure'):
+            correction = find_text_positions(essay_text, {category: [value]})[category][0]
+            return 'correction', {'category': category, 'index': path[2], 'correction': correction}
+    return None
+
+def _cached_analysis_events(analysis, essay_text):
+    for key in SCORE_KEYS:
+        yield _analysis_event(('scores', key), analysis['scores'][key], essay_text)
+    for key in SCORE_KEYS:
+        yield 'feedback', {'criterion': key, 'feedback': analysis['feedback'][key]}
+    for category in ('grammar', 'vocabulary', 'structure'):
+        for index, correction in enumerate(analysis['corrections'].get(category, [])):
+            yield 'correction', {'category': category, 'index': index, 'correction': correction}
+
+def _provisional_score_events(result):
+    yield _sse('result', result)
+    yield _sse('done', {'id': result['id']})
+
+def _stream_score_events(user_id, essay_request, reservation_id):
+    essay_text = essay_request['essay_text']
+    analysis_args = (
+        essay_text,
+        essay_request['task_type'],
+        essay_request['prompt'],
+        essay_request['context'],
+        essay_request['instructions'],
+        essay_request['source']
+    )
+    notes = essay_request['notes']
+    settled = False
     try:
-        # Get the most recent scores for both tasks
-        task1_score = WritingScore.query.filter_by(
-            user_id=user_id, 
-            task_type='task1'
-        ).order_by(WritingScore.created_at.desc()).first()
-        
-        task2_score = WritingScore.query.filter_by(
-            user_id=user_id, 
-            task_type='task2'
-        ).order_by(WritingScore.created_at.desc()).first()
+        log_event('stream_score_start', task_type=essay_request['task_type'], essay_length=len(essay_text))
+        template = get_prompt_template()
+        cache_key = make_cache_key(*analysis_args, ANALYSIS_MODEL, template.version, notes)
+        analysis = analysis_cache.get(cache_key)
         
-        if task1_score and task2_score:
-            # Calculate combined score: Task 1 (1/3) + Task 2 (2/3) with IELTS rounding
-            combined_score_raw = (task1_score.adjusted_score * 1/3) + (task2_score.adjusted_score * 2/3)
-            combined_score = ielts_round(combined_score_raw)
+        if analysis is not None:
+            log_event('analysis_cache_hit', cache_key=cache_key)
+            analysis['usage'] = _usage(template, 0, 0, cached=True)
+            for event, payload in _cached_analysis_events(analysis, essay_text):
+                yield _sse(event, payload)
+        else:
+            log_event('analysis_cache_miss', cache_key=cache_key)
+            system_prompt, user_prompt = template.render(*analysis_args, notes)
+            messages = [
+                {"role": "system", "content": system_prompt},
+                {"role": "user", "content": user_prompt}
+            ]
+            
+            log_event(
+                'gpt_request',
+                model=ANALYSIS_MODEL,
+                prompt_version=template.version,
+                stream=True,
+                system_prompt_length=len(system_prompt),
+                user_prompt_length=len(user_prompt)
+            )
+            started = time.perf_counter()
+            stream = llm_client.chat_completion(
+                'analysis_stream',
+                model=ANALYSIS_MODEL,
+                messages=messages,
+                temperature=0.3,
+                stream=True
+            )
             
-            # Check if combined score already exists for these specific scores
-            existing_combined = CombinedWritingScore.query.filter_by(
-                user_id=user_id,
-                task1_score_id=task1_score.id,
-                task2_score_id=task2_score.id
-            ).first()
+            # Push every criterion, feedback block and correction as soon as its JSON is complete
+            scanner = IncrementalJSONScanner(depths=(2, 3))
+            content_parts = []
+            try:
+                for chunk in stream:
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if not delta:
+                        continue
+                    content_parts.append(delta)
+                    for path, value in scanner.feed(delta):
+                        event = _analysis_event(path, value, essay_text)
+                        if event:
+                            yield _sse(*event)
+            finally:
+                # On a client disconnect (GeneratorExit at a yield) or an error, stop the
+                # generation instead of leaving the connection open until garbage collection
+                if hasattr(stream, 'close'):
+                    stream.close()
             
-            if not existing_combined:
-                # Create new combined score record
-                combined_writing_score = CombinedWritingScore(
+            # Streamed responses carry no usage block; count locally (None without tiktoken)
+            content = "".join(content_parts)
+            usage = _usage(template, count_chat_tokens(messages, ANALYSIS_MODEL), count_tokens(content, ANALYSIS_MODEL))
+            log_event(
+                'gpt_stream_finished',
+                duration_ms=round((time.perf_counter() - started) * 1000, 1),
+                prompt_tokens=usage['prompt_tokens'],
+                completion_tokens=usage['completion_tokens']
+            )
+            
+            # Validate and persist exactly like the non-streaming path
+            analysis = parse_analysis_response(content, essay_text)
+            analysis_cache.set(cache_key, analysis, ANALYSIS_MODEL, template.version)
+            analysis['usage'] = usage
+        
+        result = save_writing_score(user_id, essay_request, analysis, commit=False)
+        confirm_reservation(reservation_id, result['id'])
+        db.session.commit()
+        settled = True
+        yield _sse('result', result)
+        yield _sse('done', {'id': result['id']})
+        
+    except Exception as e:
+        db.session.rollback()
+        log_event('stream_score_failed', level=logging.ERROR, error=str(e), traceback=traceback.format_exc())
+        yield _sse('error', {'error': f"Failed to score essay: {str(e)}"})
+    finally:
+        # Failed, or the client went away before the score was saved
+        if not settled:
+            db.session.rollback()
+            release_reservation(reservation_id)
+
+def stream_score_essay(user_id, data):
+    """Validate and charge a scoring request, then return a generator of SSE events.
+    
+    Validation and credit errors are raised before any event is produced so the
+    route can still answer with a normal error response. The pre-scoring gate
+    runs as for ``score_essay``: a provisional score is saved free of charge and
+    streamed as the ``result``.
+    """
+    try:
+        essay_request = parse_score_request(data)
+        provisional = apply_prescoring(user_id, essay_request)
+        if provisional is not None:
+            return _provisional_score_events(provisional)
+        reservation_id = reserve_credits(user_id, CREDITS_PER_ANALYSIS, 'writing_score_stream')
+    except Exception:
+        db.session.rollback()
+        raise
+    return _stream_score_events(user_id, essay_request, reservation_id)
+
+def _batch_item_key(batch_id, index, item):
+    if item.get('idempotency_key'):
+        return str(item['idempotency_key'])
+    if batch_id:
+        return f"{batch_id}:{index}"
+    return None
+
+def _analyze_batch_item(app, essay_request, request_id):
+    # analyze_essay uses the DB-backed cache, so it needs an app context in the worker thread
+    bind_request_id(request_id)
+    with app.app_context():
+        return analyze_essay(
+            essay_request['essay_text'],
+            essay_request['task_type'],
+            essay_request['prompt'],
+            essay_request['context'],
+            essay_request['instructions'],
+            essay_request['source'],
+            notes=essay_request['notes']
+        )
+
+def score_essay_batch(app, user_id, data):
+    """Score a list of essays concurrently, charging credits for the whole batch at once.
+    
+    Items carry an ``idempotency_key`` (or inherit one from the request's
+    ``batch_id`` and their position), so a retried item that already succeeded
+    returns its stored result without being charged again. Items the
+    pre-scoring gate answers get a free provisional score, as in ``score_essay``.
+    """
+    if not data or not isinstance(data.get('essays'), list) or not data['essays']:
+        raise ValueError("Missing required fields")
+    
+    items = data['essays']
+    if len(items) > Config.SCORING_BATCH_MAX_ITEMS:
+        raise ValueError(f"A batch can contain at most {Config.SCORING_BATCH_MAX_ITEMS} essays")
+    
+    batch_id = str(data.get('batch_id') or uuid.uuid4())
+    concurrency = max(1, min(int(data.get('concurrency') or Config.SCORING_BATCH_CONCURRENCY), Config.SCORING_BATCH_CONCURRENCY))
+    
+    results = [None] * len(items)
+    to_run = []  # (index, essay_request, job)
+    
+    try:
+        keys = {}
+        for index, item in enumerate(items):
+            key = _batch_item_key(data.get('batch_id'), index, item or {})
+            keys[index] = key
+        
+        existing_jobs = {}
+        known_keys = [key for key in keys.values() if key]
+        if known_keys:
+            existing_jobs = {
+                job.idempotency_key: job
+                for job in ScoringJob.query.filter(
+                    ScoringJob.user_id == user_id,
+                    ScoringJob.idempotency_key.in_(known_keys)
+                ).all()
+            }
+        
+        stale_before = local_now() - datetime.timedelta(seconds=Config.SCORING_JOB_STALE_AFTER)
+        for index, item in enumerate(items):
+            key = keys[index]
+            try:
+                essay_request = parse_score_request(item)
+            except ValueError as e:
+                results[index] = {'index': index, 'idempotency_key': key, 'status': 'invalid', 'charged': False, 'error': str(e)}
+                continue
+            
+            job = existing_jobs.get(key) if key else None
+            if job is not None:
+                if job.status == 'succeeded' and job.writing_score:
+                    results[index] = {
+                        'index': index,
+                        'idempotency_key': key,
+                        'status': 'duplicate',
+                        'charged': False,
+                        'result': job.writing_score.to_dict()
+                    }
+                    continue
+                if job.status in ('queued', 'running'):
+                    if job.started_at is None or job.started_at >= stale_before:
+                        results[index] = {'index': index, 'idempotency_key': key, 'status': 'in_progress', 'charged': False, 'job_id': job.id}
+                        continue
+                if job.reservation_id:
+                    # Interrupted run: give its reservation back (the stale sweeper may already
+                    # have) and reserve afresh below, so the retry is paid for exactly once
+                    release_reservation(job.reservation_id, commit=False)
+                    job.reservation_id = None
+                job.status = 'running'
+                job.batch_id = batch_id
+                job.payload = json.dumps(item, ensure_ascii=False)
+                job.error = None
+                job.started_at = local_now()
+                job.attempts = (job.attempts or 0) + 1
+            else:
+                job = ScoringJob(
                     user_id=user_id,
-                    task1_score_id=task1_score.id,
-                    task2_score_id=task2_score.id,
-                    combined_score=combined_score
+                    status='running',
+                    payload=json.dumps(item, ensure_ascii=False),
+                    batch_id=batch_id,
+                    idempotency_key=key,
+                    started_at=local_now(),
+                    attempts=1
                 )
-                
-                db.session.add(combined_writing_score)
+                db.session.add(job)
+            
+            provisional = apply_prescoring(user_id, essay_request, commit=False)
+            if provisional is not None:
+                job.status = 'succeeded'
+                job.writing_score_id = provisional['id']
+                job.finished_at = local_now()
+                results[index] = {'index': index, 'idempotency_key': key, 'status': 'succeeded', 'charged': False, 'result': provisional}
+                continue
+            to_run.append((index, essay_request, job))
+        
+        # Reserve credits for every item sent to GPT, in the same transaction as the job rows
+        if to_run:
+            reservation_ids = reserve_credits_batch(
+                user_id, CREDITS_PER_ANALYSIS, len(to_run), 'writing_score_batch', commit=False
+            )
+            for (_, _, job), reservation_id in zip(to_run, reservation_ids):
+                job.reservation_id = reservation_id
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+    
+    # Run the GPT analyses concurrently; wall time is roughly that of the slowest essay
+    analyses = {}
+    if to_run:
+        with ThreadPoolExecutor(max_workers=min(concurrency, len(to_run))) as executor:
+            futures = {
+                index: executor.submit(_analyze_batch_item, app, essay_request, request_id_var.get())
+                for index, essay_request, _ in to_run
+            }
+            for index, future in futures.items():
+                try:
+                    analyses[index] = (future.result(), None)
+                except Exception as e:
+                    analyses[index] = (None, str(e))
+    
+    for index, essay_request, job in to_run:
+        key = keys[index]
+        analysis, error = analyses[index]
+        if analysis is not None:
+            try:
+                result = save_writing_score(user_id, essay_request, analysis, commit=False)
+                job.status = 'succeeded'
+                job.writing_score_id = result['id']
+                job.finished_at = local_now()
+                # False if the reservation was released meanwhile: the score is then free
+                charged = confirm_reservation(job.reservation_id, result['id'])
                 db.session.commit()
-                
-    except Exception as e:
-        # Don't raise error as this is not critical to the main scoring process
-        pass
+                results[index] = {'index': index, 'idempotency_key': key, 'status': 'succeeded', 'charged': charged, 'result': result}
+                continue
+            except Exception as e:
+                db.session.rollback()
+                error = f"Failed to score essay: {str(e)}"
+        
+        job.status = 'failed'
+        job.error = error
+        job.finished_at = local_now()
+        if job.reservation_id:
+            # Give back the credits reserved for the item, with the job update
+            release_reservation(job.reservation_id, commit=False)
+        db.session.commit()
+        results[index] = {'index': index, 'idempotency_key': key, 'status': 'failed', 'charged': False, 'error': error}
+    
+    return {
+        'batch_id': batch_id,
+        'items': results,
+        'charged_credits': sum(1 for item in results if item['charged']) * CREDITS_PER_ANALYSIS,
+        'succeeded': sum(1 for item in results if item['status'] in ('succeeded', 'duplicate')),
+        'failed': sum(1 for item in results if item['status'] in ('failed', 'invalid'))
+    }
 
-def get_user_scores(user_id):
-    """Get all writing scores for the current user."""
-    try:
-        scores = WritingScore.query.filter_by(user_id=user_id).order_by(WritingScore.created_at.desc()).all()
-        return writing_scores_schema.dump(scores)
-    except Exception as e:
-        raise e
+def _create_latest_row(user_id):
+    """Insert an empty LatestWritingScore row for the user unless there is one."""
+    table = LatestWritingScore.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect in ('mysql', 'mariadb'):
+        statement = mysql.insert(table).values(user_id=user_id)
+        statement = statement.on_duplicate_key_update(user_id=statement.inserted.user_id)
+    else:
+        insert = postgresql.insert if dialect == 'postgresql' else sqlite.insert
+        statement = insert(table).values(user_id=user_id).on_conflict_do_nothing(index_elements=['user_id'])
+    db.session.execute(statement)
+
+def calculate_combined_score(user_id, new_score):
+    """Point the user's latest score for the task at ``new_score`` and record the combined score.
+    
+    Runs in the caller's transaction; ``new_score`` must already be flushed. The
+    LatestWritingScore row holds both tasks' latest scores, so the cost does not
+    depend on how many essays the user has written.
+    """
+    if new_score.task_type not in ('task1', 'task2'):
+        return
+    
+    # Make sure the row exists before locking it: SELECT ... FOR UPDATE of a missing key takes a gap
+    # lock on InnoDB, and two first scores of a user would then deadlock on their INSERTs
+    _create_latest_row(user_id)
+    # Locked until commit so concurrent scores of the same user update the pointer in turn
+    latest = db.session.get(LatestWritingScore, user_id, with_for_update=True, populate_existing=True)
+    
+    if new_score.task_type == 'task1':
+        latest.task1_score_id = new_score.id
+        latest.task1_adjusted_score = new_score.adjusted_score
+    else:
+        latest.task2_score_id = new_score.id
+        latest.task2_adjusted_score = new_score.adjusted_score
+    latest.updated_at = local_now()
+    
+    if latest.task1_score_id and latest.task2_score_id:
+        # Calculate combined score: Task 1 (1/3) + Task 2 (2/3) with IELTS rounding
+        combined_score_raw = (latest.task1_adjusted_score * 1/3) + (latest.task2_adjusted_score * 2/3)
+        combined_score = ielts_round(combined_score_raw)
+        
+        # One side is the score just saved, so this pair has no combined score yet
+        db.session.add(CombinedWritingScore(
+            user_id=user_id,
+            task1_score_id=latest.task1_score_id,
+            task2_score_id=latest.task2_score_id,
+            combined_score=combined_score
+        ))
+
+def get_user_scores(user_id, limit=None, cursor=None, fields=None):
+    """Get writing scores for the current user, newest first.
+    
+    ``fields='summary'`` loads and returns only the score columns. Without
+    ``limit``/``cursor`` every score is returned as a plain list, as before;
+    with either, one page is returned as ``{'items', 'next_cursor', 'has_more', 'limit'}``.
+    """
+    if fields not in (None, 'full', 'summary'):
+        raise ValueError("fields must be 'full' or 'summary'")
+    summary = fields == 'summary'
+    
+    query = WritingScore.query.filter_by(user_id=user_id)
+    if summary:
+        # Deferred columns (essay, feedback, corrections) are never selected
+        query = query.options(load_only(*[getattr(WritingScore, name) for name in WRITING_SCORE_SUMMARY_FIELDS]))
+    schema = writing_score_summaries_schema if summary else writing_scores_schema
+    
+    if limit is None and cursor is None:
+        scores = query.order_by(WritingScore.created_at.desc(), WritingScore.id.desc()).all()
+        return schema.dump(scores)
+    
+    limit = parse_limit(limit, Config.SCORES_PAGE_DEFAULT, Config.SCORES_PAGE_MAX)
+    scores, next_cursor = keyset_page(query, WritingScore.created_at, WritingScore.id, limit, cursor)
+    return {
+        'items': schema.dump(scores),
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+        'limit': limit
+    }
 
 def get_score(score_id, user_id):
     """Get a specific writing score."""
@@ -535,10 +829,48 @@ def get_score(score_id, user_id):
     except Exception as e:
         raise e
 
-def get_combined_scores(user_id):
-    """Get all combined writing scores for the current user."""
-    try:
-        combined_scores = CombinedWritingScore.query.filter_by(user_id=user_id).order_by(CombinedWritingScore.created_at.desc()).all()
-        return [score.to_dict() for score in combined_scores]
-    except Exception as e:
-        raise e 
\ No newline at end of file
+def combined_score_summary(combined_score):
+    """Combined score with only the score fields of its Task 1 and Task 2 scores."""
+    return {
+        'id': combined_score.id,
+        'user_id': combined_score.user_id,
+        'task1_score_id': combined_score.task1_score_id,
+        'task2_score_id': combined_score.task2_score_id,
+        'combined_score': combined_score.combined_score,
+        'created_at': combined_score.created_at.isoformat(),
+        'task1_score': writing_score_summary_schema.dump(combined_score.task1_score) if combined_score.task1_score else None,
+        'task2_score': writing_score_summary_schema.dump(combined_score.task2_score) if combined_score.task2_score else None
+    }
+
+def get_combined_scores(user_id, limit=None, cursor=None, fields=None):
+    """Get combined writing scores for the current user, newest first.
+    
+    Both task scores are joined into the same query, so the number of queries
+    does not depend on the number of rows. ``fields='summary'`` returns only
+    their score fields. Paging works as in ``get_user_scores``.
+    """
+    if fields not in (None, 'full', 'summary'):
+        raise ValueError("fields must be 'full' or 'summary'")
+    summary = fields == 'summary'
+    
+    task1_score = joinedload(CombinedWritingScore.task1_score)
+    task2_score = joinedload(CombinedWritingScore.task2_score)
+    if summary:
+        score_fields = [getattr(WritingScore, name) for name in WRITING_SCORE_SUMMARY_FIELDS]
+        task1_score = task1_score.load_only(*score_fields)
+        task2_score = task2_score.load_only(*score_fields)
+    query = CombinedWritingScore.query.filter_by(user_id=user_id).options(task1_score, task2_score)
+    serialize = combined_score_summary if summary else CombinedWritingScore.to_dict
+    
+    if limit is None and cursor is None:
+        combined_scores = query.order_by(CombinedWritingScore.created_at.desc(), CombinedWritingScore.id.desc()).all()
+        return [serialize(score) for score in combined_scores]
+    
+    limit = parse_limit(limit, Config.SCORES_PAGE_DEFAULT, Config.SCORES_PAGE_MAX)
+    combined_scores, next_cursor = keyset_page(query, CombinedWritingScore.created_at, CombinedWritingScore.id, limit, cursor)
+    return {
+        'items': [serialize(score) for score in combined_scores],
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None,
+        'limit': limit
+    }
@@ -23,4 +23,227 @@ CREATE TABLE CombinedWritingScores (
 );
 
 -- Update existing records to set adjusted_score = overall_score for backward compatibility
-UPDATE WritingScores SET adjusted_score = overall_score WHERE adjusted_score = 0.0; 
\ No newline at end of file
+UPDATE WritingScores SET adjusted_score = overall_score WHERE adjusted_score = 0.0; 
+
+-- Essay analysis result cache (persistent tier behind the in-process LRU)
+CREATE TABLE AnalysisCache (
+    cache_key VARCHAR(64) PRIMARY KEY,
+    model VARCHAR(50) NOT NULL,
+    prompt_version VARCHAR(20) NOT NULL,
+    result LONGTEXT NOT NULL,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    expires_at DATETIME,
+    INDEX idx_analysis_cache_expires_at (expires_at)
+);
+
+-- Background scoring jobs for POST /api/writing/score?mode=async
+CREATE TABLE ScoringJobs (
+    id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    status ENUM('queued', 'running', 'succeeded', 'failed') NOT NULL DEFAULT 'queued',
+    payload LONGTEXT NOT NULL,
+    writing_score_id VARCHAR(36),
+    error TEXT,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    started_at DATETIME,
+    finished_at DATETIME,
+    INDEX idx_scoring_jobs_status_created (status, created_at),
+    FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE,
+    FOREIGN KEY (writing_score_id) REFERENCES WritingScores(id) ON DELETE SET NULL
+);
+
+-- Batch scoring: group jobs by batch and make retried items idempotent
+ALTER TABLE ScoringJobs
+ADD COLUMN batch_id VARCHAR(64),
+ADD COLUMN idempotency_key VARCHAR(128),
+ADD CONSTRAINT uq_scoring_jobs_user_idempotency_key UNIQUE (user_id, idempotency_key);
+
+-- Scores produced by the local pre-scoring gate without a GPT analysis
+ALTER TABLE WritingScores
+ADD COLUMN is_provisional BOOLEAN NOT NULL DEFAULT FALSE;
+
+-- Prompt template version and GPT token usage per analysis
+ALTER TABLE WritingScores
+ADD COLUMN prompt_version VARCHAR(20),
+ADD COLUMN prompt_tokens INTEGER,
+ADD COLUMN completion_tokens INTEGER;
+
+-- Store corrections in a native JSON column (invalid legacy values are cleared first)
+UPDATE WritingScores SET corrections = NULL WHERE corrections IS NOT NULL AND (corrections = '' OR JSON_VALID(corrections) = 0);
+ALTER TABLE WritingScores MODIFY corrections JSON;
+
+-- Composite indexes for the hot per-user and admin queries (checked by benchmarks/check_query_plans.py)
+CREATE INDEX idx_writing_scores_user_task_created ON WritingScores (user_id, task_type, is_provisional, created_at);
+CREATE INDEX idx_writing_scores_user_created ON WritingScores (user_id, created_at, id);
+CREATE INDEX idx_combined_scores_user_created ON CombinedWritingScores (user_id, created_at);
+CREATE INDEX idx_ai_chats_user_created ON AIChats (user_id, created_at);
+CREATE INDEX idx_subscriptions_user_status ON Subscriptions (user_id, status);
+CREATE INDEX idx_payments_status_paid ON Payments (payment_status, paid_at);
+CREATE INDEX idx_payments_paid ON Payments (paid_at);
+
+-- Latest Task 1 / Task 2 score per user, so combined scores never scan the score history
+CREATE TABLE LatestWritingScores (
+    user_id VARCHAR(36) PRIMARY KEY,
+    task1_score_id VARCHAR(36),
+    task1_adjusted_score FLOAT,
+    task2_score_id VARCHAR(36),
+    task2_adjusted_score FLOAT,
+    updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE,
+    FOREIGN KEY (task1_score_id) REFERENCES WritingScores(id) ON DELETE SET NULL,
+    FOREIGN KEY (task2_score_id) REFERENCES WritingScores(id) ON DELETE SET NULL
+);
+
+INSERT INTO LatestWritingScores (user_id, task1_score_id, task1_adjusted_score, task2_score_id, task2_adjusted_score, updated_at)
+SELECT user_id,
+    MAX(CASE WHEN task_type = 'task1' THEN id END),
+    MAX(CASE WHEN task_type = 'task1' THEN adjusted_score END),
+    MAX(CASE WHEN task_type = 'task2' THEN id END),
+    MAX(CASE WHEN task_type = 'task2' THEN adjusted_score END),
+    NOW()
+FROM (
+    SELECT id, user_id, task_type, adjusted_score,
+        ROW_NUMBER() OVER (PARTITION BY user_id, task_type ORDER BY created_at DESC) AS position
+    FROM WritingScores
+    WHERE is_provisional = FALSE AND task_type IN ('task1', 'task2')
+) latest
+WHERE position = 1
+GROUP BY user_id;
+
+-- Credit reservations for GPT calls and the credit ledger (UserCredits.available_credits is its running total)
+CREATE TABLE CreditReservations (
+    id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    amount INTEGER NOT NULL,
+    reason VARCHAR(50) NOT NULL,
+    status ENUM('reserved', 'confirmed', 'released') NOT NULL DEFAULT 'reserved',
+    reference_id VARCHAR(36),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    settled_at DATETIME,
+    INDEX idx_credit_reservations_status_created (status, created_at),
+    FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE
+);
+
+CREATE TABLE CreditTransactions (
+    id VARCHAR(36) PRIMARY KEY,
+    user_id VARCHAR(36) NOT NULL,
+    amount INTEGER NOT NULL,
+    kind ENUM('opening', 'grant', 'reserve', 'release') NOT NULL,
+    reason VARCHAR(50),
+    reservation_id VARCHAR(36),
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    INDEX idx_credit_transactions_user_created (user_id, created_at),
+    FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE,
+    FOREIGN KEY (reservation_id) REFERENCES CreditReservations(id) ON DELETE SET NULL
+);
+
+INSERT INTO CreditTransactions (id, user_id, amount, kind, reason, created_at)
+SELECT UUID(), user_id, COALESCE(available_credits, 0), 'opening', 'migration', NOW()
+FROM UserCredits;
+
+ALTER TABLE ScoringJobs
+ADD COLUMN reservation_id VARCHAR(36),
+ADD CONSTRAINT fk_scoring_jobs_reservation FOREIGN KEY (reservation_id) REFERENCES CreditReservations(id) ON DELETE SET NULL;
+
+-- Rollups behind the admin dashboard (kept up to date by the app; `flask rebuild-rollups` recomputes them)
+CREATE TABLE DailyPaymentRollups (
+    day DATE NOT NULL,
+    payment_status VARCHAR(20) NOT NULL,
+    method VARCHAR(20) NOT NULL,
+    payment_count INTEGER NOT NULL DEFAULT 0,
+    amount DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    PRIMARY KEY (day, payment_status, method)
+);
+
+CREATE TABLE DailySignupRollups (
+    day DATE PRIMARY KEY,
+    signup_count INTEGER NOT NULL DEFAULT 0
+);
+
+CREATE TABLE SubscriptionRollups (
+    plan VARCHAR(20) NOT NULL,
+    status VARCHAR(20) NOT NULL,
+    subscription_count INTEGER NOT NULL DEFAULT 0,
+    PRIMARY KEY (plan, status)
+);
+
+INSERT INTO DailyPaymentRollups (day, payment_status, method, payment_count, amount)
+SELECT DATE(paid_at), payment_status, method, COUNT(id), COALESCE(SUM(amount), 0)
+FROM Payments
+WHERE paid_at IS NOT NULL
+GROUP BY DATE(paid_at), payment_status, method;
+
+INSERT INTO DailySignupRollups (day, signup_count)
+SELECT DATE(created_at), COUNT(id)
+FROM Users
+WHERE created_at IS NOT NULL
+GROUP BY DATE(created_at);
+
+INSERT INTO SubscriptionRollups (plan, status, subscription_count)
+SELECT plan, status, COUNT(id)
+FROM Subscriptions
+GROUP BY plan, status;
+
+CREATE INDEX idx_users_created ON Users (created_at);
+
+-- Admin user/order search (services/admin_search.py). The ngram parser drops every
+-- ngram containing a stopword, so run it with innodb_ft_enable_stopword = OFF (set it
+-- before creating the index) or an empty innodb_ft_server_stopword_table.
+ALTER TABLE Users ADD FULLTEXT INDEX ft_users_search (email, full_name) WITH PARSER ngram;
+CREATE INDEX idx_users_full_name ON Users (full_name);
+
+-- Admin order list and CSV export read Subscriptions newest first
+CREATE INDEX idx_subscriptions_start_date ON Subscriptions (start_date);
+
+-- Rolling per-user chat summaries (services/chat_context.py)
+CREATE TABLE ChatSummaries (
+    user_id VARCHAR(36) PRIMARY KEY,
+    summary TEXT NOT NULL,
+    summarized_until DATETIME NOT NULL,
+    summarized_until_id VARCHAR(36) NOT NULL,
+    message_count INTEGER NOT NULL DEFAULT 0,
+    updated_at DATETIME,
+    FOREIGN KEY (user_id) REFERENCES Users(id) ON DELETE CASCADE
+);
+
+-- Chat FAQ answer cache (services/chat_faq.py)
+CREATE TABLE ChatFaqEntries (
+    id VARCHAR(36) PRIMARY KEY,
+    question TEXT NOT NULL,
+    answer TEXT NOT NULL,
+    source ENUM('admin', 'history') NOT NULL DEFAULT 'admin',
+    enabled BOOLEAN NOT NULL DEFAULT TRUE,
+    asked_by INTEGER NOT NULL DEFAULT 0,
+    hit_count INTEGER NOT NULL DEFAULT 0,
+    created_by VARCHAR(36),
+    created_at DATETIME,
+    updated_at DATETIME,
+    expires_at DATETIME,
+    FOREIGN KEY (created_by) REFERENCES Users(id) ON DELETE SET NULL
+);
+
+-- Chat messages sorted and synced by an insertion sequence (GET /api/chat/<user_id>?after=):
+-- existing messages are numbered in (created_at, id) order, then seq becomes the primary key
+ALTER TABLE AIChats ADD COLUMN seq BIGINT NULL;
+SET @seq := 0;
+UPDATE AIChats SET seq = (@seq := @seq + 1) ORDER BY created_at, id;
+ALTER TABLE AIChats
+DROP PRIMARY KEY,
+MODIFY seq BIGINT NOT NULL AUTO_INCREMENT,
+ADD PRIMARY KEY (seq),
+ADD UNIQUE KEY uq_ai_chats_id (id);
+DROP INDEX idx_ai_chats_user_created ON AIChats;
+CREATE INDEX idx_ai_chats_user_seq ON AIChats (user_id, seq);
+
+-- Chat summaries mark the newest message folded in by its seq (run after the AIChats.seq migration)
+ALTER TABLE ChatSummaries ADD COLUMN summarized_until_seq BIGINT NULL;
+UPDATE ChatSummaries s SET summarized_until_seq = COALESCE((
+    SELECT MAX(c.seq) FROM AIChats c
+    WHERE c.user_id = s.user_id AND (c.created_at, c.id) <= (s.summarized_until, s.summarized_until_id)
+), 0);
+ALTER TABLE ChatSummaries
+MODIFY summarized_until_seq BIGINT NOT NULL,
+DROP COLUMN summarized_until,
+DROP COLUMN summarized_until_id;
@@ -4,10 +4,24 @@ from .extensions import db
 import json
 from datetime import datetime
 from zoneinfo import ZoneInfo
+from sqlalchemy.ext.compiler import compiles
+from .services.json_codec import json_dumps, json_loads
 
 def generate_uuid():
     return str(uuid.uuid4())
 
+def local_now():
+    """Naive Asia/Ho_Chi_Minh time, matching what the DateTime columns store."""
+    return datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")).replace(tzinfo=None)
+
+class JSONText(db.Text):
+    """JSON kept as text on the Python side, stored in a native JSON column on MySQL."""
+    cache_ok = True
+
+@compiles(JSONText, 'mysql')
+def compile_json_text_mysql(type_, compiler, **kw):
+    return 'JSON'
+
 class User(db.Model):
     __tablename__ = 'Users'
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
@@ -23,6 +37,14 @@ class User(db.Model):
     subscription = db.relationship('Subscription', backref='user', lazy=True, uselist=False)
     credits = db.relationship('UserCredits', backref='user', lazy=True, uselist=False)
 
+    __table_args__ = (
+        # Newest users on the admin dashboard
+        db.Index('idx_users_created', 'created_at'),
+        # Admin search (services/admin_search.py): substrings, and name prefixes of one-letter terms
+        db.Index('ft_users_search', 'email', 'full_name', mysql_prefix='FULLTEXT', mysql_with_parser='ngram'),
+        db.Index('idx_users_full_name', 'full_name'),
+    )
+
 class Essay(db.Model):
     __tablename__ = 'Essays'
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
@@ -55,13 +77,72 @@ class EssaySuggestion(db.Model):
 
 class AIChat(db.Model):
     __tablename__ = 'AIChats'
-    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    # Insertion order, assigned by the database: history, sync cursors and the GPT context sort on it,
+    # as created_at has whole seconds on MySQL and uuid4 ids are random
+    seq = db.Column(db.BigInteger().with_variant(db.Integer, 'sqlite'), primary_key=True, autoincrement=True)
+    id = db.Column(db.String(36), unique=True, nullable=False, default=generate_uuid)
     user_id = db.Column(db.String(36), db.ForeignKey('Users.id', ondelete='CASCADE'))
     message = db.Column(db.Text, nullable=False)
     role = db.Column(db.Enum('user', 'assistant'), nullable=False)
     # created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
 
+    __table_args__ = (
+        # Chat history, sync and context: latest messages of one user
+        db.Index('idx_ai_chats_user_seq', 'user_id', 'seq'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'message': self.message,
+            'role': self.role,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class ChatSummary(db.Model):
+    """Rolling summary of a user's chat messages older than the context window (services/chat_context.py)."""
+    __tablename__ = 'ChatSummaries'
+    user_id = db.Column(db.String(36), db.ForeignKey('Users.id', ondelete='CASCADE'), primary_key=True)
+    summary = db.Column(db.Text, nullable=False)
+    # Newest AIChat folded in, as its seq; newer messages are not covered yet
+    summarized_until_seq = db.Column(db.BigInteger, nullable=False)
+    message_count = db.Column(db.Integer, nullable=False, default=0)
+    updated_at = db.Column(db.DateTime, default=local_now, onupdate=local_now)
+
+class ChatFaqEntry(db.Model):
+    """A question answered from the chat FAQ cache instead of GPT (services/chat_faq.py)."""
+    __tablename__ = 'ChatFaqEntries'
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    question = db.Column(db.Text, nullable=False)
+    answer = db.Column(db.Text, nullable=False)
+    # 'admin' entries are curated; 'history' ones are rebuilt from past answers by a harvest
+    source = db.Column(db.Enum('admin', 'history'), nullable=False, default='admin')
+    enabled = db.Column(db.Boolean, nullable=False, default=True)
+    # Distinct users who asked it, for harvested entries
+    asked_by = db.Column(db.Integer, nullable=False, default=0)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_by = db.Column(db.String(36), db.ForeignKey('Users.id', ondelete='SET NULL'), nullable=True)
+    created_at = db.Column(db.DateTime, default=local_now)
+    updated_at = db.Column(db.DateTime, default=local_now, onupdate=local_now)
+    expires_at = db.Column(db.DateTime, nullable=True)  # never when NULL
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'question': self.question,
+            'answer': self.answer,
+            'source': self.source,
+            'enabled': self.enabled,
+            'asked_by': self.asked_by,
+            'hit_count': self.hit_count,
+            'created_by': self.created_by,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None
+        }
+
 class Export(db.Model):
     __tablename__ = 'Exports'
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
@@ -82,6 +163,13 @@ class Subscription(db.Model):
     # created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
 
+    __table_args__ = (
+        # Active subscription of a user (login, profile)
+        db.Index('idx_subscriptions_user_status', 'user_id', 'status'),
+        # Admin order list and CSV export, newest first
+        db.Index('idx_subscriptions_start_date', 'start_date'),
+    )
+
 class Payment(db.Model):
     __tablename__ = 'Payments'
     id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
@@ -93,6 +181,15 @@ class Payment(db.Model):
     # paid_at = db.Column(db.DateTime, default=datetime.utcnow)
     paid_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
 
+    user = db.relationship('User')
+
+    __table_args__ = (
+        # Admin revenue stats and recent successful payments
+        db.Index('idx_payments_status_paid', 'payment_status', 'paid_at'),
+        # Recent payments of any status
+        db.Index('idx_payments_paid', 'paid_at'),
+    )
+
 class UserCredits(db.Model):
     __tablename__ = 'UserCredits'
     user_id = db.Column(db.String(36), db.ForeignKey('Users.id', ondelete='CASCADE'), primary_key=True)
@@ -100,6 +197,67 @@ class UserCredits(db.Model):
     # last_updated = db.Column(db.DateTime, default=datetime.utcnow)
     last_updated = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
 
+# Rollups behind the admin dashboard, kept in step with Payments, Users and
+# Subscriptions by services/rollups.py (flask rebuild-rollups recomputes them)
+class DailyPaymentRollup(db.Model):
+    __tablename__ = 'DailyPaymentRollups'
+
+    day = db.Column(db.Date, primary_key=True)
+    payment_status = db.Column(db.String(20), primary_key=True)
+    method = db.Column(db.String(20), primary_key=True)
+    payment_count = db.Column(db.Integer, nullable=False, default=0)
+    amount = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+
+class DailySignupRollup(db.Model):
+    __tablename__ = 'DailySignupRollups'
+
+    day = db.Column(db.Date, primary_key=True)
+    signup_count = db.Column(db.Integer, nullable=False, default=0)
+
+class SubscriptionRollup(db.Model):
+    __tablename__ = 'SubscriptionRollups'
+
+    plan = db.Column(db.String(20), primary_key=True)
+    status = db.Column(db.String(20), primary_key=True)
+    subscription_count = db.Column(db.Integer, nullable=False, default=0)
+
+class CreditReservation(db.Model):
+    """Credits taken for one LLM-backed operation, until it succeeds (confirmed) or fails (released)."""
+    __tablename__ = 'CreditReservations'
+
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    user_id = db.Column(db.String(36), db.ForeignKey('Users.id', ondelete='CASCADE'), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)
+    reason = db.Column(db.String(50), nullable=False)
+    status = db.Column(db.Enum('reserved', 'confirmed', 'released'), nullable=False, default='reserved')
+    # What the credits paid for once confirmed (e.g. the WritingScore id)
+    reference_id = db.Column(db.String(36), nullable=True)
+
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
+    settled_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        # Open reservations left behind by a crashed process
+        db.Index('idx_credit_reservations_status_created', 'status', 'created_at'),
+    )
+
+class CreditTransaction(db.Model):
+    """One change to a user's credits; UserCredits.available_credits is the running total."""
+    __tablename__ = 'CreditTransactions'
+
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    user_id = db.Column(db.String(36), db.ForeignKey('Users.id', ondelete='CASCADE'), nullable=False)
+    amount = db.Column(db.Integer, nullable=False)  # negative when credits are taken
+    kind = db.Column(db.Enum('opening', 'grant', 'reserve', 'release'), nullable=False)
+    reason = db.Column(db.String(50), nullable=True)
+    reservation_id = db.Column(db.String(36), db.ForeignKey('CreditReservations.id', ondelete='SET NULL'), nullable=True)
+
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
+
+    __table_args__ = (
+        db.Index('idx_credit_transactions_user_created', 'user_id', 'created_at'),
+    )
+
 class WritingScore(db.Model):
     __tablename__ = 'WritingScores'
     
@@ -132,16 +290,56 @@ class WritingScore(db.Model):
     lexical_resource_feedback = db.Column(db.Text)
     grammatical_range_feedback = db.Column(db.Text)
     
-    # Corrections data with highlighting positions
-    corrections = db.Column(db.Text)
+    # Corrections data with highlighting positions, as JSON text; use ``corrections`` for the decoded value
+    corrections_json = db.Column('corrections', JSONText)
+    
+    # Scored by the local pre-scoring gate instead of GPT (not charged, not used in combined scores)
+    is_provisional = db.Column(db.Boolean, nullable=False, default=False)
+    
+    # GPT token usage of the analysis (0 when served from the analysis cache)
+    prompt_version = db.Column(db.String(20), nullable=True)
+    prompt_tokens = db.Column(db.Integer, nullable=True)
+    completion_tokens = db.Column(db.Integer, nullable=True)
     
     # created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
 
     
+    __table_args__ = (
+        # Latest score per task (LatestWritingScores backfill)
+        db.Index('idx_writing_scores_user_task_created', 'user_id', 'task_type', 'is_provisional', 'created_at'),
+        # Score history, newest first, paged by (created_at, id)
+        db.Index('idx_writing_scores_user_created', 'user_id', 'created_at', 'id'),
+    )
+
     # Relationships
     user = db.relationship('User', backref=db.backref('writing_scores', lazy=True))
 
+    @property
+    def corrections(self):
+        """Decoded corrections, parsed on first access and reused while the stored text is unchanged.
+
+        The returned dict is shared by every caller on this instance; copy it before mutating.
+        """
+        raw = self.corrections_json
+        if not raw:
+            return {}
+        cached = self.__dict__.get('_corrections_cache')
+        if cached is None or cached[0] != raw:
+            cached = (raw, json_loads(raw))
+            self.__dict__['_corrections_cache'] = cached
+        return cached[1]
+
+    @corrections.setter
+    def corrections(self, value):
+        if value is None or isinstance(value, str):
+            self.corrections_json = value
+            self.__dict__.pop('_corrections_cache', None)
+        else:
+            raw = json_dumps(value)
+            self.corrections_json = raw
+            self.__dict__['_corrections_cache'] = (raw, value)
+
     def to_dict(self):
         return {
             'id': self.id,
@@ -162,7 +360,11 @@ class WritingScore(db.Model):
             'coherence_cohesion_feedback': self.coherence_cohesion_feedback,
             'lexical_resource_feedback': self.lexical_resource_feedback,
             'grammatical_range_feedback': self.grammatical_range_feedback,
-            'corrections': json.loads(self.corrections) if self.corrections else {},
+            'corrections': self.corrections,
+            'is_provisional': self.is_provisional,
+            'prompt_version': self.prompt_version,
+            'prompt_tokens': self.prompt_tokens,
+            'completion_tokens': self.completion_tokens,
             'created_at': self.created_at.isoformat()
         }
 
@@ -181,6 +383,11 @@ class CombinedWritingScore(db.Model):
     # created_at = db.Column(db.DateTime, default=datetime.utcnow)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
 
+    __table_args__ = (
+        # Combined score history of a user, newest first
+        db.Index('idx_combined_scores_user_created', 'user_id', 'created_at'),
+    )
+
     # Relationships
     user = db.relationship('User', backref=db.backref('combined_writing_scores', lazy=True))
     task1_score = db.relationship('WritingScore', foreign_keys=[task1_score_id])
@@ -196,4 +403,77 @@ class CombinedWritingScore(db.Model):
             'created_at': self.created_at.isoformat(),
             'task1_score': self.task1_score.to_dict() if self.task1_score else None,
             'task2_score': self.task2_score.to_dict() if self.task2_score else None
-        } 
\ No newline at end of file
+        } 
+
+class LatestWritingScore(db.Model):
+    """Latest non-provisional Task 1 and Task 2 score of a user, kept up to date on every save."""
+    __tablename__ = 'LatestWritingScores'
+
+    user_id = db.Column(db.String(36), db.ForeignKey('Users.id', ondelete='CASCADE'), primary_key=True)
+    task1_score_id = db.Column(db.String(36), db.ForeignKey('WritingScores.id', ondelete='SET NULL'), nullable=True)
+    task1_adjusted_score = db.Column(db.Float, nullable=True)
+    task2_score_id = db.Column(db.String(36), db.ForeignKey('WritingScores.id', ondelete='SET NULL'), nullable=True)
+    task2_adjusted_score = db.Column(db.Float, nullable=True)
+
+    updated_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
+
+class AnalysisCacheEntry(db.Model):
+    __tablename__ = 'AnalysisCache'
+
+    # SHA-256 of the analysis inputs, model and prompt version
+    cache_key = db.Column(db.String(64), primary_key=True)
+    model = db.Column(db.String(50), nullable=False)
+    prompt_version = db.Column(db.String(20), nullable=False)
+
+    # Full analyze_essay result (scores, feedback, corrections with positions) as JSON
+    result = db.Column(db.Text, nullable=False)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
+    expires_at = db.Column(db.DateTime, nullable=True, index=True)
+
+class ScoringJob(db.Model):
+    __tablename__ = 'ScoringJobs'
+
+    id = db.Column(db.String(36), primary_key=True, default=generate_uuid)
+    user_id = db.Column(db.String(36), db.ForeignKey('Users.id', ondelete='CASCADE'), nullable=False)
+    status = db.Column(db.Enum('queued', 'running', 'succeeded', 'failed'), nullable=False, default='queued')
+
+    # Original /api/writing/score request body as JSON
+    payload = db.Column(db.Text, nullable=False)
+
+    # Set for items of POST /api/writing/score/batch; the key makes retries idempotent
+    batch_id = db.Column(db.String(64), nullable=True)
+    idempotency_key = db.Column(db.String(128), nullable=True)
+
+    writing_score_id = db.Column(db.String(36), db.ForeignKey('WritingScores.id', ondelete='SET NULL'), nullable=True)
+    # Credits held for a batch item, settled when the item finishes (also on a retry after a crash)
+    reservation_id = db.Column(db.String(36), db.ForeignKey('CreditReservations.id', ondelete='SET NULL'), nullable=True)
+    error = db.Column(db.Text)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")))
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('idx_scoring_jobs_status_created', 'status', 'created_at'),
+        db.UniqueConstraint('user_id', 'idempotency_key', name='uq_scoring_jobs_user_idempotency_key'),
+    )
+
+    writing_score = db.relationship('WritingScore', foreign_keys=[writing_score_id])
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'status': self.status,
+            'batch_id': self.batch_id,
+            'idempotency_key': self.idempotency_key,
+            'writing_score_id': self.writing_score_id,
+            'error': self.error,
+            'attempts': self.attempts,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'result': self.writing_score.to_dict() if self.writing_score else None
+        }
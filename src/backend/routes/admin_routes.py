@@ -3,6 +3,7 @@ from flask import Blueprint, request
 from ..controllers import admin_controller
 from flask_jwt_extended import jwt_required, get_jwt_identity, get_jwt
 from ..models import User
+from ..services.response_cache import admin_stats_cache
 
 admin_bp = Blueprint('admin', __name__, url_prefix='/api/admin')
 
@@ -46,30 +47,83 @@ def get_orders_route():
 
 @admin_bp.route('/orders/stats', methods=['GET'])
 @admin_required
+@admin_stats_cache.cached
 def get_order_stats_route():
     return admin_controller.get_order_stats()
 
 # Statistics routes
 @admin_bp.route('/stats/dashboard', methods=['GET'])
 @admin_required
+@admin_stats_cache.cached
 def get_dashboard_stats_route():
     return admin_controller.get_dashboard_stats()
 
 @admin_bp.route('/stats/monthly-revenue', methods=['GET'])
 @admin_required
+@admin_stats_cache.cached
 def get_monthly_revenue_route():
     return admin_controller.get_monthly_revenue()
 
 @admin_bp.route('/stats/user-growth', methods=['GET'])
 @admin_required
+@admin_stats_cache.cached
 def get_user_growth_route():
     return admin_controller.get_user_growth()
 
 @admin_bp.route('/stats/subscription', methods=['GET'])
 @admin_required
+@admin_stats_cache.cached
 def get_subscription_stats_route():
     return admin_controller.get_subscription_stats()
 
+# Analysis cache routes
+@admin_bp.route('/cache/analysis', methods=['GET'])
+@admin_required
+def get_analysis_cache_stats_route():
+    return admin_controller.get_analysis_cache_stats()
+
+@admin_bp.route('/cache/analysis', methods=['DELETE'])
+@admin_required
+def purge_analysis_cache_route():
+    return admin_controller.purge_analysis_cache()
+
+# LLM client metrics (attempts, retries, breaker state, latency percentiles per route)
+@admin_bp.route('/llm/metrics', methods=['GET'])
+@admin_required
+def get_llm_metrics_route():
+    return admin_controller.get_llm_metrics()
+
+# Chat FAQ cache routes (services/chat_faq.py)
+@admin_bp.route('/chat-faq', methods=['GET'])
+@admin_required
+def get_chat_faq_entries_route():
+    return admin_controller.get_chat_faq_entries()
+
+@admin_bp.route('/chat-faq', methods=['POST'])
+@admin_required
+def create_chat_faq_entry_route():
+    return admin_controller.create_chat_faq_entry(get_jwt_identity())
+
+@admin_bp.route('/chat-faq/<string:entry_id>', methods=['PUT'])
+@admin_required
+def update_chat_faq_entry_route(entry_id):
+    return admin_controller.update_chat_faq_entry(entry_id)
+
+@admin_bp.route('/chat-faq/<string:entry_id>', methods=['DELETE'])
+@admin_required
+def delete_chat_faq_entry_route(entry_id):
+    return admin_controller.delete_chat_faq_entry(entry_id)
+
+@admin_bp.route('/chat-faq/harvest', methods=['POST'])
+@admin_required
+def harvest_chat_faq_route():
+    return admin_controller.harvest_chat_faq()
+
+@admin_bp.route('/chat-faq/match', methods=['GET'])
+@admin_required
+def match_chat_faq_route():
+    return admin_controller.match_chat_faq()
+
 # Export routes
 @admin_bp.route('/export/orders', methods=['GET'])
 @admin_required
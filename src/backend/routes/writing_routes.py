@@ -1,6 +1,8 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app, Response, stream_with_context
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from ..controllers.writing_controller import score_essay, get_user_scores, get_score, get_combined_scores
+from ..controllers.writing_controller import score_essay, stream_score_essay, score_essay_batch, get_user_scores, get_score, get_combined_scores
+from ..services.scoring_jobs import enqueue_scoring_job, get_scoring_job, QueueFullError
+from ..services.llm_client import CircuitOpenError
 
 writing_bp = Blueprint('writing', __name__)
 
@@ -10,8 +12,56 @@ def create_score():
     try:
         data = request.get_json()
         user_id = get_jwt_identity()
+        if request.args.get('mode') == 'async':
+            # Queue the GPT analysis and let the client poll /jobs/<job_id>
+            job = enqueue_scoring_job(current_app._get_current_object(), user_id, data)
+            return jsonify({'job_id': job['id'], 'status': job['status']}), 202
         result = score_essay(user_id, data)
         return jsonify(result), 200
+    except (QueueFullError, CircuitOpenError) as e:
+        return jsonify({'error': str(e)}), 503
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@writing_bp.route('/score/batch', methods=['POST'])
+@jwt_required()
+def create_score_batch():
+    try:
+        data = request.get_json()
+        user_id = get_jwt_identity()
+        result = score_essay_batch(current_app._get_current_object(), user_id, data)
+        return jsonify(result), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@writing_bp.route('/score/stream', methods=['POST'])
+@jwt_required()
+def create_score_stream():
+    try:
+        data = request.get_json()
+        user_id = get_jwt_identity()
+        events = stream_score_essay(user_id, data)
+        return Response(
+            stream_with_context(events),
+            mimetype='text/event-stream',
+            headers={
+                'Cache-Control': 'no-cache',
+                'X-Accel-Buffering': 'no'  # Don't let nginx buffer the event stream
+            }
+        )
+    except Exception as e:
+        return jsonify({'error': str(e)}), 400
+
+@writing_bp.route('/jobs/<job_id>', methods=['GET'])
+@jwt_required()
+def get_job_status(job_id):
+    try:
+        user_id = get_jwt_identity()
+        wait = request.args.get('wait', 0, type=int)
+        job = get_scoring_job(job_id, user_id, wait=wait)
+        return jsonify(job), 200
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 404
     except Exception as e:
         return jsonify({'error': str(e)}), 400
 
@@ -20,7 +70,12 @@ def create_score():
 def list_scores():
     try:
         user_id = get_jwt_identity()
-        scores = get_user_scores(user_id)
+        scores = get_user_scores(
+            user_id,
+            limit=request.args.get('limit', type=int),
+            cursor=request.args.get('cursor'),
+            fields=request.args.get('fields')
+        )
         return jsonify(scores), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400
@@ -40,7 +95,12 @@ def get_score_detail(score_id):
 def list_combined_scores():
     try:
         user_id = get_jwt_identity()
-        combined_scores = get_combined_scores(user_id)
+        combined_scores = get_combined_scores(
+            user_id,
+            limit=request.args.get('limit', type=int),
+            cursor=request.args.get('cursor'),
+            fields=request.args.get('fields')
+        )
         return jsonify(combined_scores), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 400 
\ No newline at end of file
@@ -55,6 +55,10 @@ class WritingScoreSchema(SQLAlchemyAutoSchema):
         model = WritingScore
         include_relationships = True
         load_instance = True
+        exclude = ('corrections_json',)
+
+    # Sent as the stored JSON text, as clients have always received it; no decode/encode round trip
+    corrections = fields.String(attribute='corrections_json', dump_only=True)
 
     task_achievement = fields.Float(validate=validate.Range(min=0, max=9))
     coherence_cohesion = fields.Float(validate=validate.Range(min=0, max=9))
@@ -81,6 +85,29 @@ class WritingScoreSchema(SQLAlchemyAutoSchema):
         if value * 2 % 1 != 0:
             raise ValidationError("Score must be in 0.5 increments")
 
+# Score columns only; essay text, feedback and corrections are left to the detail endpoint
+WRITING_SCORE_SUMMARY_FIELDS = (
+    'id',
+    'task_type',
+    'word_count',
+    'time_spent',
+    'task_achievement',
+    'coherence_cohesion',
+    'lexical_resource',
+    'grammatical_range',
+    'overall_score',
+    'word_count_penalty',
+    'time_penalty',
+    'adjusted_score',
+    'is_provisional',
+    'created_at'
+)
+
+class WritingScoreSummarySchema(SQLAlchemyAutoSchema):
+    class Meta:
+        model = WritingScore
+        fields = WRITING_SCORE_SUMMARY_FIELDS
+
 # Initialize schemas
 user_schema = UserSchema()
 users_schema = UserSchema(many=True)
@@ -99,4 +126,6 @@ payments_schema = PaymentSchema(many=True)
 user_credits_schema = UserCreditsSchema()
 user_credits_list_schema = UserCreditsSchema(many=True)
 writing_score_schema = WritingScoreSchema()
-writing_scores_schema = WritingScoreSchema(many=True) 
\ No newline at end of file
+writing_scores_schema = WritingScoreSchema(many=True)
+writing_score_summary_schema = WritingScoreSummarySchema()
+writing_score_summaries_schema = WritingScoreSummarySchema(many=True) 
\ No newline at end of file
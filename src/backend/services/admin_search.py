@@ -0,0 +1,81 @@
+"""Search behind the admin user and order lists.
+
+On MySQL a term is looked up in the ``ft_users_search`` FULLTEXT index
+(ngram parser, so any substring of ``MIN_FULLTEXT_LENGTH`` characters or more
+matches, like the ``LIKE '%term%'`` it replaces); shorter terms match email and
+name prefixes through their B-tree indexes. Other databases (local SQLite)
+fall back to a case-insensitive substring LIKE.
+
+Matches are ranked exact email first, then email prefix, name prefix and
+prefix of a later word of the name, then by FULLTEXT relevance.
+"""
+from sqlalchemy import case, or_, select, union
+from sqlalchemy.dialects.mysql import match
+
+from ..extensions import db
+from ..models import Subscription, User
+
+# innodb ngram_token_size: shorter terms have no ngrams to look up
+MIN_FULLTEXT_LENGTH = 2
+
+_FULLTEXT_DIALECTS = ('mysql', 'mariadb')
+
+
+def normalize_term(term):
+    """Search box input with quotes dropped and whitespace collapsed; '' means no search."""
+    return ' '.join((term or '').replace('"', ' ').split())
+
+
+def _uses_fulltext():
+    return db.engine.dialect.name in _FULLTEXT_DIALECTS
+
+
+def _escape_like(term):
+    return term.replace('/', '//').replace('%', '/%').replace('_', '/_')
+
+
+def _relevance(term):
+    # A quoted phrase in boolean mode: the term's ngrams in sequence, i.e. a substring match
+    return match(User.email, User.full_name, against=f'"{term}"').in_boolean_mode()
+
+
+def user_search_condition(term):
+    """WHERE clause on User for a normalized, non-empty ``term``."""
+    escaped = _escape_like(term)
+    if not _uses_fulltext():
+        pattern = f"%{escaped}%"
+        return or_(User.email.ilike(pattern, escape='/'), User.full_name.ilike(pattern, escape='/'))
+    if len(term) >= MIN_FULLTEXT_LENGTH:
+        return _relevance(term)
+    # Plain LIKE: the column collation is case-insensitive, and LOWER() would rule out the index
+    return or_(User.email.like(f"{escaped}%", escape='/'), User.full_name.like(f"{escaped}%", escape='/'))
+
+
+def user_search_ranking(term):
+    """ORDER BY clauses putting the closest matches of ``term`` first."""
+    escaped = _escape_like(term)
+    ranking = [case(
+        (User.email.ilike(escaped, escape='/'), 0),
+        (User.email.ilike(f"{escaped}%", escape='/'), 1),
+        (User.full_name.ilike(f"{escaped}%", escape='/'), 2),
+        (User.full_name.ilike(f"% {escaped}%", escape='/'), 3),
+        else_=4
+    )]
+    if _uses_fulltext() and len(term) >= MIN_FULLTEXT_LENGTH:
+        ranking.append(_relevance(term).desc())
+    return ranking
+
+
+def order_search_condition(term):
+    """WHERE clause for the Subscription/User join of the order list: the user, or a plan containing ``term``."""
+    plans = [plan for plan in Subscription.plan.type.enums if term.lower() in plan]
+    condition = user_search_condition(term)
+    if not plans:
+        return condition
+    # MySQL cannot use the FULLTEXT index for MATCH ... OR plan IN (...) and scans every order; the two
+    # lookups run separately instead, their ids unioned in a derived table so it is materialized once
+    matching = union(
+        select(Subscription.id).join(User, Subscription.user_id == User.id).where(condition),
+        select(Subscription.id).where(Subscription.plan.in_(plans))
+    ).subquery()
+    return Subscription.id.in_(select(matching.c.id))
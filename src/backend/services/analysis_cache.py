@@ -0,0 +1,184 @@
+"""Content-addressed cache for analyze_essay results.
+
+Two tiers: a per-process LRU with TTL in front of the AnalysisCache table,
+so a resubmitted essay is answered without another GPT round trip.
+"""
+import copy
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from datetime import timedelta
+
+from sqlalchemy import delete, func, insert, select, update
+from sqlalchemy.exc import IntegrityError
+
+from ..extensions import db
+from ..models import AnalysisCacheEntry, local_now
+from ..config.config import Config
+
+
+def make_cache_key(essay_text, task_type, prompt, context, instructions, source, model, prompt_version, notes=None):
+    """Hash every input that can change the GPT analysis."""
+    parts = [essay_text, task_type, prompt, context, instructions, source, model, prompt_version]
+    if notes:
+        # Only appended when present so keys of un-annotated requests stay stable
+        parts.append(notes)
+    payload = json.dumps(
+        parts,
+        ensure_ascii=False,
+        separators=(',', ':')
+    )
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+class AnalysisCache:
+    def __init__(self, max_entries, ttl, db_ttl, enabled=True):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_ttl = db_ttl
+        self.enabled = enabled
+        self._entries = OrderedDict()  # cache_key -> (expires_at monotonic, result)
+        self._lock = threading.Lock()
+        self._stats = {
+            'memory_hits': 0,
+            'db_hits': 0,
+            'misses': 0,
+            'stores': 0,
+            'evictions': 0,
+            'errors': 0
+        }
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def _remember(self, key, result):
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, result)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+
+    def get(self, key):
+        """Return a copy of the cached result, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > time.monotonic():
+                    self._entries.move_to_end(key)
+                    self._stats['memory_hits'] += 1
+                    return copy.deepcopy(entry[1])
+                del self._entries[key]
+
+        table = AnalysisCacheEntry.__table__
+        try:
+            with db.engine.begin() as conn:
+                row = conn.execute(
+                    select(table.c.result).where(
+                        table.c.cache_key == key,
+                        (table.c.expires_at.is_(None)) | (table.c.expires_at > local_now())
+                    )
+                ).first()
+                if row is not None:
+                    conn.execute(
+                        update(table)
+                        .where(table.c.cache_key == key)
+                        .values(hit_count=table.c.hit_count + 1)
+                    )
+        except Exception:
+            # The cache must never break scoring; treat DB problems as a miss
+            self._count('errors')
+            row = None
+
+        if row is None:
+            self._count('misses')
+            return None
+
+        result = json.loads(row.result)
+        self._remember(key, result)
+        self._count('db_hits')
+        return copy.deepcopy(result)
+
+    def set(self, key, result, model, prompt_version):
+        """Store a result in both tiers."""
+        if not self.enabled:
+            return
+
+        self._remember(key, copy.deepcopy(result))
+        self._count('stores')
+
+        table = AnalysisCacheEntry.__table__
+        values = {
+            'model': model,
+            'prompt_version': prompt_version,
+            'result': json.dumps(result, ensure_ascii=False),
+            'created_at': local_now(),
+            'expires_at': local_now() + timedelta(seconds=self.db_ttl)
+        }
+        try:
+            with db.engine.begin() as conn:
+                updated = conn.execute(update(table).where(table.c.cache_key == key).values(**values)).rowcount
+                if not updated:
+                    conn.execute(insert(table).values(cache_key=key, hit_count=0, **values))
+        except IntegrityError:
+            # Another worker stored the same key first; its copy is just as good
+            pass
+        except Exception:
+            self._count('errors')
+
+    def purge(self, expired_only=False):
+        """Drop cached results; returns how many entries were removed per tier."""
+        with self._lock:
+            if expired_only:
+                now = time.monotonic()
+                stale = [key for key, (expires_at, _) in self._entries.items() if expires_at <= now]
+                for key in stale:
+                    del self._entries[key]
+                memory_removed = len(stale)
+            else:
+                memory_removed = len(self._entries)
+                self._entries.clear()
+
+        table = AnalysisCacheEntry.__table__
+        statement = delete(table)
+        if expired_only:
+            statement = statement.where(table.c.expires_at <= local_now())
+        with db.engine.begin() as conn:
+            db_removed = conn.execute(statement).rowcount
+
+        return {'memory': memory_removed, 'database': db_removed}
+
+    def get_stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+            stats['memory_entries'] = len(self._entries)
+
+        lookups = stats['memory_hits'] + stats['db_hits'] + stats['misses']
+        stats['hit_ratio'] = round((stats['memory_hits'] + stats['db_hits']) / lookups, 4) if lookups else 0.0
+        stats['enabled'] = self.enabled
+        stats['max_entries'] = self.max_entries
+        stats['ttl'] = self.ttl
+        stats['db_ttl'] = self.db_ttl
+
+        try:
+            table = AnalysisCacheEntry.__table__
+            with db.engine.connect() as conn:
+                stats['db_entries'] = conn.execute(select(func.count()).select_from(table)).scalar()
+        except Exception:
+            stats['db_entries'] = None
+
+        return stats
+
+
+analysis_cache = AnalysisCache(
+    max_entries=Config.ANALYSIS_CACHE_MAX_ENTRIES,
+    ttl=Config.ANALYSIS_CACHE_TTL,
+    db_ttl=Config.ANALYSIS_CACHE_DB_TTL,
+    enabled=Config.ANALYSIS_CACHE_ENABLED
+)
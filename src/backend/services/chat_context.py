@@ -0,0 +1,203 @@
+"""Token-bounded context for the GPT chat.
+
+Each turn sends the user's rolling summary (ChatSummaries), then as many of
+the newest messages not yet summarized as fit in ``CHAT_CONTEXT_TOKENS``
+(summary and new message included), so prompt size and latency stay bounded
+however long or short the messages are.
+
+Messages that no longer fit are folded into the summary by a small
+background pool, one update per user at a time, once
+``CHAT_SUMMARY_MIN_MESSAGES`` of them are waiting; until then they are
+neither in the window nor in the summary. An update reads at most
+``CHAT_SUMMARY_SOURCE_TOKENS`` of them, newest first, so the first summary
+of a long history only covers its most recent part.
+"""
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+
+from ..config.config import Config
+from ..config.openai_config import OPENAI_MODEL
+from ..extensions import db
+from ..models import AIChat, ChatSummary, local_now
+from .chat_write_buffer import chat_write_buffer
+from .llm_client import llm_client
+from .prompt_templates import count_tokens
+from .structured_logging import log_event
+
+# Role and separators around every message of a chat request
+MESSAGE_OVERHEAD_TOKENS = 4
+
+SUMMARY_PREFIX = "Summary of your earlier conversation with this student:\n"
+
+SUMMARY_INSTRUCTIONS = """You keep a running summary of a conversation between an IELTS tutor and a student.
+Merge the new messages into the current summary. Keep what later answers may depend on: the student's goals \
+and target band, their level and recurring mistakes, topics covered, advice already given and open questions.
+Write in the third person, in at most {words} words, and reply with the summary only."""
+
+
+def _tokens(text):
+    count = count_tokens(text, OPENAI_MODEL)
+    # Without tiktoken (or its encoding files), about four characters per token
+    return count if count is not None else len(text) // 4 + 1
+
+
+def _message_tokens(text):
+    return _tokens(text) + MESSAGE_OVERHEAD_TOKENS
+
+
+def build_context(user_id, user_message):
+    """Summary, recent history and the new message in OpenAI format (without the system prompt)."""
+    summary = db.session.get(ChatSummary, user_id) if Config.CHAT_SUMMARY_ENABLED else None
+    budget = Config.CHAT_CONTEXT_TOKENS - _message_tokens(user_message)
+    messages = []
+
+    query = AIChat.query.filter_by(user_id=user_id)
+    if summary is not None:
+        summary_text = SUMMARY_PREFIX + summary.summary
+        budget -= _message_tokens(summary_text)
+        messages.append({"role": "system", "content": summary_text})
+        query = query.filter(AIChat.seq > summary.summarized_until_seq)
+
+    # One row past the cap tells whether older unsummarized messages exist
+    rows = query.order_by(AIChat.seq.desc()).limit(Config.CHAT_CONTEXT_MAX_MESSAGES + 1).all()
+    # Messages of earlier turns still queued by the write-behind buffer are newer than any stored one
+    pending = chat_write_buffer.pending_for(user_id, Config.CHAT_CONTEXT_MAX_MESSAGES + 1)
+    rows = [AIChat(**row) for row in pending] + rows
+    window = []
+    for row in rows[:Config.CHAT_CONTEXT_MAX_MESSAGES]:
+        cost = _message_tokens(row.message)
+        if cost > budget:
+            break
+        budget -= cost
+        window.append(row)
+
+    left_out = rows[len(window):]
+    # Queued rows have no seq yet; the summary folds in stored ones only
+    stored = [row for row in left_out if row.seq is not None]
+    if Config.CHAT_SUMMARY_ENABLED and stored and (
+        len(left_out) >= Config.CHAT_SUMMARY_MIN_MESSAGES or len(rows) > Config.CHAT_CONTEXT_MAX_MESSAGES
+    ):
+        schedule_summary_update(current_app._get_current_object(), user_id, stored[0].seq)
+
+    messages.extend({"role": row.role, "content": row.message} for row in reversed(window))
+    messages.append({"role": "user", "content": user_message})
+    return messages
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = set()  # users with an update queued or running in this process
+_pending_lock = threading.Lock()
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.CHAT_SUMMARY_WORKERS,
+                thread_name_prefix='chat-summary'
+            )
+        return _executor
+
+
+def schedule_summary_update(app, user_id, until_seq):
+    """Fold the user's messages up to and including ``until_seq`` into the summary, in the background.
+
+    Returns False when an update for the user is already pending.
+    """
+    with _pending_lock:
+        if user_id in _pending:
+            return False
+        _pending.add(user_id)
+    _get_executor().submit(_run_summary_update, app, user_id, until_seq)
+    return True
+
+
+def _run_summary_update(app, user_id, until_seq):
+    with app.app_context():
+        try:
+            update_summary(user_id, until_seq)
+        except Exception as e:
+            db.session.rollback()
+            log_event('chat_summary_failed', level=logging.ERROR, user_id=user_id, error=str(e))
+        finally:
+            with _pending_lock:
+                _pending.discard(user_id)
+
+
+def update_summary(user_id, until_seq):
+    """Merge unsummarized messages up to ``until_seq`` into the user's summary; returns how many were folded in."""
+    summary = db.session.get(ChatSummary, user_id)
+    current_text = summary.summary if summary is not None else None
+    current_until_seq = summary.summarized_until_seq if summary is not None else None
+
+    query = AIChat.query.filter(AIChat.user_id == user_id, AIChat.seq <= until_seq)
+    if summary is not None:
+        query = query.filter(AIChat.seq > summary.summarized_until_seq)
+    rows = query.order_by(AIChat.seq.desc()).limit(Config.CHAT_CONTEXT_MAX_MESSAGES).all()
+    if not rows:
+        db.session.rollback()
+        return 0
+
+    budget = Config.CHAT_SUMMARY_SOURCE_TOKENS
+    picked = []
+    for row in rows:
+        budget -= _message_tokens(row.message)
+        if budget < 0 and picked:
+            break
+        picked.append((row.role, row.message))
+    newest_seq = rows[0].seq
+    # No transaction stays open during the GPT call
+    db.session.rollback()
+
+    transcript = "\n\n".join(
+        f"{'Student' if role == 'user' else 'Tutor'}: {message[:Config.CHAT_SUMMARY_SOURCE_TOKENS * 4]}"
+        for role, message in reversed(picked)
+    )
+    response = llm_client.chat_completion(
+        'chat_summary',
+        model=OPENAI_MODEL,
+        messages=[
+            {"role": "system", "content": SUMMARY_INSTRUCTIONS.format(words=Config.CHAT_SUMMARY_MAX_TOKENS * 3 // 4)},
+            {"role": "user", "content": f"Current summary:\n{current_text or '(none yet)'}\n\nNew messages:\n{transcript}"}
+        ],
+        temperature=0.2,
+        max_tokens=Config.CHAT_SUMMARY_MAX_TOKENS
+    )
+    text = (response.choices[0].message.content or '').strip()
+    if not text:
+        return 0
+
+    values = {
+        'summary': text,
+        'summarized_until_seq': newest_seq,
+        'updated_at': local_now()
+    }
+    if current_until_seq is None:
+        db.session.add(ChatSummary(user_id=user_id, message_count=len(picked), **values))
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            log_event('chat_summary_conflict', user_id=user_id)
+            return 0
+    else:
+        # Another process may have moved the summary on meanwhile; its update wins
+        updated = db.session.execute(
+            update(ChatSummary)
+            .where(ChatSummary.user_id == user_id, ChatSummary.summarized_until_seq == current_until_seq)
+            .values(message_count=ChatSummary.message_count + len(picked), **values)
+        ).rowcount
+        db.session.commit()
+        if not updated:
+            log_event('chat_summary_conflict', user_id=user_id)
+            return 0
+
+    log_event('chat_summary_updated', user_id=user_id, messages=len(picked), summary_tokens=_tokens(text))
+    return len(picked)
@@ -0,0 +1,382 @@
+"""Near-duplicate answer cache for frequently asked chat questions.
+
+A large share of chat traffic is the same few questions (band descriptors,
+the Task 1 and Task 2 formats, time limits). The enabled entries of
+ChatFaqEntries, written by admins or harvested from past answers to
+questions many users asked and then approved by an admin, are indexed in
+memory, and a new question close enough to one of
+them gets the stored answer in well under a millisecond instead of a GPT
+round trip.
+
+Matching is local: the question is reduced to terms (Unicode NFKC, lower
+case, punctuation and filler words dropped, light stemming); MinHash
+signatures of the term set, bucketed by LSH bands, find the entries sharing
+terms with it, and the best of those by TF-IDF cosine (IDF over the indexed
+questions) answers if it reaches ``CHAT_FAQ_MIN_SIMILARITY`` and mentions the
+same numbers, since Task 1 is not Task 2 and band 6 is not band 7.
+
+A cached answer ignores the conversation so far, so only messages up to
+``CHAT_FAQ_MAX_QUESTION_CHARS`` are looked up and clients can opt out per
+request. Every hit is logged (``chat_faq_hit``). Edits made through a process
+apply to it at once; other processes pick them up within
+``CHAT_FAQ_RELOAD_INTERVAL`` seconds, when they also save their hit counts.
+"""
+import hashlib
+import logging
+import math
+import random
+import re
+import threading
+import time
+import unicodedata
+from collections import Counter, defaultdict, namedtuple
+from datetime import timedelta
+
+from sqlalchemy import bindparam, delete, insert, select, update
+
+from ..config.config import Config
+from ..extensions import db
+from ..models import AIChat, ChatFaqEntry, generate_uuid, local_now
+from .text_utils import stem
+from .structured_logging import log_event
+
+# Words, or numbers such as 7 or 6.5
+_TOKEN = re.compile(r"[^\W\d_]+|\d+(?:[.,]\d+)?")
+
+_STOPWORDS = frozenset("""
+a an the is are am was were be been do does did i me my we our you your it its this that these those to of in on
+at for and or but so if can could would should will shall may might must please tell know want wondering question
+hi hello hey thanks thank dear teacher tutor ok okay just about any some really
+""".split())
+
+MINHASH_PERMUTATIONS = 66
+# Signature values per band: 22 bands, so term sets with a Jaccard index of 0.5 meet 95% of the
+# time and ones sharing only a common word or two (0.2) 16% of the time
+LSH_ROWS = 3
+MIN_ANSWER_CHARS = 80  # shorter past replies (errors, one-liners) are not harvested
+HARVEST_BATCH_SIZE = 1000  # chat rows fetched per round trip
+
+FaqMatch = namedtuple('FaqMatch', 'entry_id answer source similarity')
+
+def question_terms(text):
+    """Comparable terms of a question, in order."""
+    text = unicodedata.normalize('NFKC', text).lower()
+    return [
+        token.replace(',', '.') if token[0].isdigit() else stem(token)
+        for token in _TOKEN.findall(text)
+        if token not in _STOPWORDS
+    ]
+
+
+def _numbers(terms):
+    return frozenset(term for term in terms if term[0].isdigit())
+
+
+class MinHasher:
+    """MinHash signatures of term sets.
+
+    Each permutation XORs a 64-bit term hash with a fixed random mask, which
+    stays within machine-sized integers and is several times cheaper than
+    ``(a * h + b) % p`` in Python, at a small cost in independence.
+    """
+
+    def __init__(self, permutations=MINHASH_PERMUTATIONS, seed=20240601):
+        rng = random.Random(seed)
+        self._masks = [rng.getrandbits(64) for _ in range(permutations)]
+
+    def signature(self, terms):
+        hashes = [int.from_bytes(hashlib.blake2b(term.encode('utf-8'), digest_size=8).digest(), 'big') for term in set(terms)]
+        return tuple(min(h ^ mask for h in hashes) for mask in self._masks)
+
+    def band_keys(self, terms):
+        signature = self.signature(terms)
+        return [(start, signature[start:start + LSH_ROWS]) for start in range(0, len(signature), LSH_ROWS)]
+
+
+_hasher = MinHasher()
+
+
+class FaqIndex:
+    """Questions indexed for near-duplicate lookup; IDF comes from ``corpus`` (term lists)."""
+
+    def __init__(self, corpus):
+        document_frequency = Counter()
+        for terms in corpus:
+            document_frequency.update(set(terms))
+        self._document_frequency = document_frequency
+        self._documents = len(corpus)
+        self._buckets = defaultdict(list)
+        self.items = []  # (payload, vector, norm, numbers)
+
+    def __len__(self):
+        return len(self.items)
+
+    def _vector(self, terms):
+        # Smoothed IDF: terms unknown to the corpus weigh the most
+        vector = {
+            term: (1 + math.log(count)) * (math.log((1 + self._documents) / (1 + self._document_frequency[term])) + 1)
+            for term, count in Counter(terms).items()
+        }
+        return vector, math.sqrt(sum(value * value for value in vector.values()))
+
+    def add(self, terms, payload):
+        vector, norm = self._vector(terms)
+        position = len(self.items)
+        self.items.append((payload, vector, norm, _numbers(terms)))
+        for key in _hasher.band_keys(terms):
+            self._buckets[key].append(position)
+        return position
+
+    def match(self, terms, min_similarity, accept=None):
+        """``(position, similarity)`` of the most similar indexed question above ``min_similarity``, or None."""
+        if not terms or not self.items:
+            return None
+        candidates = {position for key in _hasher.band_keys(terms) for position in self._buckets.get(key, ())}
+        if not candidates:
+            return None
+
+        vector, norm = self._vector(terms)
+        numbers = _numbers(terms)
+        best = None
+        for position in candidates:
+            payload, other, other_norm, other_numbers = self.items[position]
+            if other_numbers != numbers or (accept is not None and not accept(payload)):
+                continue
+            dot = sum(value * other[term] for term, value in vector.items() if term in other)
+            similarity = dot / (norm * other_norm) if norm and other_norm else 0.0
+            if similarity >= min_similarity and (best is None or similarity > best[1]):
+                best = (position, similarity)
+        return best
+
+
+class ChatFaqCache:
+    def __init__(self, min_similarity, max_question_chars, reload_interval, enabled=True):
+        self.min_similarity = min_similarity
+        self.max_question_chars = max_question_chars
+        self.reload_interval = reload_interval
+        self.enabled = enabled
+        self._index = None
+        self._loaded_at = None  # monotonic
+        self._generation = 0  # bumped by invalidate(), so a reload racing an edit is not kept as fresh
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._unsaved_hits = Counter()  # entry id -> hits not yet added to hit_count
+        self._stats = {'hits': 0, 'misses': 0, 'skipped': 0, 'reloads': 0, 'errors': 0}
+
+    def _count(self, name):
+        with self._lock:
+            self._stats[name] += 1
+
+    def invalidate(self):
+        """Reload the entries on the next lookup."""
+        self._generation += 1
+        self._loaded_at = None
+
+    def _current_index(self):
+        index = self._index
+        stale = self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_interval
+        if not stale:
+            return index
+        # One thread reloads; the others keep answering from the previous index meanwhile
+        if not self._load_lock.acquire(blocking=index is None):
+            return index
+        try:
+            if self._loaded_at is None or time.monotonic() - self._loaded_at > self.reload_interval:
+                generation = self._generation
+                self._index = self._load()
+                if generation == self._generation:
+                    self._loaded_at = time.monotonic()
+                self._count('reloads')
+        except Exception as e:
+            # The cache must never break the chat: keep the previous index and retry later
+            self._count('errors')
+            self._loaded_at = time.monotonic()
+            log_event('chat_faq_reload_failed', level=logging.ERROR, error=str(e))
+        finally:
+            self._load_lock.release()
+        return self._index
+
+    def _load(self):
+        table = ChatFaqEntry.__table__
+        with self._lock:
+            hits, self._unsaved_hits = self._unsaved_hits, Counter()
+        try:
+            with db.engine.begin() as conn:
+                if hits:
+                    conn.execute(
+                        update(table)
+                        .where(table.c.id == bindparam('entry_id'))
+                        .values(hit_count=table.c.hit_count + bindparam('hits')),
+                        [{'entry_id': entry_id, 'hits': count} for entry_id, count in hits.items()]
+                    )
+                rows = conn.execute(
+                    select(table.c.id, table.c.question, table.c.answer, table.c.source, table.c.expires_at).where(
+                        table.c.enabled.is_(True),
+                        (table.c.expires_at.is_(None)) | (table.c.expires_at > local_now())
+                    )
+                ).all()
+        except Exception:
+            with self._lock:
+                self._unsaved_hits.update(hits)
+            raise
+
+        entries = [(row, question_terms(row.question)) for row in rows]
+        index = FaqIndex([terms for _, terms in entries])
+        for row, terms in entries:
+            if terms:
+                index.add(terms, row)
+        return index
+
+    def lookup(self, question, user_id=None, record=True):
+        """A FaqMatch for ``question``, or None. ``record=False`` (admin tests) neither logs nor counts."""
+        if not self.enabled or not isinstance(question, str) or not question:
+            return None
+        started = time.perf_counter()
+        if len(question) > self.max_question_chars:
+            if record:
+                self._count('skipped')
+            return None
+
+        terms = question_terms(question)
+        index = self._current_index()
+        now = local_now()
+        found = index.match(
+            terms, self.min_similarity,
+            accept=lambda row: row.expires_at is None or row.expires_at > now
+        ) if index is not None else None
+        if found is None:
+            if record:
+                self._count('misses')
+            return None
+
+        position, similarity = found
+        row = index.items[position][0]
+        match = FaqMatch(row.id, row.answer, row.source, round(similarity, 3))
+        if record:
+            with self._lock:
+                self._stats['hits'] += 1
+                self._unsaved_hits[row.id] += 1
+            log_event(
+                'chat_faq_hit',
+                user_id=user_id,
+                entry_id=row.id,
+                source=row.source,
+                similarity=match.similarity,
+                lookup_ms=round((time.perf_counter() - started) * 1000, 3)
+            )
+        return match
+
+    def get_stats(self):
+        index = self._index
+        with self._lock:
+            stats = dict(self._stats)
+            stats['unsaved_hits'] = sum(self._unsaved_hits.values())
+        lookups = stats['hits'] + stats['misses']
+        stats.update({
+            'enabled': self.enabled,
+            'entries': len(index) if index is not None else None,
+            'hit_rate': round(stats['hits'] / lookups, 4) if lookups else None,
+            'min_similarity': self.min_similarity
+        })
+        return stats
+
+    def harvest(self, days=None, min_users=None):
+        """Rebuild the proposed 'history' entries from past answers; returns counts of what was read and stored.
+
+        Pairs every short user message of the last ``days`` days with the
+        assistant reply that followed it, groups near-duplicate questions and
+        keeps the groups asked by at least ``min_users`` distinct users that
+        no enabled entry already answers, with the most recent reply.
+
+        Those replies were written with the asker's history and summary in
+        the prompt and may repeat their personal details, so entries are
+        stored disabled: they answer nobody until an admin has read and
+        enabled them, and their ``CHAT_FAQ_TTL`` runs from then. Approved
+        entries are kept; proposals not yet approved, and expired entries,
+        are replaced.
+        """
+        days = Config.CHAT_FAQ_HARVEST_DAYS if days is None else days
+        min_users = Config.CHAT_FAQ_HARVEST_MIN_USERS if min_users is None else min_users
+
+        statement = (
+            select(AIChat.user_id, AIChat.role, AIChat.message)
+            .where(AIChat.created_at >= local_now() - timedelta(days=days))
+            .order_by(AIChat.user_id, AIChat.seq)
+            .execution_options(yield_per=HARVEST_BATCH_SIZE)
+        )
+        pairs = []  # (user_id, question, terms, answer), oldest first per user
+        waiting = None
+        with db.engine.connect() as conn:
+            for user_id, role, message in conn.execute(statement):
+                if role == 'user':
+                    terms = question_terms(message) if len(message) <= self.max_question_chars else None
+                    waiting = (user_id, message, terms) if terms else None
+                elif waiting is not None and waiting[0] == user_id:
+                    if len(message) >= MIN_ANSWER_CHARS:
+                        pairs.append(waiting + (message,))
+                    waiting = None
+
+        groups = FaqIndex([terms for _, _, terms, _ in pairs])
+        for user_id, question, terms, answer in pairs:
+            found = groups.match(terms, self.min_similarity)
+            if found is None:
+                groups.add(terms, {'users': {user_id}, 'questions': Counter([question]), 'answer': answer})
+            else:
+                group = groups.items[found[0]][0]
+                group['users'].add(user_id)
+                group['questions'][question] += 1
+                group['answer'] = answer
+
+        now = local_now()
+        enabled_rows = db.session.execute(
+            select(ChatFaqEntry.question).where(
+                ChatFaqEntry.enabled.is_(True),
+                (ChatFaqEntry.expires_at.is_(None)) | (ChatFaqEntry.expires_at > now)
+            )
+        ).all()
+        enabled_terms = [question_terms(row.question) for row in enabled_rows]
+        curated = FaqIndex(enabled_terms)
+        for terms in enabled_terms:
+            if terms:
+                curated.add(terms, None)
+
+        entries = []
+        for group, _, _, _ in groups.items:
+            question = group['questions'].most_common(1)[0][0]
+            if len(group['users']) < min_users or curated.match(question_terms(question), self.min_similarity):
+                continue
+            entries.append({
+                'id': generate_uuid(),
+                'question': question,
+                'answer': group['answer'],
+                'source': 'history',
+                'enabled': False,
+                'asked_by': len(group['users']),
+                'hit_count': 0,
+                'created_at': now,
+                'updated_at': now,
+                'expires_at': None
+            })
+
+        try:
+            db.session.execute(delete(ChatFaqEntry).where(
+                ChatFaqEntry.source == 'history',
+                ChatFaqEntry.enabled.is_(False) | (ChatFaqEntry.expires_at <= now)
+            ))
+            if entries:
+                db.session.execute(insert(ChatFaqEntry), entries)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        self.invalidate()
+        log_event('chat_faq_harvested', questions=len(pairs), groups=len(groups), entries=len(entries))
+        return {'questions': len(pairs), 'groups': len(groups), 'entries': len(entries)}
+
+
+chat_faq_cache = ChatFaqCache(
+    min_similarity=Config.CHAT_FAQ_MIN_SIMILARITY,
+    max_question_chars=Config.CHAT_FAQ_MAX_QUESTION_CHARS,
+    reload_interval=Config.CHAT_FAQ_RELOAD_INTERVAL,
+    enabled=Config.CHAT_FAQ_ENABLED
+)
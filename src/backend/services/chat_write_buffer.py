@@ -0,0 +1,155 @@
+"""Optional write-behind buffer for chat messages (``CHAT_WRITE_BEHIND``).
+
+When enabled, a finished chat turn is queued in memory instead of being
+committed on the request path, and a background thread inserts queued rows
+in batches of up to ``CHAT_WRITE_BEHIND_BATCH`` with one multi-row INSERT and
+one commit, every ``CHAT_WRITE_BEHIND_INTERVAL`` seconds or as soon as a
+batch is full.
+
+Durability guarantees, in exchange for the saved commits:
+
+* a message is acknowledged to the client before it is durable. If the
+  process dies (crash, SIGKILL, OOM) the rows still queued are lost: at most
+  ``CHAT_WRITE_BEHIND_INTERVAL`` seconds' worth, or ``CHAT_WRITE_BEHIND_MAX_PENDING``
+  rows while the database is unreachable. A normal shutdown flushes the queue
+  (``atexit``);
+* rows are written in the order they were queued and each batch is atomic;
+* while the database fails, rows stay queued and are retried on the next
+  tick. A row the database rejects (e.g. its user was deleted) is dropped and
+  logged without holding back the rest of its batch;
+* once ``CHAT_WRITE_BEHIND_MAX_PENDING`` rows are queued, ``add`` refuses new
+  rows and the caller commits them itself, so memory stays bounded;
+* queued rows are visible to later turns of the same user in this process
+  (``pending_for``, used for the chat context) but not to other processes or
+  to the history endpoint until flushed.
+
+``benchmarks/check_chat_write_behind.py`` checks these guarantees.
+"""
+import atexit
+import logging
+import threading
+
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+
+from ..config.config import Config
+from ..extensions import db
+from ..models import AIChat
+from .structured_logging import log_event
+
+
+class ChatWriteBuffer:
+    def __init__(self, batch_size, interval, max_pending):
+        self.batch_size = batch_size
+        self.interval = interval
+        self.max_pending = max_pending
+        self._rows = []  # AIChat column dicts, oldest first
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()  # one flusher at a time, so batches commit in queue order
+        self._wake = threading.Event()
+        self._app = None
+        self._thread = None
+        self._stopping = False
+
+    @property
+    def running(self):
+        return self._thread is not None
+
+    def start(self, app):
+        if self._thread is not None:
+            return
+        self._app = app
+        self._stopping = False
+        self._thread = threading.Thread(target=self._run, name='chat-write-behind', daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        """Stop the flusher thread and write everything still queued."""
+        if self._thread is None:
+            return
+        self._stopping = True
+        self._wake.set()
+        self._thread.join(timeout=max(5, self.interval * 2))
+        self._thread = None
+        self.flush()
+
+    def add(self, rows):
+        """Queue AIChat column dicts; returns False (nothing queued) when the buffer is full or not running."""
+        with self._lock:
+            if self._thread is None or len(self._rows) + len(rows) > self.max_pending:
+                return False
+            self._rows.extend(rows)
+            full = len(self._rows) >= self.batch_size
+        if full:
+            self._wake.set()
+        return True
+
+    def pending_for(self, user_id, limit=None):
+        """The user's queued rows, newest first, at most ``limit`` of them."""
+        rows = []
+        with self._lock:
+            for row in reversed(self._rows):
+                if limit is not None and len(rows) >= limit:
+                    break
+                if row['user_id'] == user_id:
+                    rows.append(dict(row))
+        return rows
+
+    def pending_count(self):
+        with self._lock:
+            return len(self._rows)
+
+    def _run(self):
+        while not self._stopping:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                # Rows stay queued and are retried on the next tick
+                log_event('chat_write_behind_failed', level=logging.ERROR, pending=self.pending_count(), error=str(e))
+
+    def flush(self):
+        """Write queued rows batch by batch; returns how many were written. Raises if the database fails."""
+        written = 0
+        with self._flush_lock, self._app.app_context():
+            while True:
+                with self._lock:
+                    batch = self._rows[:self.batch_size]
+                if not batch:
+                    return written
+                written += self._write(batch)
+                # Only the flusher removes rows, and new ones are appended behind the batch
+                with self._lock:
+                    del self._rows[:len(batch)]
+
+    def _write(self, batch):
+        try:
+            db.session.execute(insert(AIChat), batch)
+            db.session.commit()
+            return len(batch)
+        except IntegrityError:
+            db.session.rollback()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        # Some row is rejected for good: write them one by one and drop the offenders
+        written = 0
+        for row in batch:
+            try:
+                db.session.execute(insert(AIChat), [row])
+                db.session.commit()
+                written += 1
+            except IntegrityError as e:
+                db.session.rollback()
+                log_event('chat_write_behind_dropped', level=logging.ERROR, chat_id=row['id'], user_id=row['user_id'], error=str(e))
+        return written
+
+
+chat_write_buffer = ChatWriteBuffer(
+    batch_size=Config.CHAT_WRITE_BEHIND_BATCH,
+    interval=Config.CHAT_WRITE_BEHIND_INTERVAL,
+    max_pending=Config.CHAT_WRITE_BEHIND_MAX_PENDING
+)
@@ -0,0 +1,177 @@
+"""Credit reservations and the credit ledger.
+
+``UserCredits.available_credits`` is a cached balance: every change to it is
+written together with a CreditTransaction, so the ledger always sums to it.
+LLM-backed operations pay in two steps:
+
+* ``reserve_credits`` takes the credits with one conditional UPDATE
+  (``available_credits >= amount``) and commits straight away, so concurrent
+  requests cannot overdraw and no row lock is held during the GPT call;
+* the reservation is then confirmed in the same transaction as the result
+  (``confirm_reservation``) or, if the operation fails, released, which gives
+  the credits back (``release_reservation``).
+
+Reservations a crashed process never settled are released after
+``CREDIT_RESERVATION_TTL`` seconds by ``release_stale_reservations``.
+"""
+import logging
+from datetime import timedelta
+
+from sqlalchemy import func, select, update
+
+from ..config.config import Config
+from ..extensions import db
+from ..models import CreditReservation, CreditTransaction, UserCredits, generate_uuid, local_now
+from .structured_logging import log_event
+
+
+class InsufficientCreditsError(ValueError):
+    """Raised when a reservation would take a user's balance below zero."""
+
+
+def record_credit_transaction(user_id, amount, kind, reason=None, reservation_id=None):
+    """Add a ledger row for a balance change made in the current transaction."""
+    db.session.add(CreditTransaction(
+        user_id=user_id,
+        amount=amount,
+        kind=kind,
+        reason=reason,
+        reservation_id=reservation_id
+    ))
+
+
+def _change_balance(user_id, amount, minimum=None):
+    statement = update(UserCredits).where(UserCredits.user_id == user_id)
+    if minimum is not None:
+        statement = statement.where(UserCredits.available_credits >= minimum)
+    return db.session.execute(
+        statement.values(available_credits=UserCredits.available_credits + amount, last_updated=local_now())
+    ).rowcount
+
+
+def grant_plan_credits(user_id, balance, reason):
+    """Reset a user's credits to ``balance`` (a plan grant) in the current transaction; returns the available balance.
+
+    The ledger records the difference. The row is locked before it is read,
+    so a reservation committing meanwhile cannot slip between the read and the
+    write and leave the ledger disagreeing with the balance.
+
+    Credits held by open reservations count towards the plan: they are
+    subtracted from the available balance, so releasing such a reservation
+    later (a failed score, the stale sweeper) brings the user back to
+    ``balance`` rather than above it, and confirming it spends from the new
+    plan. They are read after the lock, so a release in flight is either
+    already in the balance or still counted as open.
+    """
+    current = db.session.execute(
+        select(UserCredits.available_credits).where(UserCredits.user_id == user_id).with_for_update()
+    ).first()
+    if current is None:
+        db.session.add(UserCredits(user_id=user_id, available_credits=balance, last_updated=local_now()))
+        record_credit_transaction(user_id, balance, 'grant', reason)
+        return balance
+
+    reserved = db.session.scalar(
+        select(func.coalesce(func.sum(CreditReservation.amount), 0))
+        .where(CreditReservation.user_id == user_id, CreditReservation.status == 'reserved')
+    )
+    delta = balance - reserved - (current.available_credits or 0)
+    _change_balance(user_id, delta)
+    record_credit_transaction(user_id, delta, 'grant', reason)
+    return balance - reserved
+
+
+def reserve_credits_batch(user_id, amount, count, reason, commit=True):
+    """Reserve ``amount`` credits for each of ``count`` operations at once; returns the reservation ids.
+
+    All or nothing: raises InsufficientCreditsError unless the balance covers
+    every operation.
+    """
+    total = amount * count
+    if not _change_balance(user_id, -total, minimum=total):
+        raise InsufficientCreditsError("Insufficient credits")
+
+    reservation_ids = []
+    for _ in range(count):
+        reservation = CreditReservation(id=generate_uuid(), user_id=user_id, amount=amount, reason=reason)
+        db.session.add(reservation)
+        record_credit_transaction(user_id, -amount, 'reserve', reason, reservation.id)
+        reservation_ids.append(reservation.id)
+
+    if commit:
+        db.session.commit()
+    return reservation_ids
+
+
+def reserve_credits(user_id, amount, reason, commit=True):
+    """Reserve ``amount`` credits for one operation and return the reservation id."""
+    return reserve_credits_batch(user_id, amount, 1, reason, commit=commit)[0]
+
+
+def confirm_reservation(reservation_id, reference_id=None):
+    """Mark a reservation as spent, in the caller's transaction (commit it with the result).
+
+    Returns False when the reservation was no longer open, i.e. it was already
+    released and the operation was not paid for.
+    """
+    confirmed = db.session.execute(
+        update(CreditReservation)
+        .where(CreditReservation.id == reservation_id, CreditReservation.status == 'reserved')
+        .values(status='confirmed', reference_id=reference_id, settled_at=local_now())
+    ).rowcount
+    if not confirmed:
+        log_event('credit_reservation_not_open', level=logging.WARNING, reservation_id=reservation_id, reference_id=reference_id)
+    return bool(confirmed)
+
+
+def _release(reservation_id):
+    released = db.session.execute(
+        update(CreditReservation)
+        .where(CreditReservation.id == reservation_id, CreditReservation.status == 'reserved')
+        .values(status='released', settled_at=local_now())
+    ).rowcount
+    if released:
+        reservation = db.session.get(CreditReservation, reservation_id)
+        _change_balance(reservation.user_id, reservation.amount)
+        record_credit_transaction(reservation.user_id, reservation.amount, 'release', reservation.reason, reservation_id)
+    return bool(released)
+
+
+def release_reservation(reservation_id, commit=True):
+    """Give back the credits of an open reservation; returns False if it was already settled.
+
+    Safe to call more than once and from error handlers: a failure is logged
+    and left to ``release_stale_reservations`` instead of being raised. With
+    ``commit`` the release is committed on its own and a failure rolls back
+    the session. Without it the release joins the caller's transaction in a
+    savepoint, and a failure rolls back only that savepoint, so the caller's
+    uncommitted work is kept.
+    """
+    try:
+        if not commit:
+            with db.session.begin_nested():
+                return _release(reservation_id)
+        released = _release(reservation_id)
+        db.session.commit()
+        return released
+    except Exception as e:
+        if commit:
+            db.session.rollback()
+        log_event('credit_release_failed', level=logging.ERROR, reservation_id=reservation_id, error=str(e))
+        return False
+
+
+def release_stale_reservations(max_age=None):
+    """Release reservations left open for longer than ``max_age`` seconds; returns how many."""
+    max_age = Config.CREDIT_RESERVATION_TTL if max_age is None else max_age
+    stale_before = local_now() - timedelta(seconds=max_age)
+    reservation_ids = db.session.execute(
+        select(CreditReservation.id)
+        .where(CreditReservation.status == 'reserved', CreditReservation.created_at < stale_before)
+    ).scalars().all()
+    db.session.rollback()
+
+    released = sum(1 for reservation_id in reservation_ids if release_reservation(reservation_id))
+    if released:
+        log_event('credit_reservations_released', count=released)
+    return released
@@ -0,0 +1,103 @@
+"""Locate GPT correction snippets in an essay for highlighting.
+
+Each distinct snippet is searched once with ``str.find``. Snippets that do
+not occur verbatim (GPT often changes whitespace, curly quotes or case) are
+retried against a normalised copy of the essay, built once per response,
+and the offsets are mapped back to the raw text.
+"""
+import bisect
+import re
+from itertools import accumulate
+
+_QUOTE_MAP = {
+    '‘': "'", '’': "'", '‚': "'", '‛': "'", '′': "'",
+    '“': '"', '”': '"', '„': '"', '‟': '"', '″': '"',
+}
+_QUOTE_TABLE = str.maketrans(_QUOTE_MAP)
+_WHITESPACE_RUN = re.compile(r'\s+')
+
+
+class NormalizedText:
+    """``text`` with whitespace runs collapsed, quotes straightened and case folded.
+
+    ``raw_offset(i)`` maps an index of ``value`` back to the raw text.
+    """
+
+    def __init__(self, text):
+        folded = text.translate(_QUOTE_TABLE).lower()
+        if len(folded) != len(text):
+            # A few characters lowercase to several; fall back to a per-character mapping
+            self._init_per_char(text)
+            return
+
+        # Each whitespace run shrinks to one space, so the mapping is piecewise linear
+        runs = list(_WHITESPACE_RUN.finditer(folded))
+        removed = list(accumulate(run.end() - run.start() - 1 for run in runs))
+        self._starts = [0] + [run.end() - shift for run, shift in zip(runs, removed)]
+        self._shifts = [0] + removed  # raw index minus normalised index, per segment
+        self._offsets = None
+        self.value = _WHITESPACE_RUN.sub(' ', folded)
+
+    def _init_per_char(self, text):
+        chars = []
+        self._offsets = []
+        in_space = False
+        for index, char in enumerate(text):
+            if char.isspace():
+                if not in_space:
+                    chars.append(' ')
+                    self._offsets.append(index)
+                    in_space = True
+                continue
+            in_space = False
+            for normalized in _QUOTE_MAP.get(char, char).lower():
+                chars.append(normalized)
+                self._offsets.append(index)
+        self.value = ''.join(chars)
+
+    def raw_offset(self, index):
+        if self._offsets is not None:
+            return self._offsets[index]
+        segment = bisect.bisect_right(self._starts, index) - 1
+        return index + self._shifts[segment]
+
+
+def normalize(text):
+    return _WHITESPACE_RUN.sub(' ', text.translate(_QUOTE_TABLE).lower())
+
+
+def _find_all(haystack, needle):
+    """Start offsets of every (possibly overlapping) occurrence of ``needle``."""
+    start = haystack.find(needle)
+    while start != -1:
+        yield start
+        start = haystack.find(needle, start + 1)
+
+
+def find_all_positions(text, patterns):
+    """Map each pattern to the list of ``{'start', 'end', 'text'}`` spans where it occurs in ``text``."""
+    positions = {}
+    normalized_text = None
+
+    for pattern in dict.fromkeys(patterns):
+        if not pattern:
+            continue
+
+        spans = [
+            {'start': start, 'end': start + len(pattern), 'text': pattern}
+            for start in _find_all(text, pattern)
+        ]
+
+        if not spans:
+            normalized_pattern = normalize(pattern).strip()
+            if normalized_pattern:
+                if normalized_text is None:
+                    normalized_text = NormalizedText(text)
+                for start in _find_all(normalized_text.value, normalized_pattern):
+                    raw_start = normalized_text.raw_offset(start)
+                    raw_end = normalized_text.raw_offset(start + len(normalized_pattern) - 1) + 1
+                    spans.append({'start': raw_start, 'end': raw_end, 'text': text[raw_start:raw_end]})
+
+        positions[pattern] = spans
+
+    return positions
@@ -0,0 +1,24 @@
+"""JSON encode/decode for hot paths, using orjson when it is installed.
+
+orjson is several times faster than the standard library for the nested
+lists of small dicts that corrections are made of. Both codecs produce
+compact UTF-8 text, so either can read what the other wrote.
+"""
+import json
+
+try:
+    import orjson
+except ImportError:  # optional speed-up
+    orjson = None
+
+
+def json_dumps(value):
+    if orjson is not None:
+        return orjson.dumps(value).decode('utf-8')
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'))
+
+
+def json_loads(text):
+    if orjson is not None:
+        return orjson.loads(text)
+    return json.loads(text)
@@ -0,0 +1,109 @@
+"""Incremental scanner for JSON that arrives in chunks (e.g. streamed GPT output)."""
+import json
+
+_PRIMITIVE_END = ',}] \t\r\n'
+
+
+class _Frame:
+    __slots__ = ('kind', 'key', 'start', 'expect')
+
+    def __init__(self, kind, start):
+        self.kind = kind      # '{' or '['
+        self.start = start    # offset of the opening bracket
+        self.key = 0 if kind == '[' else None
+        self.expect = 'value' if kind == '[' else 'key'
+
+
+class IncrementalJSONScanner:
+    """Report each JSON value as soon as its closing character has been seen.
+
+    ``feed`` returns ``(path, value)`` pairs where ``path`` is the tuple of
+    object keys / array indexes leading to the value, e.g.
+    ``('corrections', 'grammar', 0)``. Only values whose path length is in
+    ``depths`` are decoded. Text before the first ``{`` or ``[`` is ignored.
+    """
+
+    def __init__(self, depths=None):
+        self.depths = set(depths) if depths is not None else None
+        self._text = ''
+        self._pos = 0
+        self._stack = []
+        self._started = False
+        self._in_string = False
+        self._escape = False
+        self._string_start = None
+        self._string_is_key = False
+        self._primitive_start = None
+
+    @property
+    def done(self):
+        return self._started and not self._stack
+
+    def _complete(self, start, end, completed):
+        path = tuple(frame.key for frame in self._stack)
+        if self._stack:
+            self._stack[-1].expect = 'comma'
+        if self.depths is None or len(path) in self.depths:
+            completed.append((path, json.loads(self._text[start:end])))
+
+    def feed(self, chunk):
+        """Consume the next chunk of text and return the values it completed."""
+        completed = []
+        self._text += chunk
+        text = self._text
+
+        for i in range(self._pos, len(text)):
+            c = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif c == '\\':
+                    self._escape = True
+                elif c == '"':
+                    self._in_string = False
+                    if self._string_is_key:
+                        top = self._stack[-1]
+                        top.key = json.loads(text[self._string_start:i + 1])
+                        top.expect = 'colon'
+                    else:
+                        self._complete(self._string_start, i + 1, completed)
+                continue
+
+            if self._primitive_start is not None:
+                if c not in _PRIMITIVE_END:
+                    continue
+                self._complete(self._primitive_start, i, completed)
+                self._primitive_start = None
+
+            if not self._stack:
+                if not self._started and c in '{[':
+                    self._started = True
+                    self._stack.append(_Frame(c, i))
+                continue
+
+            top = self._stack[-1]
+            if c in ' \t\r\n':
+                continue
+            if c == '"':
+                self._in_string = True
+                self._string_start = i
+                self._string_is_key = top.kind == '{' and top.expect == 'key'
+            elif c == ':':
+                top.expect = 'value'
+            elif c == ',':
+                if top.kind == '[':
+                    top.key += 1
+                    top.expect = 'value'
+                else:
+                    top.expect = 'key'
+            elif c in '{[':
+                self._stack.append(_Frame(c, i))
+            elif c in '}]':
+                frame = self._stack.pop()
+                self._complete(frame.start, i + 1, completed)
+            else:
+                self._primitive_start = i
+
+        self._pos = len(text)
+        return completed
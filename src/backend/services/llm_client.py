@@ -0,0 +1,280 @@
+"""Shared OpenAI client for every controller that talks to GPT.
+
+One ``OpenAI`` instance over one pooled ``httpx.Client`` (keep-alive
+connections are reused across requests and threads). Calls are made per
+route ('analysis', 'analysis_stream', 'chat', 'chat_stream', 'chat_summary'),
+and each route has its own timeout, retry budget and optional hedging:
+
+* retryable failures (timeouts, connection errors, 429, 5xx) are retried
+  with full-jitter exponential backoff, honouring ``Retry-After``;
+* a circuit breaker per route opens after consecutive failures and rejects
+  calls immediately until a cool-down probe succeeds;
+* hedging sends a second identical request when the first has not answered
+  after ``hedge_after`` seconds and returns whichever finishes first. The
+  slower request still runs to completion and is billed, so it is off by
+  default.
+
+Streaming calls are only retried until the stream is opened; a stream that
+breaks midway surfaces to the caller.
+"""
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import httpx
+import openai
+from openai import OpenAI
+
+from ..config.config import Config
+from ..config.openai_config import OPENAI_API_KEY
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+LATENCY_SAMPLES = 1000  # per route, for the percentiles in get_metrics
+
+
+class CircuitOpenError(Exception):
+    """Raised without calling upstream while a route's circuit breaker is open."""
+
+
+class RoutePolicy:
+    def __init__(self, timeout, max_retries, hedge_after=None):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.hedge_after = hedge_after
+
+
+class CircuitBreaker:
+    """Closed -> open after ``failure_threshold`` consecutive failures -> half-open after ``reset_timeout``."""
+
+    def __init__(self, failure_threshold, reset_timeout):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = 'closed'
+        self.failures = 0
+        self.opened_at = None
+        self._probe_in_flight = False
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.state = 'half_open'
+            if self.state == 'half_open' and not self._probe_in_flight:
+                # Let exactly one request through to test whether upstream has recovered
+                self._probe_in_flight = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.state = 'closed'
+            self.failures = 0
+            self._probe_in_flight = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._probe_in_flight = False
+            if self.state == 'half_open' or self.failures >= self.failure_threshold:
+                self.state = 'open'
+                self.opened_at = time.monotonic()
+
+    def release_probe(self):
+        """End a request that says nothing about upstream health, leaving state and failure count as they are."""
+        with self._lock:
+            self._probe_in_flight = False
+
+
+def _is_retryable(error):
+    if isinstance(error, (openai.APITimeoutError, openai.APIConnectionError)):
+        return True
+    if isinstance(error, openai.APIStatusError):
+        return error.status_code in RETRYABLE_STATUS_CODES
+    return False
+
+
+def _retry_after(error):
+    response = getattr(error, 'response', None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get('retry-after'))
+    except (TypeError, ValueError):
+        return None
+
+
+class LLMClient:
+    def __init__(self, api_key, base_url=None):
+        self.api_key = api_key
+        self.base_url = base_url
+        self.routes = {
+            'analysis': RoutePolicy(Config.LLM_TIMEOUT_ANALYSIS, Config.LLM_MAX_RETRIES, Config.LLM_HEDGE_ANALYSIS_AFTER),
+            'analysis_stream': RoutePolicy(Config.LLM_TIMEOUT_STREAM, Config.LLM_MAX_RETRIES),
+            'chat': RoutePolicy(Config.LLM_TIMEOUT_CHAT, Config.LLM_MAX_RETRIES, Config.LLM_HEDGE_CHAT_AFTER),
+            'chat_stream': RoutePolicy(Config.LLM_TIMEOUT_STREAM, Config.LLM_MAX_RETRIES),
+            'chat_summary': RoutePolicy(Config.LLM_TIMEOUT_CHAT, Config.LLM_MAX_RETRIES),
+        }
+        self._breakers = {
+            route: CircuitBreaker(Config.LLM_BREAKER_FAILURES, Config.LLM_BREAKER_RESET)
+            for route in self.routes
+        }
+        self._client = None
+        self._client_lock = threading.Lock()
+        self._hedge_executor = None
+        self._metrics_lock = threading.Lock()
+        self._counters = {route: self._empty_counters() for route in self.routes}
+        self._latencies = {route: deque(maxlen=LATENCY_SAMPLES) for route in self.routes}
+
+    @staticmethod
+    def _empty_counters():
+        return {
+            'calls': 0,
+            'attempts': 0,
+            'retries': 0,
+            'successes': 0,
+            'failures': 0,
+            'timeouts': 0,
+            'circuit_rejections': 0,
+            'hedges': 0,
+            'hedge_wins': 0
+        }
+
+    @property
+    def client(self):
+        """The underlying OpenAI client, built on first use."""
+        with self._client_lock:
+            if self._client is None:
+                http_client = httpx.Client(
+                    limits=httpx.Limits(
+                        max_connections=Config.LLM_POOL_MAX_CONNECTIONS,
+                        max_keepalive_connections=Config.LLM_POOL_MAX_KEEPALIVE,
+                        keepalive_expiry=Config.LLM_POOL_KEEPALIVE_EXPIRY
+                    ),
+                    timeout=httpx.Timeout(Config.LLM_TIMEOUT_ANALYSIS, connect=Config.LLM_CONNECT_TIMEOUT)
+                )
+                # Retries are handled here so they count against the breaker and the metrics
+                self._client = OpenAI(
+                    api_key=self.api_key,
+                    base_url=self.base_url,
+                    http_client=http_client,
+                    max_retries=0
+                )
+            return self._client
+
+    @client.setter
+    def client(self, value):
+        with self._client_lock:
+            self._client = value
+
+    def _count(self, route, name, amount=1):
+        with self._metrics_lock:
+            self._counters[route][name] += amount
+
+    def _attempt(self, route, kwargs):
+        self._count(route, 'attempts')
+        timeout = httpx.Timeout(self.routes[route].timeout, connect=Config.LLM_CONNECT_TIMEOUT)
+        return self.client.chat.completions.create(timeout=timeout, **kwargs)
+
+    def _attempt_hedged(self, route, kwargs):
+        hedge_after = self.routes[route].hedge_after
+        if not hedge_after or kwargs.get('stream'):
+            return self._attempt(route, kwargs)
+
+        if self._hedge_executor is None:
+            with self._client_lock:
+                if self._hedge_executor is None:
+                    self._hedge_executor = ThreadPoolExecutor(
+                        max_workers=Config.LLM_POOL_MAX_CONNECTIONS,
+                        thread_name_prefix='llm-hedge'
+                    )
+
+        primary = self._hedge_executor.submit(self._attempt, route, kwargs)
+        done, _ = wait([primary], timeout=hedge_after)
+        if done:
+            return primary.result()
+
+        self._count(route, 'hedges')
+        hedge = self._hedge_executor.submit(self._attempt, route, kwargs)
+        pending = {primary, hedge}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is hedge:
+                        self._count(route, 'hedge_wins')
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def chat_completion(self, route, **kwargs):
+        """``chat.completions.create`` with the route's timeout, retries, breaker and hedging."""
+        policy = self.routes[route]
+        breaker = self._breakers[route]
+        self._count(route, 'calls')
+
+        started = time.perf_counter()
+        attempt = 0
+        while True:
+            if not breaker.allow():
+                self._count(route, 'circuit_rejections')
+                raise CircuitOpenError("The AI service is temporarily unavailable, please try again shortly")
+            try:
+                response = self._attempt_hedged(route, kwargs)
+            except Exception as e:
+                retryable = _is_retryable(e)
+                if isinstance(e, openai.APITimeoutError):
+                    self._count(route, 'timeouts')
+                if retryable:
+                    breaker.record_failure()
+                else:
+                    # Client errors (bad request, auth) say nothing about upstream health: neither
+                    # close a half-open breaker nor reset the failure count, just free the probe slot
+                    breaker.release_probe()
+                if not retryable or attempt >= policy.max_retries:
+                    self._count(route, 'failures')
+                    raise
+                delay = _retry_after(e)
+                if delay is None:
+                    # Full jitter keeps retries from many workers from arriving in lockstep
+                    delay = random.uniform(0, min(Config.LLM_BACKOFF_MAX, Config.LLM_BACKOFF_BASE * 2 ** attempt))
+                attempt += 1
+                self._count(route, 'retries')
+                time.sleep(min(delay, Config.LLM_BACKOFF_MAX))
+                continue
+
+            breaker.record_success()
+            self._count(route, 'successes')
+            with self._metrics_lock:
+                # For streams this is the time to open the stream, not to read it
+                self._latencies[route].append(time.perf_counter() - started)
+            return response
+
+    def get_metrics(self):
+        routes = {}
+        with self._metrics_lock:
+            for route, counters in self._counters.items():
+                latencies = sorted(self._latencies[route])
+                stats = dict(counters)
+                stats['timeout'] = self.routes[route].timeout
+                stats['circuit_state'] = self._breakers[route].state
+                if latencies:
+                    for name, fraction in (('p50', 0.5), ('p95', 0.95), ('p99', 0.99)):
+                        index = min(len(latencies) - 1, int(round(fraction * (len(latencies) - 1))))
+                        stats[f'latency_{name}_ms'] = round(latencies[index] * 1000, 1)
+                    stats['latency_samples'] = len(latencies)
+                routes[route] = stats
+        return {'routes': routes}
+
+    def reset_metrics(self):
+        with self._metrics_lock:
+            for route in self.routes:
+                self._counters[route] = self._empty_counters()
+                self._latencies[route].clear()
+
+
+llm_client = LLMClient(api_key=Config.OPENAI_API_KEY or OPENAI_API_KEY, base_url=Config.OPENAI_BASE_URL)
@@ -0,0 +1,109 @@
+"""Keyset (cursor) pagination over (created_at, id), or over a sequence column.
+
+Unlike OFFSET paging, each page is a range scan that starts right after the
+previous page's last row, so the cost of a page does not grow with the
+number of rows before it and rows inserted meanwhile are neither skipped nor
+repeated. Cursors are opaque url-safe strings encoding that last row's
+(created_at, id), or its sequence number.
+
+(created_at, id) only orders rows as they were inserted when created_at is
+precise enough to tell them apart; where ids are random and rows share a
+timestamp (whole seconds on MySQL), a row inserted after a cursor can sort
+before it. Tables that are synced incrementally (``after`` cursors) page on
+an auto-increment sequence instead (``sequence_page``/``sequence_page_after``).
+"""
+import base64
+import json
+from datetime import datetime
+
+from sqlalchemy import and_, or_
+
+
+def _pack(values):
+    payload = json.dumps(values, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def _unpack(cursor):
+    padded = cursor + '=' * (-len(cursor) % 4)
+    return json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+
+def encode_cursor(created_at, row_id):
+    return _pack([created_at.isoformat(), row_id])
+
+
+def decode_cursor(cursor):
+    """Return ``(created_at, id)`` from a cursor; raises ValueError for anything malformed."""
+    try:
+        created_at, row_id = _unpack(cursor)
+        return datetime.fromisoformat(created_at), str(row_id)
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def encode_sequence_cursor(seq):
+    return _pack([seq])
+
+
+def decode_sequence_cursor(cursor):
+    """Return the sequence number from a cursor; raises ValueError for anything malformed."""
+    try:
+        seq, = _unpack(cursor)
+        if type(seq) is not int:
+            raise ValueError
+        return seq
+    except Exception:
+        raise ValueError("Invalid cursor")
+
+
+def parse_limit(limit, default, maximum):
+    if limit is None:
+        return default
+    if limit < 1:
+        raise ValueError("limit must be a positive integer")
+    return min(limit, maximum)
+
+
+def before_key(created_column, id_column, created_at, row_id):
+    """Rows that sort before ``(created_at, row_id)``, i.e. older ones."""
+    return or_(
+        created_column < created_at,
+        and_(created_column == created_at, id_column < row_id)
+    )
+
+
+def keyset_page(query, created_column, id_column, limit, cursor=None):
+    """Return ``(rows, next_cursor)`` for the page after ``cursor``, newest first.
+
+    ``next_cursor`` is None on the last page.
+    """
+    if cursor:
+        query = query.filter(before_key(created_column, id_column, *decode_cursor(cursor)))
+
+    # One extra row tells whether another page exists without a COUNT query
+    rows = query.order_by(created_column.desc(), id_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    last = rows[-1]
+    return rows, encode_cursor(getattr(last, created_column.key), getattr(last, id_column.key))
+
+
+def sequence_page(query, seq_column, limit, before=None):
+    """Return ``(rows, next_cursor)``: up to ``limit`` rows numbered below ``before`` (all if None), newest first."""
+    if before is not None:
+        query = query.filter(seq_column < before)
+    rows = query.order_by(seq_column.desc()).limit(limit + 1).all()
+    if len(rows) <= limit:
+        return rows, None
+
+    rows = rows[:limit]
+    return rows, encode_sequence_cursor(getattr(rows[-1], seq_column.key))
+
+
+def sequence_page_after(query, seq_column, limit, after):
+    """Return ``(rows, has_more)``: up to ``limit`` rows numbered above ``after``, oldest first."""
+    rows = query.filter(seq_column > after).order_by(seq_column.asc()).limit(limit + 1).all()
+    return rows[:limit], len(rows) > limit
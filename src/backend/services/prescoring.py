@@ -0,0 +1,206 @@
+"""Cheap local checks that run before an essay is sent to GPT.
+
+``analyze_locally`` computes length, sentence, lexical diversity, letter
+format and prompt similarity statistics in well under a millisecond for a
+typical essay. ``evaluate_gate`` turns them into a verdict using the rules
+configured in Config: each rule can be switched off, can annotate the GPT
+request with a note, or can answer with a provisional score without calling
+GPT at all.
+"""
+import math
+import re
+import time
+from collections import Counter
+
+from ..config.config import Config
+from . import text_utils
+
+GATE_ACTIONS = ('off', 'annotate', 'provisional')
+
+_SENTENCE_END = re.compile(r'[.!?]+(?:\s|$)')
+_GREETING = re.compile(r"^\W*(dear|hi|hello|hey|good (morning|afternoon|evening)|to whom it may concern)\b", re.IGNORECASE)
+_CLOSING = re.compile(
+    r"\b((best|kind|warm|warmest|kindest) regards|yours (sincerely|faithfully|truly)|sincerely|"
+    r"best wishes|all the best|cheers|take care|love|see you soon)\b",
+    re.IGNORECASE
+)
+_LETTER_TASK = re.compile(r'\b(e-?mail|letter)\b', re.IGNORECASE)
+
+_STOPWORDS = frozenset("""
+a about above after again against all also am an and any are as at be because been before being below between
+both but by can could did do does doing down during each few for from further had has have having he her here
+hers herself him himself his how i if in into is it its itself just let me more most my myself no nor not now
+of off on once only or other our ours ourselves out over own same she should so some such than that the their
+theirs them themselves then there these they this those through to too under until up very was we were what
+when where which while who whom why will with would you your yours yourself yourselves write words least
+give reasons example examples include relevant knowledge experience opinion agree disagree extent discuss
+both views essay letter email task people
+""".split())
+
+MATTR_WINDOW = 50
+CLOSING_WINDOW = 120  # characters at the end of the text searched for a sign-off
+
+
+def _terms(text):
+    return [text_utils.stem(word) for word in text_utils.words(text) if word not in _STOPWORDS]
+
+
+def lexical_diversity(words, window=MATTR_WINDOW):
+    """Moving-average type/token ratio, which unlike plain TTR does not fall as essays get longer."""
+    if not words:
+        return 0.0
+    if len(words) <= window:
+        return len(set(words)) / len(words)
+
+    counts = Counter(words[:window])
+    total = len(counts)
+    for index in range(window, len(words)):
+        outgoing = words[index - window]
+        counts[outgoing] -= 1
+        if not counts[outgoing]:
+            del counts[outgoing]
+        counts[words[index]] += 1
+        total += len(counts)
+    return total / (len(words) - window + 1) / window
+
+
+def prompt_similarity(essay_text, reference_text):
+    """Cosine similarity of smoothed TF-IDF vectors of the essay and the task prompt."""
+    essay_terms = Counter(_terms(essay_text))
+    reference_terms = Counter(_terms(reference_text))
+    if not essay_terms or not reference_terms:
+        return None
+
+    # Two-document corpus with smoothed IDF: shared terms weigh 1, terms unique to one side ~1.4
+    def weight(term, count):
+        document_frequency = (term in essay_terms) + (term in reference_terms)
+        return (1 + math.log(count)) * (math.log(3 / (1 + document_frequency)) + 1)
+
+    essay_vector = {term: weight(term, count) for term, count in essay_terms.items()}
+    reference_vector = {term: weight(term, count) for term, count in reference_terms.items()}
+
+    dot = sum(value * reference_vector[term] for term, value in essay_vector.items() if term in reference_vector)
+    norm = math.sqrt(sum(v * v for v in essay_vector.values())) * math.sqrt(sum(v * v for v in reference_vector.values()))
+    return dot / norm if norm else 0.0
+
+
+def analyze_locally(essay_text, task_type, prompt=None, context=None):
+    """Compute the statistics the gate rules use."""
+    started = time.perf_counter()
+
+    words = text_utils.words(essay_text)
+    word_count = len(essay_text.strip().split())
+    sentence_count = max(1, len(_SENTENCE_END.findall(essay_text.strip()))) if words else 0
+    paragraph_count = len([block for block in re.split(r'\n\s*\n', essay_text) if block.strip()])
+
+    reference_text = ' '.join(part for part in (prompt, context) if part)
+    similarity = prompt_similarity(essay_text, reference_text) if reference_text else None
+
+    stripped = essay_text.strip()
+    return {
+        'word_count': word_count,
+        'sentence_count': sentence_count,
+        'paragraph_count': paragraph_count,
+        'avg_sentence_length': round(len(words) / sentence_count, 2) if sentence_count else 0.0,
+        'unique_words': len(set(words)),
+        'lexical_diversity': round(lexical_diversity(words), 4),
+        'has_greeting': bool(_GREETING.search(stripped[:80])),
+        'has_closing': bool(_CLOSING.search(stripped[-CLOSING_WINDOW:])),
+        'letter_expected': task_type == 'task1' and bool(_LETTER_TASK.search(reference_text)),
+        'prompt_terms': len(set(_terms(reference_text))) if reference_text else 0,
+        'prompt_similarity': round(similarity, 4) if similarity is not None else None,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 3)
+    }
+
+
+def _rule_action(setting):
+    action = (setting or 'off').lower()
+    return action if action in GATE_ACTIONS else 'off'
+
+
+def evaluate_gate(stats, task_type, min_words):
+    """Apply the configured gate rules to ``analyze_locally`` statistics.
+
+    Returns ``{'action', 'reasons', 'notes'}`` where action is ``pass``,
+    ``annotate`` or ``provisional``.
+    """
+    triggered = []  # (rule, action, note)
+
+    if stats['word_count'] < min_words * Config.PRESCORING_SHORT_RATIO:
+        triggered.append((
+            'too_short',
+            _rule_action(Config.PRESCORING_SHORT_ACTION),
+            f"The response has only {stats['word_count']} words; the task requires at least {min_words}."
+        ))
+
+    similarity = stats['prompt_similarity']
+    if (similarity is not None
+            and stats['prompt_terms'] >= Config.PRESCORING_MIN_PROMPT_TERMS
+            and similarity < Config.PRESCORING_MIN_SIMILARITY):
+        triggered.append((
+            'off_topic',
+            _rule_action(Config.PRESCORING_OFF_TOPIC_ACTION),
+            f"The response shares almost no vocabulary with the task prompt (similarity {similarity:.2f}); it may be off-topic."
+        ))
+
+    if stats['letter_expected'] and not stats['has_greeting'] and not stats['has_closing']:
+        triggered.append((
+            'wrong_format',
+            _rule_action(Config.PRESCORING_FORMAT_ACTION),
+            "The task asks for a letter/email but the response has no greeting or closing."
+        ))
+    elif task_type == 'task2' and stats['has_greeting'] and stats['has_closing']:
+        triggered.append((
+            'wrong_format',
+            _rule_action(Config.PRESCORING_FORMAT_ACTION),
+            "The task asks for an essay but the response is written as a letter/email."
+        ))
+
+    triggered = [rule for rule in triggered if rule[1] != 'off']
+    actions = {action for _, action, _ in triggered}
+    if 'provisional' in actions:
+        action = 'provisional'
+    elif actions:
+        action = 'annotate'
+    else:
+        action = 'pass'
+
+    return {
+        'action': action,
+        'reasons': [rule for rule, _, _ in triggered],
+        'notes': [note for _, _, note in triggered]
+    }
+
+
+def _half_band(value, low, high):
+    return max(low, min(high, round(value * 2) / 2))
+
+
+def provisional_analysis(stats, verdict):
+    """Build a GPT-shaped analysis from local statistics for an essay that failed the gate."""
+    cap = Config.PRESCORING_PROVISIONAL_MAX_BAND
+    task_caps = {'off_topic': 1.0, 'too_short': 2.0, 'wrong_format': 2.0}
+    task_achievement = min(task_caps.get(reason, cap) for reason in verdict['reasons']) if verdict['reasons'] else cap
+
+    # Rough estimates only; the learner is told to resubmit for a full analysis
+    coherence = _half_band(1 + stats['sentence_count'] / 4 + stats['paragraph_count'] / 2, 1.0, cap)
+    lexical = _half_band(2 + (stats['lexical_diversity'] - 0.4) * 10, 1.0, cap)
+    grammar = _half_band(2 + min(stats['avg_sentence_length'], 20) / 5, 1.0, cap)
+
+    summary = "Provisional score from automatic checks, without a full examiner analysis: " + " ".join(verdict['notes'])
+    advice = "Revise the response and submit it again for a complete analysis."
+    return {
+        'scores': {
+            'task_achievement': task_achievement,
+            'coherence_cohesion': coherence,
+            'lexical_resource': lexical,
+            'grammatical_range': grammar
+        },
+        'feedback': {
+            'task_achievement': f"{summary} {advice}",
+            'coherence_cohesion': f"Estimated from {stats['sentence_count']} sentences in {stats['paragraph_count']} paragraph(s). {advice}",
+            'lexical_resource': f"Estimated from lexical diversity {stats['lexical_diversity']:.2f} ({stats['unique_words']} distinct words). {advice}",
+            'grammatical_range': f"Estimated from an average sentence length of {stats['avg_sentence_length']} words. {advice}"
+        },
+        'corrections': {'grammar': [], 'vocabulary': [], 'structure': []}
+    }
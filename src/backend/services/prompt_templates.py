@@ -0,0 +1,293 @@
+"""Versioned prompt templates for the GPT essay analysis.
+
+Every template is built once at import; ``render`` only splices the
+per-request sections (task prompt, context, essay, pre-check notes) between
+the precompiled static parts. The template version is part of the analysis
+cache key and is stored on each WritingScore, so changing a template's text
+must come with a new version.
+
+``count_chat_tokens`` counts prompt tokens with tiktoken when it is installed
+and its encoding has been loaded (``load_encodings``, at startup, off the
+request path); until then it returns None. API responses report exact usage
+anyway, so it is only needed where the API does not (streamed completions).
+"""
+import threading
+
+from ..config.config import Config
+
+try:
+    import tiktoken
+except ImportError:  # optional: token estimates for streamed responses
+    tiktoken = None
+
+
+class PromptTemplate:
+    def __init__(self, name, version, system_prompt, requirements):
+        self.name = name
+        self.version = version
+        self.system_prompt = system_prompt
+        self.requirements = requirements
+
+    def render(self, essay_text, task_type, prompt=None, context=None, instructions=None, source=None, notes=None):
+        """Return ``(system_prompt, user_prompt)`` for one essay."""
+        parts = [f"Please analyze this IELTS Writing {task_type} essay and respond in the required JSON format:"]
+        if prompt:
+            parts.append(f"\n**TASK PROMPT:**\n{prompt}")
+        if context:
+            parts.append(f"\n**TASK CONTEXT:**\n{context}")
+        if instructions:
+            parts.append(f"\n**INSTRUCTIONS:**\n{instructions}")
+        if source:
+            parts.append(f"\n**SOURCE:** {source}")
+        parts.append(f"\n**STUDENT'S ESSAY:**\n{essay_text}")
+        if notes:
+            parts.append("\n**AUTOMATED PRE-CHECK NOTES (verify before scoring):**\n" + "\n".join(f"- {note}" for note in notes))
+        parts.append(self.requirements)
+        return self.system_prompt, "".join(parts)
+
+
+# The original prompt, byte for byte (indentation included) so results cached as "v1" stay valid
+STANDARD_SYSTEM_PROMPT = """You are a STRICT IELTS examiner who MUST penalize off-topic or incorrectly formatted responses heavily.
+    Your primary job is to check if the student has completed the EXACT task requested. If they haven't, you MUST give very low scores regardless of language quality.
+    
+    CRITICAL RULE: If the content doesn't match the task prompt or has wrong format, Task Achievement MUST be 0-2.
+    
+    You MUST respond in the following JSON format only:
+    {
+        "scores": {
+            "task_achievement": <score 0-9>,
+            "coherence_cohesion": <score 0-9>,
+            "lexical_resource": <score 0-9>,
+            "grammatical_range": <score 0-9>
+        },
+        "feedback": {
+            "task_achievement": "<detailed feedback about how well the response addresses the specific task prompt, format requirements, and task completion>",
+            "coherence_cohesion": "<detailed feedback>",
+            "lexical_resource": "<detailed feedback>",
+            "grammatical_range": "<detailed feedback>"
+        },
+        "corrections": {
+            "grammar": [
+                {
+                    "original": "<exact text from essay>",
+                    "correction": "<corrected text>",
+                    "explanation": "<why this correction is needed>"
+                }
+            ],
+            "vocabulary": [
+                {
+                    "original": "<exact word/phrase from essay>",
+                    "suggestion": "<better word/phrase>",
+                    "explanation": "<why this word is better>"
+                }
+            ],
+            "structure": [
+                {
+                    "issue": "<structural issue description>",
+                    "suggestion": "<how to improve the structure>",
+                    "example": "<example of improved structure>"
+                }
+            ]
+        }
+    }
+    
+    IMPORTANT: For grammar and vocabulary corrections, use the EXACT text as it appears in the essay for the "original" field.
+    This is crucial for text highlighting functionality.
+    
+    For each criterion:
+    1. Score must be between 0-9 (allowing 0.5 increments)
+    2. Feedback must include:
+       - Strengths
+       - Areas for improvement
+       - Specific examples from the text
+       - Suggestions for improvement
+    
+    For corrections:
+    1. Grammar: Identify grammatical errors and provide corrections using exact text from essay
+    2. Vocabulary: Suggest better word choices using exact words/phrases from essay
+    3. Structure: Suggest improvements for sentence and paragraph structure
+    
+    CRITICAL SCORING GUIDELINES - ZERO TOLERANCE FOR TASK DEVIATION:
+    
+    **TASK ACHIEVEMENT/RESPONSE SCORING (MOST CRITICAL):**
+    YOU MUST BE RUTHLESS - DO NOT BE LENIENT:
+    - Score 0: Completely different topic (e.g., social media when asked about house-sitting)
+    - Score 1: Wrong topic + wrong format (essay when email required)
+    - Score 2: Correct general topic but completely wrong format 
+    - Score 3: Partially relevant but misses most key requirements
+    - Score 4: Addresses some aspects but significant gaps
+    - Score 5-6: Adequate task completion with minor issues
+    - Score 7-8: Good task completion
+    - Score 9: Perfect task completion
+    
+    WARNING: DO NOT give high scores just because the English is good. TASK COMPLETION IS EVERYTHING.
+    
+    **EMAIL/LETTER FORMAT REQUIREMENTS (Task 1):**
+    If task requires an EMAIL/LETTER, the response MUST include:
+    - Appropriate greeting (Dear Brianna, Hi, etc.)
+    - Clear purpose statement related to the specific situation
+    - Direct responses to ALL questions/requests in the prompt
+    - Appropriate closing (Best regards, etc.)
+    - Conversational tone appropriate for relationship
+    
+    **ESSAY FORMAT REQUIREMENTS (Task 2):**
+    If task requires an ESSAY, the response MUST:
+    - Have clear introduction with thesis statement addressing the specific question
+    - Body paragraphs with arguments relevant to the exact topic given
+    - Conclusion that summarizes position on the specific issue
+    - Academic tone throughout
+    
+    **MANDATORY SEVERE PENALTIES - NO EXCEPTIONS:**
+    YOU MUST APPLY THESE PENALTIES STRICTLY:
+    - Content about completely different topic = Task Achievement 0 (MANDATORY)
+    - Wrong topic + wrong format = Task Achievement 0-1 (MANDATORY)
+    - Correct topic but wrong format = Task Achievement 1-2 (MANDATORY)
+    - Missing major prompt requirements = Task Achievement maximum 3 (MANDATORY)
+    - Generic content not addressing specific context = Task Achievement maximum 3 (MANDATORY)
+    
+    **REAL EXAMPLES - APPLY THESE EXACT SCORES:**
+    - Task: "Write email to Brianna about house-sitting" + Response: "Essay about social media regulation" = Task Achievement 0
+    - Task: "Write email about travel plans" + Response: "Academic essay about education" = Task Achievement 0
+    - Task: "Discuss music bringing people together" + Response: "Essay about technology impact" = Task Achievement 0
+    - Task: "Write informal email" + Response: "Formal business letter format" = Task Achievement 2-3
+    
+    REMEMBER: Perfect grammar cannot save a response that fails the basic task. BE RUTHLESS.
+    """
+
+STANDARD_REQUIREMENTS = "".join(
+    "\n**ANALYSIS REQUIREMENTS:**\n\n"
+    "FIRST AND MOST IMPORTANT: Check if the student's response addresses the EXACT task prompt above.\n\n"
+    "**TASK COMPLIANCE CHECK:**\n"
+    "1. Does the content match the topic in the task prompt? (If prompt is about house-sitting but response is about social media = MAJOR PENALTY)\n"
+    "2. Is the format correct? (Email vs Essay vs Letter as requested)\n"
+    "3. Does it respond to ALL specific questions/requests in the prompt?\n"
+    "4. Is the tone appropriate for the context? (Formal vs informal as indicated)\n\n"
+    "**MANDATORY SCORING LOGIC - FOLLOW EXACTLY:**\n"
+    "- If response is about a completely different topic: Task Achievement = 0 (NO EXCEPTIONS)\n"
+    "- If wrong topic + wrong format: Task Achievement = 0-1 (NO EXCEPTIONS)\n"
+    "- If correct topic but wrong format: Task Achievement = 1-2 (NO EXCEPTIONS)\n"
+    "- If missing major prompt requirements: Task Achievement maximum 3\n"
+    "- If content doesn't match the specific situation/context: Task Achievement maximum 3\n\n"
+    "**EVALUATION CRITERIA:**\n"
+    "- Task Achievement/Response: STRICT adherence to the specific prompt and requirements\n"
+    "- Coherence and Cohesion: logical organization appropriate for the format\n"
+    "- Lexical Resource: vocabulary suitable for the task and context\n"
+    "- Grammatical Range and Accuracy: grammar appropriate for the format and purpose\n\n"
+    "**REMEMBER:** A beautifully written piece about the wrong topic should score very low on Task Achievement.\n\n"
+    "**SPECIFIC EXAMPLE - FOLLOW THIS EXACT SCORING:**\n"
+    "Task: 'Write an email to respond to Brianna' about house-sitting and pet care\n"
+    "Student Response: Essay about 'social media regulation and government oversight'\n"
+    "REQUIRED SCORING:\n"
+    "- Task Achievement: 0 (completely wrong topic AND wrong format)\n"
+    "- Coherence & Cohesion: Maximum 4 (well-organized but irrelevant)\n"
+    "- Lexical Resource: Maximum 5 (good vocabulary but wrong context)\n"
+    "- Grammar: Can score normally but overall will be very low\n"
+    "- Overall Band Score: Should be around 1-2 due to complete task failure\n\n"
+    "FINAL INSTRUCTION: You MUST be ruthless about task compliance. Perfect English cannot save a response that completely misses the task.\n"
+)
+
+# Same rubric and JSON contract without the repetition and indentation; roughly half the input tokens
+COMPACT_SYSTEM_PROMPT = """You are a strict IELTS examiner. Check first whether the response completes the EXACT task requested; off-topic or wrongly formatted responses get very low Task Achievement regardless of language quality.
+
+Respond with JSON only:
+{"scores":{"task_achievement":0-9,"coherence_cohesion":0-9,"lexical_resource":0-9,"grammatical_range":0-9},
+"feedback":{"task_achievement":"...","coherence_cohesion":"...","lexical_resource":"...","grammatical_range":"..."},
+"corrections":{"grammar":[{"original":"...","correction":"...","explanation":"..."}],
+"vocabulary":[{"original":"...","suggestion":"...","explanation":"..."}],
+"structure":[{"issue":"...","suggestion":"...","example":"..."}]}}
+
+Rules:
+- Scores 0-9 in 0.5 steps.
+- Each feedback covers strengths, weaknesses, examples from the text and suggestions; Task Achievement feedback covers prompt coverage and format.
+- "original" in grammar/vocabulary corrections MUST be the exact text from the essay (used for highlighting).
+
+Task Achievement bands: 0 different topic; 1 wrong topic and wrong format; 2 right topic, wrong format; 3 misses most requirements; 4 notable gaps; 5-6 adequate; 7-8 good; 9 perfect.
+Mandatory caps: generic content or missing major requirements = max 3.
+Letter/email (Task 1) needs a greeting, a clear purpose, answers to every point in the prompt, a closing and a tone fitting the relationship.
+Essay (Task 2) needs an introduction with a thesis on the exact question, relevant body paragraphs, a conclusion and an academic tone.
+Example: email to Brianna about house-sitting answered with an essay on social media = Task Achievement 0, Coherence max 4, Lexical max 5.
+Good English never compensates for a missed task."""
+
+COMPACT_REQUIREMENTS = (
+    "\n\nCheck topic match, required format (email/letter/essay), coverage of every point in the prompt "
+    "and tone before scoring; apply the Task Achievement bands and caps strictly.\n"
+)
+
+PROMPT_TEMPLATES = {
+    template.name: template
+    for template in (
+        PromptTemplate('standard', 'v1', STANDARD_SYSTEM_PROMPT, STANDARD_REQUIREMENTS),
+        PromptTemplate('compact', 'compact-v1', COMPACT_SYSTEM_PROMPT, COMPACT_REQUIREMENTS),
+    )
+}
+
+
+def get_prompt_template(name=None):
+    """Return the named template, or the one selected by ``ANALYSIS_PROMPT_VARIANT``."""
+    name = name or Config.ANALYSIS_PROMPT_VARIANT
+    if name not in PROMPT_TEMPLATES:
+        raise ValueError(f"Unknown prompt variant: {name}")
+    return PROMPT_TEMPLATES[name]
+
+
+_encodings = {}  # model -> encoding, or None when it cannot be loaded
+_loading = set()
+_encodings_lock = threading.Lock()  # guards the two above only, never held while loading
+
+
+def _load_encodings(models):
+    for model in models:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except Exception:
+            # Unknown model or the encoding file cannot be downloaded; counting is best effort
+            encoding = None
+        with _encodings_lock:
+            _encodings[model] = encoding
+            _loading.discard(model)
+
+
+def load_encodings(models, wait=False):
+    """Load the tiktoken encodings of ``models``, in a background thread unless ``wait``.
+
+    ``encoding_for_model`` may download the BPE file, with no timeout, on
+    first use; called at startup so no request waits for it.
+    """
+    if tiktoken is None:
+        return
+    with _encodings_lock:
+        models = [model for model in dict.fromkeys(models) if model not in _encodings and model not in _loading]
+        _loading.update(models)
+    if not models:
+        return
+    if wait:
+        _load_encodings(models)
+    else:
+        threading.Thread(target=_load_encodings, args=(models,), name='tiktoken-load', daemon=True).start()
+
+
+def _get_encoding(model):
+    """The model's encoding; None while it is still loading or if it cannot be loaded. Never blocks."""
+    if tiktoken is None:
+        return None
+    with _encodings_lock:
+        if model in _encodings:
+            return _encodings[model]
+    load_encodings([model])
+    return None
+
+
+def count_tokens(text, model):
+    encoding = _get_encoding(model)
+    if encoding is None or text is None:
+        return None
+    return len(encoding.encode(text))
+
+
+def count_chat_tokens(messages, model):
+    """Prompt tokens of a chat completion request, or None when tiktoken is unavailable."""
+    encoding = _get_encoding(model)
+    if encoding is None:
+        return None
+    # Every message is wrapped in <|start|>{role}\n{content}<|end|>; the reply is primed with 3 more
+    return sum(3 + len(encoding.encode(message['role'])) + len(encoding.encode(message['content'])) for message in messages) + 3
@@ -0,0 +1,116 @@
+"""Per-process TTL cache for whole JSON responses of read-only endpoints.
+
+Used for the admin statistics endpoints, which several dashboard widgets
+poll at once. Concurrent misses for the same URL are single-flight: one
+request runs the view and the others wait for its result. Every response
+carries an ETag and ``Cache-Control: private, max-age=<seconds left>``, and a
+matching ``If-None-Match`` is answered with an empty 304.
+
+Entries are dropped when a commit writes one of the watched models through
+the ORM (see ``invalidate_on_commit``). Invalidation is local to the process;
+other workers serve their copy until its TTL runs out.
+"""
+import hashlib
+import threading
+import time
+from functools import wraps
+from itertools import chain
+
+from flask import current_app, request
+from sqlalchemy import event
+
+from ..config.config import Config
+from ..extensions import db
+
+
+class ResponseCache:
+    def __init__(self, ttl, enabled=True):
+        self.ttl = ttl
+        self.enabled = enabled
+        self._entries = {}  # full path -> (expires_at monotonic, body, mimetype, etag)
+        self._key_locks = {}
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._watched = ()
+        self._info_key = f'response_cache_stale_{id(self)}'
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                return entry
+            return None
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._key_locks.setdefault(key, threading.Lock())
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def _respond(self, entry, state):
+        expires_at, body, mimetype, etag = entry
+        response = current_app.response_class(body, status=200, mimetype=mimetype)
+        response.set_etag(etag)
+        response.cache_control.private = True
+        response.cache_control.max_age = max(0, int(expires_at - time.monotonic()))
+        response.headers['X-Cache'] = state
+        return response.make_conditional(request)
+
+    def cached(self, view):
+        """Decorator for a view whose response depends only on its URL (path and query string)."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if not self.enabled:
+                return view(*args, **kwargs)
+
+            key = request.full_path
+            entry = self._lookup(key)
+            if entry is not None:
+                return self._respond(entry, 'HIT')
+
+            with self._key_lock(key):
+                # Another request may have filled the entry while this one waited
+                entry = self._lookup(key)
+                if entry is not None:
+                    return self._respond(entry, 'HIT')
+
+                with self._lock:
+                    generation = self._generation
+                response = current_app.make_response(view(*args, **kwargs))
+                if response.status_code != 200:
+                    return response
+
+                body = response.get_data()
+                entry = (time.monotonic() + self.ttl, body, response.mimetype, hashlib.sha1(body).hexdigest())
+                with self._lock:
+                    # Not stored if a write was committed while the view ran; it may predate it
+                    if generation == self._generation:
+                        self._entries[key] = entry
+            return self._respond(entry, 'MISS')
+        return wrapper
+
+    def _note_changes(self, session, flush_context):
+        if any(isinstance(obj, self._watched) for obj in chain(session.new, session.dirty, session.deleted)):
+            session.info[self._info_key] = True
+
+    def _after_commit(self, session):
+        if session.info.pop(self._info_key, False):
+            self.invalidate()
+
+    def _after_rollback(self, session):
+        session.info.pop(self._info_key, None)
+
+    def invalidate_on_commit(self, *models):
+        """Drop every entry whenever a commit inserts, updates or deletes one of ``models``."""
+        first = not self._watched
+        self._watched = tuple(set(self._watched) | set(models))
+        if first:
+            event.listen(db.session, 'after_flush', self._note_changes)
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+
+
+admin_stats_cache = ResponseCache(ttl=Config.ADMIN_STATS_CACHE_TTL, enabled=Config.ADMIN_STATS_CACHE_ENABLED)
@@ -0,0 +1,264 @@
+"""Rollup tables behind the admin dashboard.
+
+DailyPaymentRollups (count and amount per day, status and method),
+DailySignupRollups (new users per day) and SubscriptionRollups (current
+subscriptions per plan and status) are updated in the same flush that
+inserts, updates or deletes a Payment, User or Subscription through the ORM,
+with atomic ``count = count + n`` upserts from a ``before_flush`` listener, so
+they commit or roll back together with the change. Dashboard queries then read
+a few hundred rollup rows instead of aggregating the whole tables.
+
+Deleting a User through the ORM deletes their Payments and Subscriptions in
+the same flush, so they are counted out instead of disappearing unseen through
+the database's ON DELETE CASCADE. Other writes that bypass the ORM (raw SQL,
+bulk UPDATEs and DELETEs) are not seen; ``flask rebuild-rollups`` recomputes every rollup from the source
+tables. Run it after such changes and after the migration, preferably while
+the site is quiet: writes made during the rebuild may be counted twice or
+not at all.
+"""
+from collections import defaultdict
+from datetime import date
+from decimal import Decimal
+
+import click
+from sqlalchemy import delete, event, func, inspect, select
+from sqlalchemy.dialects import mysql, postgresql, sqlite
+
+from ..extensions import db
+from ..models import DailyPaymentRollup, DailySignupRollup, Payment, Subscription, SubscriptionRollup, User, local_now
+
+_INSERTS = {'mysql': mysql.insert, 'mariadb': mysql.insert, 'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+# Attributes the rollups are keyed on or sum, per model
+_ROLLUP_ATTRIBUTES = {
+    Payment: ('paid_at', 'payment_status', 'method', 'amount'),
+    User: ('created_at',),
+    Subscription: ('plan', 'status')
+}
+
+# Column defaults, applied to pending objects before the flush so the rollups see the stored values
+_DEFAULTS = {
+    Payment: {'paid_at': local_now, 'payment_status': lambda: 'pending'},
+    User: {'created_at': local_now},
+    Subscription: {'status': lambda: 'active'}
+}
+
+
+def _values(obj, names, old=False):
+    """Current (or, with ``old``, committed) values of ``names`` on ``obj``."""
+    state = inspect(obj)
+    values = []
+    for name in names:
+        value = getattr(obj, name)
+        if old:
+            history = state.attrs[name].history
+            if history.deleted:
+                value = history.deleted[0]
+        values.append(value)
+    return values
+
+
+def _payment_delta(deltas, obj, sign, old=False):
+    paid_at, status, method, amount = _values(obj, _ROLLUP_ATTRIBUTES[Payment], old)
+    if paid_at is None:
+        return
+    entry = deltas['payments'][(paid_at.date(), status, method)]
+    entry[0] += sign
+    entry[1] += sign * Decimal(amount or 0)
+
+
+def _user_delta(deltas, obj, sign, old=False):
+    created_at, = _values(obj, _ROLLUP_ATTRIBUTES[User], old)
+    if created_at is not None:
+        deltas['signups'][created_at.date()] += sign
+
+
+def _subscription_delta(deltas, obj, sign, old=False):
+    plan, status = _values(obj, _ROLLUP_ATTRIBUTES[Subscription], old)
+    deltas['subscriptions'][(plan, status)] += sign
+
+
+_TRACKED = {Payment: _payment_delta, User: _user_delta, Subscription: _subscription_delta}
+
+
+def _increment(connection, model, keys, values):
+    table = model.__table__
+    insert = _INSERTS[connection.dialect.name]
+    statement = insert(table).values(**keys, **values)
+    if connection.dialect.name in ('mysql', 'mariadb'):
+        statement = statement.on_duplicate_key_update(
+            {name: table.c[name] + statement.inserted[name] for name in values}
+        )
+    else:
+        statement = statement.on_conflict_do_update(
+            index_elements=list(keys),
+            set_={name: table.c[name] + statement.excluded[name] for name in values}
+        )
+    connection.execute(statement)
+
+
+def _delete_user_rows(session):
+    """Delete the payments and subscriptions of users deleted in this flush through the session."""
+    user_ids = [obj.id for obj in session.deleted if type(obj) is User]
+    if not user_ids:
+        return
+    with session.no_autoflush:
+        for model in (Payment, Subscription):
+            for obj in session.scalars(select(model).where(model.user_id.in_(user_ids))):
+                session.delete(obj)
+
+
+def _update_rollups(session, flush_context, instances):
+    _delete_user_rows(session)
+    deltas = {
+        'payments': defaultdict(lambda: [0, Decimal(0)]),
+        'signups': defaultdict(int),
+        'subscriptions': defaultdict(int)
+    }
+    tracked = False
+    for obj in session.new:
+        if type(obj) in _TRACKED:
+            for name, default in _DEFAULTS[type(obj)].items():
+                if getattr(obj, name) is None:
+                    setattr(obj, name, default())
+            _TRACKED[type(obj)](deltas, obj, 1)
+            tracked = True
+    for obj in session.deleted:
+        if type(obj) in _TRACKED:
+            _TRACKED[type(obj)](deltas, obj, -1, old=True)
+            tracked = True
+    for obj in session.dirty:
+        if type(obj) in _TRACKED and session.is_modified(obj, include_collections=False):
+            _TRACKED[type(obj)](deltas, obj, -1, old=True)
+            _TRACKED[type(obj)](deltas, obj, 1)
+            tracked = True
+    if not tracked:
+        return
+
+    connection = session.connection()
+    for (day, status, method), (count, amount) in deltas['payments'].items():
+        if count or amount:
+            _increment(connection, DailyPaymentRollup, {'day': day, 'payment_status': status, 'method': method},
+                       {'payment_count': count, 'amount': amount})
+    for day, count in deltas['signups'].items():
+        if count:
+            _increment(connection, DailySignupRollup, {'day': day}, {'signup_count': count})
+    for (plan, status), count in deltas['subscriptions'].items():
+        if count:
+            _increment(connection, SubscriptionRollup, {'plan': plan, 'status': status}, {'subscription_count': count})
+
+
+def _keep_old_value(target, value, oldvalue, initiator):
+    return value
+
+
+def register_rollup_listeners():
+    if event.contains(db.session, 'before_flush', _update_rollups):
+        return
+    event.listen(db.session, 'before_flush', _update_rollups)
+    # Load the previous value when a tracked attribute is set, so the old rollup row can be decremented
+    for model, names in _ROLLUP_ATTRIBUTES.items():
+        for name in names:
+            event.listen(getattr(model, name), 'set', _keep_old_value, active_history=True, retval=True)
+
+
+def rebuild_rollups():
+    """Recompute every rollup from Payments, Users and Subscriptions, in one transaction."""
+    for model in (DailyPaymentRollup, DailySignupRollup, SubscriptionRollup):
+        db.session.execute(delete(model))
+
+    payment_day = func.date(Payment.paid_at)
+    db.session.execute(DailyPaymentRollup.__table__.insert().from_select(
+        ['day', 'payment_status', 'method', 'payment_count', 'amount'],
+        select(payment_day, Payment.payment_status, Payment.method, func.count(Payment.id), func.coalesce(func.sum(Payment.amount), 0))
+        .where(Payment.paid_at.isnot(None))
+        .group_by(payment_day, Payment.payment_status, Payment.method)
+    ))
+    signup_day = func.date(User.created_at)
+    db.session.execute(DailySignupRollup.__table__.insert().from_select(
+        ['day', 'signup_count'],
+        select(signup_day, func.count(User.id)).where(User.created_at.isnot(None)).group_by(signup_day)
+    ))
+    db.session.execute(SubscriptionRollup.__table__.insert().from_select(
+        ['plan', 'status', 'subscription_count'],
+        select(Subscription.plan, Subscription.status, func.count(Subscription.id))
+        .group_by(Subscription.plan, Subscription.status)
+    ))
+    db.session.commit()
+
+
+@click.command('rebuild-rollups')
+def rebuild_rollups_command():
+    """Recompute the admin dashboard rollup tables."""
+    rebuild_rollups()
+    click.echo('Rollups rebuilt')
+
+
+def _month(day):
+    return date(day.year, day.month, 1)
+
+
+def revenue_total():
+    total = db.session.query(func.sum(DailyPaymentRollup.amount)).filter(
+        DailyPaymentRollup.payment_status == 'success'
+    ).scalar()
+    return total or 0
+
+
+def monthly_revenue(since):
+    """[(first day of month, revenue)] of successful payments from ``since`` (a date), oldest first."""
+    rows = db.session.query(DailyPaymentRollup.day, func.sum(DailyPaymentRollup.amount)).filter(
+        DailyPaymentRollup.payment_status == 'success',
+        DailyPaymentRollup.day >= since
+    ).group_by(DailyPaymentRollup.day).all()
+    months = defaultdict(Decimal)
+    for day, amount in rows:
+        months[_month(day)] += amount or 0
+    return sorted(months.items())
+
+
+def payment_method_totals():
+    """[(method, count, amount)] of successful payments."""
+    return db.session.query(
+        DailyPaymentRollup.method,
+        func.sum(DailyPaymentRollup.payment_count),
+        func.sum(DailyPaymentRollup.amount)
+    ).filter(
+        DailyPaymentRollup.payment_status == 'success'
+    ).group_by(DailyPaymentRollup.method).having(func.sum(DailyPaymentRollup.payment_count) > 0).all()
+
+
+def order_status_totals():
+    """[(status, count, amount)], the amount counting successful payments only."""
+    rows = db.session.query(
+        DailyPaymentRollup.payment_status,
+        func.sum(DailyPaymentRollup.payment_count),
+        func.sum(DailyPaymentRollup.amount)
+    ).group_by(DailyPaymentRollup.payment_status).having(func.sum(DailyPaymentRollup.payment_count) > 0).all()
+    return [(status, count, amount if status == 'success' else 0) for status, count, amount in rows]
+
+
+def signup_total(since=None):
+    query = db.session.query(func.sum(DailySignupRollup.signup_count))
+    if since is not None:
+        query = query.filter(DailySignupRollup.day >= since)
+    return query.scalar() or 0
+
+
+def monthly_signups(since=None):
+    """[(first day of month, new users)] from ``since`` (all time if None), oldest first."""
+    query = db.session.query(DailySignupRollup.day, DailySignupRollup.signup_count)
+    if since is not None:
+        query = query.filter(DailySignupRollup.day >= since)
+    months = defaultdict(int)
+    for day, count in query.all():
+        months[_month(day)] += count
+    return sorted((month, count) for month, count in months.items() if count)
+
+
+def subscription_counts(status=None):
+    """[(plan, count)] of current subscriptions, optionally with one status."""
+    query = db.session.query(SubscriptionRollup.plan, func.sum(SubscriptionRollup.subscription_count))
+    if status is not None:
+        query = query.filter(SubscriptionRollup.status == status)
+    return query.group_by(SubscriptionRollup.plan).having(func.sum(SubscriptionRollup.subscription_count) > 0).all()
@@ -0,0 +1,173 @@
+"""In-process job queue for asynchronous essay scoring.
+
+Jobs are persisted in the ScoringJobs table before they are handed to a
+bounded thread pool, so a restart only has to requeue what is left in the
+table. Workers claim a job with a conditional UPDATE, which keeps several
+processes from running the same job twice.
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+
+from sqlalchemy import select, update
+
+from ..extensions import db
+from ..models import ScoringJob, local_now
+from ..config.config import Config
+from .credits import release_stale_reservations
+from .structured_logging import bind_request_id
+
+
+class QueueFullError(Exception):
+    """Raised when the worker pool already has too many pending jobs."""
+
+
+_executor = None
+_executor_lock = threading.Lock()
+_in_flight = 0
+_in_flight_lock = threading.Lock()
+_done_events = {}  # job_id -> threading.Event, for long-polls served by this process
+
+
+def _get_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=Config.SCORING_JOB_WORKERS,
+                thread_name_prefix='scoring-job'
+            )
+        return _executor
+
+
+def _submit(app, job_id, force=False):
+    global _in_flight
+    with _in_flight_lock:
+        if not force and _in_flight >= Config.SCORING_JOB_MAX_PENDING:
+            raise QueueFullError("Scoring queue is full, please try again later")
+        _in_flight += 1
+        _done_events.setdefault(job_id, threading.Event())
+    _get_executor().submit(_run_job, app, job_id)
+
+
+def _finish(job_id):
+    global _in_flight
+    with _in_flight_lock:
+        _in_flight -= 1
+        event = _done_events.pop(job_id, None)
+    if event is not None:
+        event.set()
+
+
+def _run_job(app, job_id):
+    # Imported here to avoid a circular import with the writing controller
+    from ..controllers.writing_controller import score_essay
+
+    # Log records of a background job are correlated by the job id
+    bind_request_id(job_id)
+    with app.app_context():
+        try:
+            claimed = db.session.execute(
+                update(ScoringJob)
+                .where(ScoringJob.id == job_id, ScoringJob.status == 'queued')
+                .values(status='running', started_at=local_now(), attempts=ScoringJob.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if not claimed:
+                return
+
+            job = db.session.get(ScoringJob, job_id)
+            user_id = job.user_id
+            payload = json.loads(job.payload)
+
+            try:
+                result = score_essay(user_id, payload)
+                values = {'status': 'succeeded', 'writing_score_id': result['id'], 'error': None}
+            except Exception as e:
+                values = {'status': 'failed', 'error': str(e)}
+
+            values['finished_at'] = local_now()
+            db.session.execute(update(ScoringJob).where(ScoringJob.id == job_id).values(**values))
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+        finally:
+            _finish(job_id)
+
+
+def enqueue_scoring_job(app, user_id, data):
+    """Persist a scoring job and hand it to the worker pool."""
+    if not data or 'essay_text' not in data or 'task_type' not in data:
+        raise ValueError("Missing required fields")
+
+    with _in_flight_lock:
+        if _in_flight >= Config.SCORING_JOB_MAX_PENDING:
+            raise QueueFullError("Scoring queue is full, please try again later")
+
+    job = ScoringJob(user_id=user_id, payload=json.dumps(data, ensure_ascii=False))
+    db.session.add(job)
+    db.session.commit()
+
+    _submit(app, job.id, force=True)
+    return job.to_dict()
+
+
+def get_scoring_job(job_id, user_id, wait=0):
+    """Return a job, optionally long-polling up to ``wait`` seconds for it to finish."""
+    wait = max(0, min(wait, Config.SCORING_JOB_MAX_WAIT))
+    deadline = time.monotonic() + wait
+
+    while True:
+        job = db.session.execute(
+            select(ScoringJob).where(ScoringJob.id == job_id, ScoringJob.user_id == user_id)
+        ).scalar_one_or_none()
+        if not job:
+            raise ValueError("Job not found")
+
+        remaining = deadline - time.monotonic()
+        if job.status in ('succeeded', 'failed') or remaining <= 0:
+            return job.to_dict()
+
+        # End the read transaction so the next poll sees the worker's commit
+        db.session.rollback()
+        event = _done_events.get(job_id)
+        if event is not None:
+            event.wait(remaining)
+        else:
+            # Job is running in another process; fall back to polling the table
+            time.sleep(min(0.5, remaining))
+
+
+def resume_scoring_jobs(app):
+    """Requeue jobs left behind by a previous run of the server and free the credits they held."""
+    with app.app_context():
+        try:
+            release_stale_reservations()
+
+            stale_before = local_now() - timedelta(seconds=Config.SCORING_JOB_STALE_AFTER)
+            db.session.execute(
+                update(ScoringJob)
+                .where(
+                    ScoringJob.status == 'running',
+                    ScoringJob.started_at < stale_before,
+                    ScoringJob.batch_id.is_(None)  # batch items are retried by the client instead
+                )
+                .values(status='queued')
+            )
+            db.session.commit()
+
+            job_ids = db.session.execute(
+                select(ScoringJob.id)
+                .where(ScoringJob.status == 'queued', ScoringJob.batch_id.is_(None))
+                .order_by(ScoringJob.created_at)
+            ).scalars().all()
+        except Exception:
+            # Table missing (fresh database) or DB unreachable; nothing to resume
+            db.session.rollback()
+            return 0
+
+    for job_id in job_ids:
+        _submit(app, job_id, force=True)
+    return len(job_ids)
@@ -0,0 +1,198 @@
+"""Non-blocking JSON-lines logging for the GPT analysis path.
+
+Request threads only put records on an in-memory queue; a single
+background listener thread formats them and writes to the log file. Each
+worker process writes its own file (``gpt_analysis.<pid>.jsonl``), so
+several gunicorn workers never rotate the same file. Files roll over at
+midnight or when they reach ``GPT_LOG_MAX_BYTES``, whichever comes first.
+At startup, files left by processes that are no longer running are pruned
+down to the ``GPT_LOG_BACKUP_COUNT`` most recently written, so restarts and
+recycled workers do not grow ``LOG_DIR`` without bound.
+"""
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import re
+import threading
+import uuid
+from datetime import datetime, timedelta
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from zoneinfo import ZoneInfo
+
+from ..config.config import Config
+
+LOGGER_NAME = 'backend.gpt_analysis'
+
+request_id_var = contextvars.ContextVar('request_id', default=None)
+
+_LOG_FILE = re.compile(r'^gpt_analysis\.(\d+)\.jsonl(?:\.\d+)?$')
+
+_setup_lock = threading.Lock()
+_listener = None
+_queue_handler = None
+
+
+class SizeAndTimeRotatingFileHandler(RotatingFileHandler):
+    """RotatingFileHandler that also rolls over at local midnight."""
+
+    def __init__(self, filename, max_bytes, backup_count):
+        super().__init__(filename, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8', delay=True)
+        self._rollover_at = self._next_midnight()
+
+    @staticmethod
+    def _next_midnight():
+        now = datetime.now(ZoneInfo("Asia/Ho_Chi_Minh"))
+        return (now + timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+
+    def shouldRollover(self, record):
+        if datetime.now(ZoneInfo("Asia/Ho_Chi_Minh")) >= self._rollover_at:
+            return True
+        return super().shouldRollover(record)
+
+    def doRollover(self):
+        super().doRollover()
+        self._rollover_at = self._next_midnight()
+
+
+class JSONLinesFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': datetime.fromtimestamp(record.created, ZoneInfo("Asia/Ho_Chi_Minh")).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'event': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+            'pid': record.process,
+            'thread': record.threadName
+        }
+        entry.update(getattr(record, 'fields', None) or {})
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _DroppingQueueHandler(QueueHandler):
+    """Never block or raise on the request thread; count records dropped when the queue is full."""
+
+    dropped = 0
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            _DroppingQueueHandler.dropped += 1
+
+    def prepare(self, record):
+        # The fields are plain data; skip QueueHandler's message formatting on the request thread
+        return record
+
+
+def _log_path():
+    return os.path.join(Config.LOG_DIR, f"gpt_analysis.{os.getpid()}.jsonl")
+
+
+def _process_running(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except OSError:
+        # Exists but belongs to someone else, or the check is unsupported: keep its files
+        return True
+    return True
+
+
+def prune_stale_logs(log_dir=None, keep=None):
+    """Delete log files of processes that are gone, keeping the ``keep`` newest; returns how many were removed."""
+    log_dir = log_dir or Config.LOG_DIR
+    keep = Config.GPT_LOG_BACKUP_COUNT if keep is None else keep
+    stale = []
+    for name in os.listdir(log_dir):
+        match = _LOG_FILE.match(name)
+        if match is None:
+            continue
+        pid = int(match.group(1))
+        if pid == os.getpid() or _process_running(pid):
+            continue
+        path = os.path.join(log_dir, name)
+        try:
+            stale.append((os.path.getmtime(path), path))
+        except OSError:
+            continue
+
+    removed = 0
+    for _, path in sorted(stale, reverse=True)[keep:]:
+        try:
+            os.remove(path)
+            removed += 1
+        except OSError:
+            # Another worker starting at the same time may have removed it already
+            pass
+    return removed
+
+
+def _setup():
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is not None:
+            return
+
+        os.makedirs(Config.LOG_DIR, exist_ok=True)
+        prune_stale_logs()
+        file_handler = SizeAndTimeRotatingFileHandler(
+            _log_path(),
+            max_bytes=Config.GPT_LOG_MAX_BYTES,
+            backup_count=Config.GPT_LOG_BACKUP_COUNT
+        )
+        file_handler.setFormatter(JSONLinesFormatter())
+
+        log_queue = queue.Queue(maxsize=Config.GPT_LOG_QUEUE_SIZE)
+        _queue_handler = _DroppingQueueHandler(log_queue)
+        _listener = QueueListener(log_queue, file_handler, respect_handler_level=False)
+        _listener.start()
+        atexit.register(shutdown)
+
+        logger = logging.getLogger(LOGGER_NAME)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+        logger.addHandler(_queue_handler)
+
+
+def get_logger():
+    if _listener is None:
+        _setup()
+    return logging.getLogger(LOGGER_NAME)
+
+
+def bind_request_id(request_id=None):
+    """Bind ``request_id`` (or a fresh one) to the current context and return it."""
+    request_id = request_id or uuid.uuid4().hex
+    request_id_var.set(request_id)
+    return request_id
+
+
+def shutdown():
+    """Flush queued records to disk and stop the writer thread."""
+    global _listener, _queue_handler
+    with _setup_lock:
+        if _listener is None:
+            return
+        _listener.stop()
+        logging.getLogger(LOGGER_NAME).removeHandler(_queue_handler)
+        for handler in _listener.handlers:
+            handler.close()
+        _listener = None
+        _queue_handler = None
+
+
+def dropped_records():
+    return _DroppingQueueHandler.dropped
+
+
+def log_event(event, level=logging.INFO, **fields):
+    """Queue a structured log record; the file write happens on the listener thread."""
+    get_logger().log(
+        level,
+        event,
+        extra={'request_id': request_id_var.get(), 'fields': fields}
+    )
@@ -0,0 +1,25 @@
+"""Word splitting and light stemming shared by the local text checks.
+
+Used by the pre-scoring gate (services/prescoring.py) to compare essays
+with their prompt and by the chat FAQ cache (services/chat_faq.py) to
+compare questions, so both reduce words the same way.
+"""
+import re
+
+# Lower-case English words, with an apostrophe inside (don't, student's)
+WORD = re.compile(r"[a-z]+(?:'[a-z]+)?")
+
+_SUFFIXES = ('ing', 'ed', 'es', 's')
+
+
+def words(text):
+    """The words of ``text``, lower-cased, in order."""
+    return WORD.findall(text.lower())
+
+
+def stem(word):
+    """Strip one common inflection suffix from a lower-case word, keeping at least four letters."""
+    for suffix in _SUFFIXES:
+        if len(word) > len(suffix) + 3 and word.endswith(suffix):
+            return word[:-len(suffix)]
+    return word